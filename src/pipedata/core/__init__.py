@@ -1,9 +1,22 @@
+from .async_chain import AsyncChain, AsyncChainType
+from .async_stream import AsyncStream, AsyncStreamType
 from .chain import Chain, ChainType
-from .stream import Stream, StreamType
+from .checkpoint import Checkpoint
+from .links import Instrumentation
+from .stream import Stream, StreamType, interleave, merge_sorted, zip_streams
 
 __all__ = [
     "ChainType",
     "Chain",
     "StreamType",
     "Stream",
+    "AsyncChainType",
+    "AsyncChain",
+    "AsyncStreamType",
+    "AsyncStream",
+    "Instrumentation",
+    "Checkpoint",
+    "merge_sorted",
+    "zip_streams",
+    "interleave",
 ]
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import operator
+from collections import deque
+from typing import Any, Callable, Deque, Optional, Tuple, Union
+
+Field = Union[None, str, Callable[[Any], Any]]
+
+
+def _getter(field: Field) -> Callable[[Any], Any]:
+    if field is None:
+        return lambda element: element
+    if isinstance(field, str):
+        return operator.itemgetter(field)
+    return field
+
+
+class Aggregate:
+    """An aggregate of a field of the elements, updated one at a time.
+
+    The field is either the name of a key of each element (eg a dict),
+    a function of the element, or None for the element itself, with None
+    values of the field being skipped (as nulls are in SQL). The state
+    of an aggregate is held separately, so that partial states (eg of
+    panes of a window, or of partitions) can be merged together.
+    """
+
+    def __init__(self, field: Field = None) -> None:
+        self.field = field
+        self.get = _getter(field)
+
+    def create(self) -> Any:
+        raise NotImplementedError
+
+    def add(self, state: Any, value: Any) -> Any:
+        raise NotImplementedError
+
+    def merge(self, state: Any, other: Any) -> Any:
+        raise NotImplementedError
+
+    def result(self, state: Any) -> Any:
+        return state
+
+    def update(self, state: Any, element: Any) -> Any:
+        value = self.get(element)
+        if value is None:
+            return state
+        return self.add(state, value)
+
+    def sliding(self) -> Sliding:
+        """A sliding combination of the partial states of panes."""
+        raise NotImplementedError
+
+
+class InvertibleAggregate(Aggregate):
+    """An aggregate where a partial state can be removed from a state."""
+
+    def subtract(self, state: Any, other: Any) -> Any:
+        raise NotImplementedError
+
+    def sliding(self) -> Sliding:
+        return InvertibleSliding(self)
+
+
+class Count(InvertibleAggregate):
+    """The number of elements (with a non-None field, if one is given)."""
+
+    def create(self) -> int:
+        return 0
+
+    def update(self, state: int, element: Any) -> int:
+        if self.field is None:
+            return state + 1
+        return super().update(state, element)  # type: ignore[no-any-return]
+
+    def add(self, state: int, value: Any) -> int:
+        return state + 1
+
+    def merge(self, state: int, other: int) -> int:
+        return state + other
+
+    def subtract(self, state: int, other: int) -> int:
+        return state - other
+
+
+class Sum(InvertibleAggregate):
+    def create(self) -> Any:
+        return 0
+
+    def add(self, state: Any, value: Any) -> Any:
+        return state + value
+
+    def merge(self, state: Any, other: Any) -> Any:
+        return state + other
+
+    def subtract(self, state: Any, other: Any) -> Any:
+        return state - other
+
+
+class Mean(InvertibleAggregate):
+    def create(self) -> Tuple[Any, int]:
+        return 0, 0
+
+    def add(self, state: Tuple[Any, int], value: Any) -> Tuple[Any, int]:
+        return state[0] + value, state[1] + 1
+
+    def merge(self, state: Tuple[Any, int], other: Tuple[Any, int]) -> Tuple[Any, int]:
+        return state[0] + other[0], state[1] + other[1]
+
+    def subtract(
+        self, state: Tuple[Any, int], other: Tuple[Any, int]
+    ) -> Tuple[Any, int]:
+        return state[0] - other[0], state[1] - other[1]
+
+    def result(self, state: Tuple[Any, int]) -> Optional[float]:
+        total, count = state
+        return None if count == 0 else total / count
+
+
+class _Extremum(Aggregate):
+    def _better(self, value: Any, other: Any) -> bool:
+        raise NotImplementedError
+
+    def create(self) -> Any:
+        return None
+
+    def add(self, state: Any, value: Any) -> Any:
+        if state is None or self._better(value, state):
+            return value
+        return state
+
+    def merge(self, state: Any, other: Any) -> Any:
+        if other is None:
+            return state
+        return self.add(state, other)
+
+    def sliding(self) -> Sliding:
+        return MonotonicSliding(self._better)
+
+
+class Min(_Extremum):
+    def _better(self, value: Any, other: Any) -> bool:
+        return bool(value < other)
+
+
+class Max(_Extremum):
+    def _better(self, value: Any, other: Any) -> bool:
+        return bool(value > other)
+
+
+class Sliding:
+    """The combined state of the panes in a window, as panes are added to
+    the end of the window, and evicted from its start."""
+
+    def push(self, index: int, state: Any) -> None:
+        raise NotImplementedError
+
+    def evict(self, index: int, state: Any) -> None:
+        raise NotImplementedError
+
+    def state(self) -> Any:
+        raise NotImplementedError
+
+
+class InvertibleSliding(Sliding):
+    """A running total, with evicted panes subtracted from it."""
+
+    def __init__(self, aggregate: InvertibleAggregate) -> None:
+        self._aggregate = aggregate
+        self._state = aggregate.create()
+
+    def push(self, index: int, state: Any) -> None:
+        self._state = self._aggregate.merge(self._state, state)
+
+    def evict(self, index: int, state: Any) -> None:
+        self._state = self._aggregate.subtract(self._state, state)
+
+    def state(self) -> Any:
+        return self._state
+
+
+class MonotonicSliding(Sliding):
+    """The best value of the panes, from a deque of candidate panes.
+
+    The deque only holds panes whose value is better than all of the
+    later panes, so its first pane has the best value in the window.
+    """
+
+    def __init__(self, better: Callable[[Any, Any], bool]) -> None:
+        self._better = better
+        self._candidates: Deque[Tuple[int, Any]] = deque()
+
+    def push(self, index: int, state: Any) -> None:
+        if state is None:
+            return
+        candidates = self._candidates
+        while candidates and not self._better(candidates[-1][1], state):
+            candidates.pop()
+        candidates.append((index, state))
+
+    def evict(self, index: int, state: Any) -> None:
+        if self._candidates and self._candidates[0][0] <= index:
+            self._candidates.popleft()
+
+    def state(self) -> Any:
+        return self._candidates[0][1] if self._candidates else None
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Generic,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+    Union,
+    cast,
+    overload,
+)
+
+from .links import AsyncChainLink, Instrumentation
+
+TStart = TypeVar("TStart")
+TEnd = TypeVar("TEnd")
+TOther = TypeVar("TOther")
+
+_DONE = object()
+
+
+async def _identity(input_iterator: AsyncIterator[TEnd]) -> AsyncIterator[TEnd]:
+    async for element in input_iterator:
+        yield element
+
+
+async def _anext(iterator: AsyncIterator[TEnd]) -> TEnd:
+    return await iterator.__anext__()
+
+
+def _is_async(func: Callable[..., Any]) -> bool:
+    return isinstance(
+        func, (AsyncChainLink, AsyncChainType)
+    ) or inspect.isasyncgenfunction(func)
+
+
+def run_in_executor(
+    func: Callable[[Iterator[TStart]], Iterator[TEnd]],
+) -> Callable[[AsyncIterator[TStart]], AsyncIterator[TEnd]]:
+    """Adapt a synchronous step so that it can be used in an async chain.
+
+    The synchronous step is advanced on a thread of its own, pulling its
+    inputs back through the event loop, so it never blocks the loop. As
+    each step waits on its upstream from its thread, the steps do not share
+    the loop's default executor, which any number of steps could exhaust.
+    Synchronous steps passed to AsyncChainType.then are adapted with this
+    automatically.
+    """
+
+    @functools.wraps(func)
+    async def run_sync(input_iterator: AsyncIterator[TStart]) -> AsyncIterator[TEnd]:
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="async-step")
+
+        def pull() -> Iterator[TStart]:
+            while True:
+                future = asyncio.run_coroutine_threadsafe(_anext(input_iterator), loop)
+                try:
+                    yield future.result()
+                except StopAsyncIteration:
+                    return
+
+        output = func(pull())
+        try:
+            while True:
+                value = await loop.run_in_executor(executor, next, output, _DONE)
+                if value is _DONE:
+                    return
+                yield cast(TEnd, value)
+        finally:
+            close = getattr(output, "close", None)
+            if close is not None:
+                close()
+            executor.shutdown(wait=False)
+
+    return run_sync
+
+
+AsyncStep = Union[
+    Callable[[AsyncIterator[TStart]], AsyncIterator[TEnd]],
+    Callable[[Iterator[TStart]], Iterator[TEnd]],
+]
+
+
+class AsyncChainType(Generic[TStart, TEnd]):
+    """The async counterpart of ChainType.
+
+    Steps can be async generator functions (or AsyncChainLinks), taking and
+    returning async iterators, or the same synchronous steps used with
+    ChainType, which are run in an executor.
+    """
+
+    @overload
+    def __init__(
+        self,
+        previous_steps: AsyncChainType[TStart, TOther],
+        func: AsyncStep[TOther, TEnd],
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        ...
+
+    @overload
+    def __init__(
+        self,
+        previous_steps: None,
+        func: AsyncStep[TStart, TEnd],
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        ...
+
+    def __init__(
+        self,
+        previous_steps: Optional[AsyncChainType[TStart, TOther]],
+        func: Union[AsyncStep[TOther, TEnd], AsyncStep[TStart, TEnd]],
+        instrumentation: Optional[Instrumentation] = None,
+    ) -> None:
+        if instrumentation is None:
+            instrumentation = (
+                Instrumentation.COUNTS
+                if previous_steps is None
+                else previous_steps._instrumentation
+            )
+        self._instrumentation: Instrumentation = Instrumentation(instrumentation)
+        self._previous_steps = previous_steps
+        if not _is_async(func):
+            func = run_in_executor(cast(Callable[[Iterator[Any]], Iterator[Any]], func))
+        self._func = AsyncChainLink(
+            cast(Callable[[AsyncIterator[Any]], AsyncIterator[TEnd]], func)
+        )
+
+    def __call__(self, input_iterator: AsyncIterator[TStart]) -> AsyncIterator[TEnd]:
+        if self._previous_steps is None:
+            return self._func(input_iterator, self._instrumentation)
+
+        return self._func(self._previous_steps(input_iterator), self._instrumentation)
+
+    def then(self, func: AsyncStep[TEnd, TOther]) -> AsyncChainType[TStart, TOther]:
+        return AsyncChainType(self, func)
+
+    def __or__(self, func: AsyncStep[TEnd, TOther]) -> AsyncChainType[TStart, TOther]:
+        return self.then(func)
+
+    async def aclose(self) -> None:
+        await self._func.aclose()
+        if self._previous_steps is not None:
+            await self._previous_steps.aclose()
+
+    def get_counts(self) -> List[Dict[str, Any]]:
+        step_counts = []
+        if self._previous_steps is not None:
+            step_counts = self._previous_steps.get_counts()
+
+        inputs, outputs = self._func.get_counts()
+        counts: Dict[str, Any] = {
+            "name": self._func.__name__,
+            "inputs": inputs,
+            "outputs": outputs,
+        }
+        if isinstance(self._func._func, AsyncChainType):
+            # A chain used as a step, with the counts of its own steps
+            counts["steps"] = self._func._func.get_counts()
+        step_counts.append(counts)
+        return step_counts
+
+    @property
+    def __name__(self) -> str:  # noqa: A003
+        """The names of the steps, as for steps fused together."""
+        return "+".join(self._step_names())
+
+    def _step_names(self) -> List[str]:
+        names = (
+            [] if self._previous_steps is None else self._previous_steps._step_names()
+        )
+        names.append(self._func.__name__)
+        return names
+
+
+class AsyncChain(AsyncChainType[TOther, TOther]):
+    def __init__(
+        self, instrumentation: Instrumentation = Instrumentation.COUNTS
+    ) -> None:
+        super().__init__(None, _identity, instrumentation)
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from types import TracebackType
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Type,
+    TypeVar,
+    Union,
+)
+
+from .async_chain import AsyncChain, AsyncChainType, AsyncStep
+from .links import Instrumentation
+
+TStart = TypeVar("TStart")
+TEnd = TypeVar("TEnd")
+TNewEnd = TypeVar("TNewEnd")
+
+
+async def _from_iterable(items: Iterable[TEnd]) -> AsyncIterator[TEnd]:
+    for item in items:
+        yield item
+
+
+def _to_async_iterator(
+    items: Union[Iterable[TEnd], AsyncIterable[TEnd]],
+) -> AsyncIterator[TEnd]:
+    if isinstance(items, AsyncIterable):
+        return items.__aiter__()
+    return _from_iterable(items)
+
+
+class AsyncStreamType(AsyncIterator[TEnd]):
+    def __init__(
+        self,
+        items: Union[Iterable[TStart], AsyncIterable[TStart]],
+        chain: AsyncChainType[TStart, TEnd],
+    ) -> None:
+        self._items = _to_async_iterator(items)
+        self._chain = chain
+        self._iter = self._chain(self._items)
+
+    def __aiter__(self) -> AsyncIterator[TEnd]:
+        return self
+
+    async def __anext__(self) -> TEnd:
+        return await self._iter.__anext__()
+
+    def then(self, func: AsyncStep[TEnd, TNewEnd]) -> AsyncStreamType[TNewEnd]:
+        return AsyncStreamType(self._items, self._chain.then(func))
+
+    def __or__(self, func: AsyncStep[TEnd, TNewEnd]) -> AsyncStreamType[TNewEnd]:
+        return AsyncStreamType(self._items, self._chain.then(func))
+
+    async def to_list(
+        self,
+        stop: Optional[int] = None,
+    ) -> List[TEnd]:
+        result: List[TEnd] = []
+        if stop is not None and stop <= 0:
+            return result
+        async for element in self:
+            result.append(element)
+            if stop is not None and len(result) >= stop:
+                break
+        return result
+
+    async def aclose(self) -> None:
+        """Stop the stream early, closing each step of the chain."""
+        await self._chain.aclose()
+
+    async def __aenter__(self) -> AsyncStreamType[TEnd]:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self.aclose()
+
+    def get_counts(self) -> List[Dict[str, Any]]:
+        return self._chain.get_counts()
+
+
+class AsyncStream(AsyncStreamType[TEnd]):
+    def __init__(
+        self,
+        items: Union[Iterable[TEnd], AsyncIterable[TEnd]],
+        instrumentation: Instrumentation = Instrumentation.COUNTS,
+    ) -> None:
+        super().__init__(items, AsyncChain[TEnd](instrumentation))
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+_COMMIT_INTERVAL = 1000
+
+
+class Cache:
+    """A cache with at most maxsize entries (evicting the least recently
+    used), each expiring ttl seconds after being added, if given."""
+
+    def __init__(self, maxsize: Optional[int], ttl: Optional[float]) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expires(self) -> Optional[float]:
+        return None if self.ttl is None else time.time() + self.ttl
+
+    def get(self, key: Any) -> Tuple[bool, Any]:
+        raise NotImplementedError
+
+    def put(self, key: Any, value: Any) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_evictions": self.evictions,
+            "cache_size": len(self),
+        }
+
+
+class MemoryCache(Cache):
+    def __init__(self, maxsize: Optional[int], ttl: Optional[float]) -> None:
+        super().__init__(maxsize, ttl)
+        self._entries: OrderedDict[Any, Tuple[Any, Optional[float]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Any) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires = entry
+            if expires is None or expires > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self._entries[key]
+        self.misses += 1
+        return False, None
+
+    def put(self, key: Any, value: Any) -> None:
+        self._entries[key] = (value, self._expires())
+        if self.maxsize is not None and len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+class SqliteCache(Cache):
+    """A cache in an sqlite database file, persisting between runs.
+
+    The keys and values are pickled. Writes are committed in batches, and
+    when the cache is closed. The connection can be used (one at a time)
+    from any thread, as a step may be advanced by one thread (eg upstream of
+    prefetch) and closed by another.
+    """
+
+    def __init__(self, path: str, maxsize: Optional[int], ttl: Optional[float]) -> None:
+        super().__init__(maxsize, ttl)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key BLOB PRIMARY KEY, value BLOB, expires REAL, used INTEGER)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS cache_used ON cache(used)")
+        self._size, last_used = self._connection.execute(
+            "SELECT COUNT(*), MAX(used) FROM cache"
+        ).fetchone()
+        self._used = last_used or 0
+        self._writes = 0
+
+    def __len__(self) -> int:
+        return int(self._size)
+
+    def _write(self, sql: str, parameters: Tuple[Any, ...]) -> None:
+        self._connection.execute(sql, parameters)
+        self._writes += 1
+        if self._writes >= _COMMIT_INTERVAL:
+            self._connection.commit()
+            self._writes = 0
+
+    def get(self, key: Any) -> Tuple[bool, Any]:
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: Any) -> Tuple[bool, Any]:
+        pickled_key = pickle.dumps(key)
+        row = self._connection.execute(
+            "SELECT value, expires FROM cache WHERE key = ?", (pickled_key,)
+        ).fetchone()
+        if row is not None:
+            value, expires = row
+            if expires is None or expires > time.time():
+                self._used += 1
+                self._write(
+                    "UPDATE cache SET used = ? WHERE key = ?", (self._used, pickled_key)
+                )
+                self.hits += 1
+                return True, pickle.loads(value)  # noqa: S301
+            self._write("DELETE FROM cache WHERE key = ?", (pickled_key,))
+            self._size -= 1
+        self.misses += 1
+        return False, None
+
+    def put(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._put(key, value)
+
+    def _put(self, key: Any, value: Any) -> None:
+        self._used += 1
+        self._write(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+            (pickle.dumps(key), pickle.dumps(value), self._expires(), self._used),
+        )
+        self._size += 1
+        if self.maxsize is not None and self._size > self.maxsize:
+            excess = self._size - self.maxsize
+            self._write(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY used LIMIT ?)",
+                (excess,),
+            )
+            self._size -= excess
+            self.evictions += excess
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
@@ -14,7 +14,13 @@ from typing import (
     overload,
 )
 
-from .links import ChainLink
+from .links import (
+    ChainLink,
+    ElementwiseLink,
+    FusedLink,
+    Instrumentation,
+    MultiSourceLink,
+)
 
 TStart = TypeVar("TStart")
 TEnd = TypeVar("TEnd")
@@ -31,6 +37,7 @@ class ChainType(Generic[TStart, TEnd]):
         self,
         previous_steps: ChainType[TStart, TOther],
         func: Callable[[Iterator[TOther]], Iterator[TEnd]],
+        instrumentation: Optional[Instrumentation] = None,
     ):
         ...
 
@@ -39,6 +46,7 @@ class ChainType(Generic[TStart, TEnd]):
         self,
         previous_steps: None,
         func: Callable[[Iterator[TStart]], Iterator[TEnd]],
+        instrumentation: Optional[Instrumentation] = None,
     ):
         ...
 
@@ -49,16 +57,31 @@ class ChainType(Generic[TStart, TEnd]):
             Callable[[Iterator[TOther]], Iterator[TEnd]],
             Callable[[Iterator[TStart]], Iterator[TEnd]],
         ],
+        instrumentation: Optional[Instrumentation] = None,
     ) -> None:
+        """A step of a chain, after the previous_steps.
+
+        instrumentation sets what the step records (see Instrumentation),
+        by default the same as the previous steps, or COUNTS for a first step.
+        """
+        if instrumentation is None:
+            instrumentation = (
+                Instrumentation.COUNTS
+                if previous_steps is None
+                else previous_steps._instrumentation
+            )
+        self._instrumentation: Instrumentation = Instrumentation(instrumentation)
         self._previous_steps = previous_steps
-        self._func = ChainLink(func)
+        self._func: ChainLink[Any, TEnd] = (
+            func if isinstance(func, (FusedLink, MultiSourceLink)) else ChainLink(func)
+        )
 
     def __call__(self, input_iterator: Iterator[TStart]) -> Iterator[TEnd]:
         if self._previous_steps is None:
             func = cast(ChainLink[TStart, TEnd], self._func)
-            return func(input_iterator)
+            return func(input_iterator, self._instrumentation)
 
-        return self._func(self._previous_steps(input_iterator))  # type: ignore
+        return self._func(self._previous_steps(input_iterator), self._instrumentation)
 
     def then(
         self, func: Callable[[Iterator[TEnd]], Iterator[TOther]]
@@ -70,22 +93,97 @@ class ChainType(Generic[TStart, TEnd]):
     ) -> ChainType[TStart, TOther]:
         return self.then(func)
 
+    def _first_instrumentation(self) -> Instrumentation:
+        if self._previous_steps is None:
+            return self._instrumentation
+        return self._previous_steps._first_instrumentation()
+
+    def _steps(self) -> List[Callable[[Iterator[Any]], Iterator[Any]]]:
+        steps = [] if self._previous_steps is None else self._previous_steps._steps()
+        if isinstance(self._func, FusedLink):
+            steps.extend(self._func.links)
+        elif isinstance(self._func, MultiSourceLink):
+            steps.append(self._func)
+        else:
+            steps.append(self._func._func)
+        return steps
+
+    def compile(self) -> ChainType[TStart, TEnd]:  # noqa: A003
+        """Return an equivalent chain with element-wise steps fused together.
+
+        Runs of adjacent mapping / filtering steps are combined into a single
+        loop over the elements, avoiding the per-step iterator overhead, while
+        get_counts still reports the counts of each of the original steps.
+
+        A step with a push_down method (eg read_from_parquet, for a following
+        filter or column selection) is first offered the step after it, and
+        push_down(step) returns a single step doing both, or None. Steps
+        pushed down are no longer counted separately.
+        """
+        steps: List[Callable[[Iterator[Any]], Iterator[Any]]] = []
+        for original in self._steps():
+            push_down = getattr(steps[-1], "push_down", None) if steps else None
+            pushed = None if push_down is None else push_down(original)
+            if pushed is not None:
+                steps[-1] = pushed
+            else:
+                steps.append(original)
+
+        fused: List[Callable[[Iterator[Any]], Iterator[Any]]] = []
+        group: List[ElementwiseLink[Any, Any]] = []
+        for step in [*steps, None]:
+            if isinstance(step, ElementwiseLink):
+                group.append(step)
+                continue
+            if len(group) > 1:
+                fused.append(FusedLink(group))
+            else:
+                fused.extend(group)
+            group = []
+            if step is not None:
+                fused.append(step)
+
+        chain: ChainType[TStart, Any] = ChainType(
+            None, fused[0], self._first_instrumentation()
+        )
+        for step in fused[1:]:
+            chain = chain.then(step)
+        return chain
+
+    def close(self) -> None:
+        """Close the iterators from the most recent call of the chain.
+
+        Closing starts from the final step, so any generator based steps
+        have their cleanup (eg stopping background work) run in order.
+        """
+        self._func.close()
+        if self._previous_steps is not None:
+            self._previous_steps.close()
+
     def get_counts(self) -> List[Dict[str, Any]]:
         step_counts = []
         if self._previous_steps is not None:
             step_counts = self._previous_steps.get_counts()
 
-        inputs, outputs = self._func.get_counts()
-        step_counts.append(
-            {
-                "name": self._func.__name__,
-                "inputs": inputs,
-                "outputs": outputs,
-            }
-        )
+        step_counts.extend(self._func.get_step_counts())
         return step_counts
 
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """The counts of each step, and their timings when recorded.
+
+        Timings are recorded with the FULL and SAMPLED instrumentation
+        levels, but not for steps fused together by compile.
+        """
+        step_stats = []
+        if self._previous_steps is not None:
+            step_stats = self._previous_steps.get_stats()
+
+        step_stats.extend(self._func.get_step_stats())
+        return step_stats
+
 
 class Chain(ChainType[TOther, TOther]):
-    def __init__(self) -> None:
-        super().__init__(None, _identity)
+    def __init__(
+        self, instrumentation: Instrumentation = Instrumentation.COUNTS
+    ) -> None:
+        super().__init__(None, _identity, instrumentation)
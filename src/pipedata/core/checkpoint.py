@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from collections import deque
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Set, TypeVar
+
+TStart = TypeVar("TStart")
+TEnd = TypeVar("TEnd")
+
+
+def write_json(path: str, data: Any) -> None:
+    """Write data as json to path, replacing the file there atomically, so
+    that it is never left partly written."""
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(
+        "w", dir=directory, suffix=".tmp", delete=False
+    ) as file:
+        json.dump(data, file)
+    os.replace(file.name, path)
+
+
+class Checkpoint:
+    """A manifest of the completed inputs of a stream, to resume from.
+
+    Inputs (identified by key, by default str of the input) in the manifest
+    are skipped by a stream with this checkpoint. An input is completed once
+    the consumer has taken the next element after an output that came after
+    the following input was taken, or at the end of the stream, as steps
+    only take an input once they need more elements. With outputs=True, the
+    outputs of the stream (eg the files from parquet_writer) are also
+    recorded, as str, once the consumer has taken the next element.
+
+    Steps reading ahead of their outputs (those with a reads_ahead attribute,
+    eg prefetch, parallel_mapping) would complete inputs before all of their
+    outputs are, so cannot be added to a stream with a checkpoint.
+    The manifest is a json file at path, replaced atomically when updated,
+    or only once every save_interval updates (and at the end).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        key: Callable[[Any], str] = str,
+        outputs: bool = False,
+        save_interval: int = 1,
+    ) -> None:
+        self.path = path
+        self._save_interval = save_interval
+        self._unsaved = 0
+        self._key = key
+        self._record_outputs = outputs
+        self.completed: List[str] = []
+        self.outputs: List[str] = []
+        if os.path.exists(path):
+            with open(path) as file:
+                manifest = json.load(file)
+            self.completed = manifest["completed"]
+            self.outputs = manifest["outputs"]
+        self._completed: Set[str] = set(self.completed)
+        self._taken: Deque[str] = deque()
+
+    def pending(self, items: Iterable[TStart]) -> Iterator[TStart]:
+        """The items not already completed, recording each as it is taken."""
+        for item in items:
+            key = self._key(item)
+            if key in self._completed:
+                continue
+            self._taken.append(key)
+            yield item
+
+    def track(self, outputs: Iterator[TEnd]) -> Iterator[TEnd]:
+        """The outputs of the stream, completing inputs as they are output."""
+        for output in outputs:
+            yield output
+            # Only once the consumer asks for the next element has it
+            # handled the output (and the inputs taken before it)
+            changed = self._complete(keep=1)
+            if self._record_outputs:
+                self.outputs.append(str(output))
+                changed = True
+            if changed:
+                self._updated()
+        if self._complete(keep=0) or self._unsaved:
+            self.save()
+
+    def completing(self, items: Iterable[TStart]) -> Iterator[TStart]:
+        """The items not already completed, each completed once the next one
+        is taken (as the consumer has then finished with it), or at the end.
+
+        For a step that is itself the source of the stream's inputs (eg
+        discovered_files), rather than a stream with this checkpoint.
+        """
+        for item in self.pending(items):
+            yield item
+            self._complete(keep=0)
+            self._updated()
+        if self._unsaved:
+            self.save()
+
+    def _updated(self) -> None:
+        self._unsaved += 1
+        if self._unsaved >= self._save_interval:
+            self.save()
+
+    def _complete(self, keep: int) -> bool:
+        changed = False
+        while len(self._taken) > keep:
+            key = self._taken.popleft()
+            self.completed.append(key)
+            self._completed.add(key)
+            changed = True
+        return changed
+
+    def save(self) -> None:
+        write_json(self.path, {"completed": self.completed, "outputs": self.outputs})
+        self._unsaved = 0
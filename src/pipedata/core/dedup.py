@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import hashlib
+import math
+from array import array
+from typing import Any, Iterable, List
+
+_MASK_64 = (1 << 64) - 1
+_MAX_LOAD = 0.7
+
+
+def _key_bytes(key: Any) -> bytes:
+    """The key encoded so that equal keys (as for a set) have equal bytes.
+
+    Numbers are encoded by value (so 1, 1.0 and True are the same key),
+    dicts and sets regardless of their order, and tuples and lists by their
+    items. Other keys are encoded by their type and repr, so must have a
+    repr of their value (eg a dataclass, or a datetime), and a key with the
+    default repr of its identity is rejected.
+    """
+    # Tagged by type, so that eg 1 and "1" have different digests
+    if isinstance(key, bytes):
+        return b"b" + key
+    if isinstance(key, str):
+        return b"s" + key.encode("utf-8", "surrogatepass")
+    if isinstance(key, (tuple, list, dict, set, frozenset)):
+        return _container_bytes(key)
+    if key is None:
+        return b"z"
+    if isinstance(key, float) and key.is_integer():
+        key = int(key)
+    if isinstance(key, (int, float)):
+        return b"n" + repr(key + 0).encode()
+    text = repr(key)
+    if text == object.__repr__(key):
+        msg = f"Keys of type {type(key).__name__} have no repr of their value"
+        raise TypeError(msg)
+    name = f"{type(key).__module__}.{type(key).__qualname__}:{text}"
+    return b"r" + name.encode("utf-8", "surrogatepass")
+
+
+def _container_bytes(key: Any) -> bytes:
+    if isinstance(key, tuple):
+        return b"t" + _joined(_key_bytes(item) for item in key)
+    if isinstance(key, list):
+        return b"l" + _joined(_key_bytes(item) for item in key)
+    if isinstance(key, dict):
+        return b"d" + _joined(sorted(_key_bytes(item) for item in key.items()))
+    return b"f" + _joined(sorted(_key_bytes(item) for item in key))
+
+
+def _joined(parts: Iterable[bytes]) -> bytes:
+    """The parts, each prefixed with its length, so they cannot run together."""
+    return b"".join(len(part).to_bytes(8, "little") + part for part in parts)
+
+
+def digest(key: Any, size: int = 8) -> int:
+    """A digest of size bytes of the key, from blake2b."""
+    hashed = hashlib.blake2b(_key_bytes(key), digest_size=size).digest()
+    return int.from_bytes(hashed, "little")
+
+
+class DigestSet:
+    """A set of 64 bit key digests, in an open addressing array table.
+
+    Each slot is 8 bytes, with the table doubled in size beyond a load of
+    0.7, so a key takes around 11 to 23 bytes rather than the 100+ bytes of
+    a Python object in a set. Distinct keys with the same digest are treated
+    as the same key, which is unlikely (around n^2 / 2^65 for n keys).
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        size = 1 << max(4, math.ceil(math.log2(capacity / _MAX_LOAD)))
+        self._slots = array("Q", bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._slots.itemsize * len(self._slots)
+
+    def add(self, key: Any) -> bool:
+        """Add the key, returning False if it was already present."""
+        # 0 marks an empty slot
+        value = digest(key) or 1
+        if self._insert(self._slots, self._mask, value):
+            self._count += 1
+            if self._count > _MAX_LOAD * len(self._slots):
+                self._grow()
+            return True
+        return False
+
+    @staticmethod
+    def _insert(slots: array[int], mask: int, value: int) -> bool:
+        index = value & mask
+        while True:
+            slot = slots[index]
+            if slot == 0:
+                slots[index] = value
+                return True
+            if slot == value:
+                return False
+            index = (index + 1) & mask
+
+    def _grow(self) -> None:
+        slots = array("Q", bytes(16 * len(self._slots)))
+        mask = len(slots) - 1
+        for value in self._slots:
+            if value != 0:
+                self._insert(slots, mask, value)
+        self._slots = slots
+        self._mask = mask
+
+
+class _BloomFilter:
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.count = 0
+        bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(bits / capacity * math.log(2)))
+        self.bits = bits
+        self.array = bytearray((bits + 7) // 8)
+
+    def positions(self, hashed: int) -> List[int]:
+        first = hashed & _MASK_64
+        second = (hashed >> 64) | 1
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def contains(self, positions: List[int]) -> bool:
+        array_ = self.array
+        return all(array_[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def add(self, positions: List[int]) -> None:
+        array_ = self.array
+        for p in positions:
+            array_[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+class BloomSet:
+    """An approximate set of keys, from a scalable Bloom filter.
+
+    Keys that were added are always found, while a new key is wrongly found
+    with a probability of at most around error_rate. Once capacity keys have
+    been added, a further filter with twice the capacity and half the error
+    rate is added, keeping the overall error rate bounded.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001) -> None:
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        # With each filter halving the error rate, they sum to error_rate
+        self._filters = [_BloomFilter(capacity, error_rate / 2)]
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(len(bloom.array) for bloom in self._filters)
+
+    def add(self, key: Any) -> bool:
+        """Add the key, returning False if it was (probably) already present."""
+        hashed = digest(key, 16)
+        for bloom in self._filters:
+            if bloom.contains(bloom.positions(hashed)):
+                return False
+
+        current = self._filters[-1]
+        if current.count >= current.capacity:
+            current = _BloomFilter(2 * current.capacity, current.error_rate / 2)
+            self._filters.append(current)
+        current.add(current.positions(hashed))
+        self._count += 1
+        return True
@@ -1,10 +1,23 @@
+import functools
+import itertools
+import operator
+import threading
+import time
+from enum import Enum
 from typing import (
+    Any,
+    AsyncIterator,
     Callable,
+    Dict,
     Generic,
+    Iterable,
     Iterator,
+    List,
     Optional,
+    Sequence,
     Tuple,
     TypeVar,
+    Union,
 )
 
 TStart = TypeVar("TStart")
@@ -33,26 +46,479 @@ class CountingIterator(Iterator[TStart]):
         return self._count
 
 
+class CCountingIterator(Generic[TStart]):
+    """Counts the elements of an iterator without a Python level __next__.
+
+    The elements are zipped with an itertools.count, so that the counting
+    is done in C, and iterator yields the original elements. As zip pulls
+    from the wrapped iterator first, the counter is only advanced when an
+    element is returned.
+    """
+
+    def __init__(self, iterator: Iterator[TStart]) -> None:
+        self._iterator = iterator
+        self._counter = itertools.count()
+        self.iterator: Iterator[TStart] = map(
+            operator.itemgetter(0), zip(iterator, self._counter)
+        )
+
+    def get_count(self) -> int:
+        # The repr of the counter is 'count(<next value>)'
+        return int(repr(self._counter)[6:-1])
+
+
+class StepTimer:
+    """Timings of a link, exclusive of the time spent upstream of it.
+
+    One in every sample_interval calls for the link's next output is timed,
+    and the totals are scaled up from those. The first call is always timed,
+    giving the time to the first output.
+    Latencies are counted in buckets, where bucket k holds the calls taking
+    less than 2**k microseconds.
+    """
+
+    buckets = 32
+
+    def __init__(self, sample_interval: int = 1) -> None:
+        self.sample_interval = sample_interval
+        self.calls = 0
+        self.sampled_calls = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.started: Optional[float] = None
+        self.time_to_first_output: Optional[float] = None
+        self.latency_counts = [0] * self.buckets
+        # The thread timing a call for the next output, if any
+        self.timing_thread: Optional[int] = None
+        self.upstream_wall_time = 0.0
+        self.upstream_cpu_time = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        scale = self.calls / self.sampled_calls if self.sampled_calls else 0.0
+        return {
+            "wall_time": self.wall_time * scale,
+            "cpu_time": self.cpu_time * scale,
+            "time_to_first_output": self.time_to_first_output,
+            "latency_histogram": {
+                1e-6 * 2**bucket: count
+                for bucket, count in enumerate(self.latency_counts)
+                if count > 0
+            },
+        }
+
+
+class TimedInputIterator(CountingIterator[TStart]):
+    """Counts the inputs of a link, and the time spent producing them.
+
+    Only inputs taken on the thread timing the output are timed, as time
+    spent upstream on another thread (eg by prefetch) is not part of it.
+    """
+
+    def __init__(self, iterator: Iterator[TStart], timer: StepTimer) -> None:
+        super().__init__(iterator)
+        self._timer = timer
+
+    def __next__(self) -> TStart:
+        timer = self._timer
+        self._count += 1
+        thread = timer.timing_thread
+        if thread is None or thread != threading.get_ident():
+            try:
+                return next(self._iterator)
+            except StopIteration:
+                self._count -= 1
+                raise
+
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self._count -= 1
+            raise
+        finally:
+            timer.upstream_wall_time += time.perf_counter() - wall_start
+            timer.upstream_cpu_time += time.thread_time() - cpu_start
+
+
+class TimedOutputIterator(CountingIterator[TStart]):
+    """Counts the outputs of a link, and times the calls to produce them."""
+
+    def __init__(self, iterator: Iterator[TStart], timer: StepTimer) -> None:
+        super().__init__(iterator)
+        self._timer = timer
+
+    def __next__(self) -> TStart:
+        timer = self._timer
+        timer.calls += 1
+        self._count += 1
+        if timer.started is not None and (timer.calls - 1) % timer.sample_interval:
+            try:
+                return next(self._iterator)
+            except StopIteration:
+                self._count -= 1
+                raise
+
+        timer.timing_thread = threading.get_ident()
+        timer.upstream_wall_time = timer.upstream_cpu_time = 0.0
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        if timer.started is None:
+            timer.started = wall_start
+        try:
+            value = next(self._iterator)
+            if timer.time_to_first_output is None:
+                timer.time_to_first_output = time.perf_counter() - timer.started
+            return value
+        except StopIteration:
+            self._count -= 1
+            raise
+        finally:
+            wall = time.perf_counter() - wall_start - timer.upstream_wall_time
+            cpu = time.thread_time() - cpu_start - timer.upstream_cpu_time
+            timer.timing_thread = None
+            timer.sampled_calls += 1
+            timer.wall_time += wall
+            timer.cpu_time += cpu
+            bucket = min(int(wall * 1e6).bit_length(), timer.buckets - 1)
+            timer.latency_counts[bucket] += 1
+
+
+SAMPLE_INTERVAL = 100
+
+
+class Instrumentation(str, Enum):
+    """How much the links of a chain record about the elements they process.
+
+    OFF: nothing is recorded, and the links add no per-element overhead.
+    COUNTS: input and output counts only, counted in C. The default.
+    SAMPLED: counts, and timings of one in every SAMPLE_INTERVAL elements,
+        scaled up to estimate the totals.
+    FULL: counts, and timings of every element. This can add several
+        microseconds per element per step, so is intended for profiling.
+    """
+
+    OFF = "off"
+    COUNTS = "counts"
+    SAMPLED = "sampled"
+    FULL = "full"
+
+
+def _close(iterator: Optional[Iterable[Any]]) -> None:
+    close = getattr(iterator, "close", None)
+    if close is not None:
+        close()
+
+
+Counter = Union[CountingIterator[Any], CCountingIterator[Any]]
+
+
 class ChainLink(Generic[TStart, TEnd]):
     def __init__(
         self,
         func: Callable[[Iterator[TStart]], Iterator[TEnd]],
     ) -> None:
         self._func = func
-        self._input: Optional[CountingIterator[TStart]] = None
-        self._output: Optional[CountingIterator[TEnd]] = None
+        self._instrumentation = Instrumentation.COUNTS
+        self._source: Optional[Iterator[TStart]] = None
+        self._result: Optional[Iterator[TEnd]] = None
+        self._input: Optional[Counter] = None
+        self._output: Optional[Counter] = None
+        self._timer: Optional[StepTimer] = None
 
     @property
     def __name__(self) -> str:  # noqa: A003
         return self._func.__name__
 
-    def __call__(self, input_iterator: Iterator[TStart]) -> CountingIterator[TEnd]:
-        self._input = CountingIterator(input_iterator)
-        result = self._func(self._input)
-        self._output = CountingIterator(result)
+    def _apply(self, input_iterator: Iterator[TStart]) -> Iterator[TEnd]:
+        if isinstance(self._func, ChainLink):
+            # The counting is done here, so the wrapped link need not do it
+            return self._func(input_iterator, Instrumentation.OFF)
+        return self._func(input_iterator)
+
+    def __call__(
+        self,
+        input_iterator: Iterator[TStart],
+        instrumentation: Instrumentation = Instrumentation.COUNTS,
+    ) -> Iterator[TEnd]:
+        self._instrumentation = Instrumentation(instrumentation)
+        self._source = input_iterator
+        self._timer = None
+        if self._instrumentation == Instrumentation.OFF:
+            self._input = self._output = None
+            self._result = self._apply(input_iterator)
+            return self._result
+
+        if self._instrumentation in (Instrumentation.FULL, Instrumentation.SAMPLED):
+            self._timer = StepTimer(
+                1 if self._instrumentation == Instrumentation.FULL else SAMPLE_INTERVAL
+            )
+            timed_input = TimedInputIterator(input_iterator, self._timer)
+            self._input = timed_input
+            self._result = self._apply(timed_input)
+            timed_output = TimedOutputIterator(self._result, self._timer)
+            self._output = timed_output
+            return timed_output
+
+        c_input = CCountingIterator(input_iterator)
+        self._input = c_input
+        self._result = self._apply(c_input.iterator)
+        c_output = CCountingIterator(self._result)
+        self._output = c_output
+        return c_output.iterator
+
+    def close(self) -> None:
+        _close(self._result)
+        _close(self._source)
+
+    def get_counts(self) -> Tuple[Optional[int], Optional[int]]:
+        if self._instrumentation == Instrumentation.OFF:
+            return None, None
+        return (
+            0 if self._input is None else self._input.get_count(),
+            0 if self._output is None else self._output.get_count(),
+        )
+
+    def get_step_counts(self) -> List[Dict[str, Any]]:
+        inputs, outputs = self.get_counts()
+        return [{"name": self.__name__, "inputs": inputs, "outputs": outputs}]
+
+    def get_step_stats(self) -> List[Dict[str, Any]]:
+        """The step counts, with timings when they are being recorded.
+
+        The wall and cpu times are those spent in this step only, excluding
+        upstream steps. outputs_per_second is the rate of outputs over that
+        wall time.
+        """
+        step_stats = self.get_step_counts()
+        for stats in step_stats:
+            stats.update(_NO_TIMINGS)
+        if self._timer is not None:
+            timings = self._timer.get_stats()
+            outputs = step_stats[0]["outputs"]
+            timings["outputs_per_second"] = (
+                outputs / timings["wall_time"] if timings["wall_time"] > 0 else None
+            )
+            step_stats[0].update(timings)
+        step_stats[0].update(self.get_extra_stats())
+        return step_stats
+
+    def get_extra_stats(self) -> Dict[str, Any]:
+        """Any further stats of the step (eg memory used), from subclasses."""
+        if isinstance(self._func, ChainLink):
+            return self._func.get_extra_stats()
+        return {}
+
+
+_NO_TIMINGS: Dict[str, Any] = {
+    "wall_time": None,
+    "cpu_time": None,
+    "outputs_per_second": None,
+    "time_to_first_output": None,
+    "latency_histogram": None,
+}
+
+
+class ElementwiseLink(ChainLink[TStart, TEnd]):
+    """A link that applies a function to each element independently.
+
+    element_func either maps each element to a new value or, when
+    is_filter is True, decides whether the element is kept. Adjacent
+    element-wise links can be fused into a single FusedLink.
+    """
+
+    def __init__(
+        self,
+        func: Callable[[Iterator[TStart]], Iterator[TEnd]],
+        element_func: Callable[[Any], Any],
+        is_filter: bool,
+    ) -> None:
+        super().__init__(func)
+        self.element_func = element_func
+        self.is_filter = is_filter
+
+
+def _fused(
+    stages: Sequence[Tuple[Callable[[Any], Any], bool]],
+    input_iterator: Iterator[Any],
+    counters: Optional[List[CCountingIterator[Any]]] = None,
+) -> Iterator[Any]:
+    """The stages as nested map and filter iterators, so that each element
+    passes through them without any Python level loop. With counters, the
+    input and the output of each stage are counted (in C) into them."""
+    iterator = input_iterator
+    if counters is not None:
+        counters.append(CCountingIterator(iterator))
+        iterator = counters[-1].iterator
+    for func, is_filter in stages:
+        iterator = filter(func, iterator) if is_filter else map(func, iterator)
+        if counters is not None:
+            counters.append(CCountingIterator(iterator))
+            iterator = counters[-1].iterator
+    return iterator
+
+
+class FusedLink(ChainLink[Any, Any]):
+    """Several element-wise links run as one loop over the elements.
+
+    The element functions are applied with map (or filter, for predicates)
+    directly, without each step's generator, and rather than counting each
+    step's input and output separately, a single counter between each pair
+    of steps records how many elements passed, and the counts of each of the
+    original steps are still reported.
+    """
+
+    def __init__(self, links: Sequence[ElementwiseLink[Any, Any]]) -> None:
+        self.links = list(links)
+        self._stages = [(link.element_func, link.is_filter) for link in self.links]
+        self._counters: Optional[List[CCountingIterator[Any]]] = None
+        super().__init__(functools.partial(_fused, self._stages))
+
+    @property
+    def __name__(self) -> str:  # noqa: A003
+        return "+".join(link.__name__ for link in self.links)
+
+    def __call__(
+        self,
+        input_iterator: Iterator[Any],
+        instrumentation: Instrumentation = Instrumentation.COUNTS,
+    ) -> Iterator[Any]:
+        self._instrumentation = Instrumentation(instrumentation)
+        self._source = input_iterator
+        if self._instrumentation == Instrumentation.OFF:
+            self._counters = None
+            self._result = _fused(self._stages, input_iterator)
+        else:
+            self._counters = []
+            self._result = _fused(self._stages, input_iterator, self._counters)
+        return self._result
+
+    def _get_all_counts(self) -> List[Optional[int]]:
+        if self._instrumentation == Instrumentation.OFF:
+            return [None] * (len(self.links) + 1)
+        if self._counters is None:
+            return [0] * (len(self.links) + 1)
+        return [counter.get_count() for counter in self._counters]
+
+    def get_counts(self) -> Tuple[Optional[int], Optional[int]]:
+        counts = self._get_all_counts()
+        return counts[0], counts[-1]
+
+    def get_step_counts(self) -> List[Dict[str, Any]]:
+        counts = self._get_all_counts()
+        return [
+            {"name": link.__name__, "inputs": inputs, "outputs": outputs}
+            for link, inputs, outputs in zip(self.links, counts[:-1], counts[1:])
+        ]
+
+
+class MultiSourceLink(ChainLink[Iterable[Any], TEnd]):
+    """A first step combining several iterables into a single iterator.
+
+    The link is given the iterables as its input, but its input count is
+    of the elements taken from all of them. Closing the link also closes
+    the iterables (eg streams) being combined.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        combine: Callable[[List[Iterator[Any]]], Iterator[TEnd]],
+    ) -> None:
+        self._sources: List[Iterable[Any]] = []
+        self._counters: List[CCountingIterator[Any]] = []
+
+        def combine_(sources: Iterator[Iterable[Any]]) -> Iterator[TEnd]:
+            self._sources = list(sources)
+            if self._instrumentation == Instrumentation.OFF:
+                self._counters = []
+                yield from combine([iter(source) for source in self._sources])
+                return
+            self._counters = [CCountingIterator(iter(s)) for s in self._sources]
+            yield from combine([counter.iterator for counter in self._counters])
+
+        combine_.__name__ = name
+        super().__init__(combine_)
+
+    def close(self) -> None:
+        super().close()
+        for source in self._sources:
+            _close(source)
+
+    def get_counts(self) -> Tuple[Optional[int], Optional[int]]:
+        inputs, outputs = super().get_counts()
+        if inputs is None:
+            return inputs, outputs
+        return sum(counter.get_count() for counter in self._counters), outputs
+
+
+class AsyncCountingIterator(AsyncIterator[TStart]):
+    def __init__(self, iterator: AsyncIterator[TStart]) -> None:
+        self._iterator = iterator
+        self._count = 0
+
+    def __aiter__(self) -> AsyncIterator[TStart]:
+        return self
+
+    async def __anext__(self) -> TStart:
+        self._count += 1
+        try:
+            return await self._iterator.__anext__()
+        except StopAsyncIteration:
+            self._count -= 1
+            raise
+
+    def get_count(self) -> int:
+        return self._count
+
+
+class AsyncChainLink(Generic[TStart, TEnd]):
+    def __init__(
+        self,
+        func: Callable[[AsyncIterator[TStart]], AsyncIterator[TEnd]],
+    ) -> None:
+        self._func = func
+        self._instrumentation = Instrumentation.COUNTS
+        self._source: Optional[AsyncIterator[TStart]] = None
+        self._result: Optional[AsyncIterator[TEnd]] = None
+        self._input: Optional[AsyncCountingIterator[TStart]] = None
+        self._output: Optional[AsyncCountingIterator[TEnd]] = None
+
+    @property
+    def __name__(self) -> str:  # noqa: A003
+        return self._func.__name__
+
+    def _apply(self, input_iterator: AsyncIterator[TStart]) -> AsyncIterator[TEnd]:
+        if isinstance(self._func, AsyncChainLink):
+            # The counting is done here, so the wrapped link need not do it
+            return self._func(input_iterator, Instrumentation.OFF)
+        return self._func(input_iterator)
+
+    def __call__(
+        self,
+        input_iterator: AsyncIterator[TStart],
+        instrumentation: Instrumentation = Instrumentation.COUNTS,
+    ) -> AsyncIterator[TEnd]:
+        """Run the link; any level other than OFF records the counts."""
+        self._instrumentation = Instrumentation(instrumentation)
+        self._source = input_iterator
+        if self._instrumentation == Instrumentation.OFF:
+            self._input = self._output = None
+            self._result = self._apply(input_iterator)
+            return self._result
+
+        self._input = AsyncCountingIterator(input_iterator)
+        self._result = self._apply(self._input)
+        self._output = AsyncCountingIterator(self._result)
         return self._output
 
-    def get_counts(self) -> Tuple[int, int]:
+    async def aclose(self) -> None:
+        for iterator in (self._result, self._source):
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def get_counts(self) -> Tuple[Optional[int], Optional[int]]:
+        if self._instrumentation == Instrumentation.OFF:
+            return None, None
         return (
             0 if self._input is None else self._input.get_count(),
             0 if self._output is None else self._output.get_count(),
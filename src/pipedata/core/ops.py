@@ -1,14 +1,49 @@
+import asyncio
 import functools
+import heapq
+import inspect
 import itertools
+import os
+import queue
+import sys
+import threading
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
 from typing import (
+    IO,
+    Any,
+    AsyncIterator,
+    Awaitable,
     Callable,
+    Deque,
+    Dict,
     Iterator,
+    List,
+    Literal,
     Optional,
+    Sequence,
+    Set,
     Tuple,
     TypeVar,
+    Union,
+    cast,
+    overload,
 )
 
-from .links import ChainLink
+from . import windows
+from .aggregates import Aggregate
+from .cache import Cache, MemoryCache, SqliteCache
+from .dedup import BloomSet, DigestSet
+from .links import AsyncChainLink, ChainLink, ElementwiseLink, _close
+from .spill import read_chunks, spill_file, write_chunks
+from .windows import Timestamp
 
 TStart = TypeVar("TStart")
 TEnd = TypeVar("TEnd")
@@ -21,22 +56,61 @@ def _batched(iterable: Iterator[TEnd], n: Optional[int]) -> Iterator[Tuple[TEnd,
         yield elements
 
 
-class filtering(ChainLink[TEnd, TEnd]):  # noqa: N801
+def _map_chunk(func: Callable[[TEnd], TOther], chunk: Tuple[TEnd, ...]) -> List[TOther]:
+    return [func(element) for element in chunk]
+
+
+def _executor_map(  # noqa: PLR0913
+    executor: Executor,
+    func: Callable[[TEnd], TOther],
+    iterator: Iterator[TEnd],
+    chunksize: int,
+    max_in_flight: int,
+    ordered: bool,
+) -> Iterator[TOther]:
+    """Map func over the iterator in chunks submitted to the executor.
+
+    At most max_in_flight chunks are submitted but not yet yielded, so
+    the upstream iterator is only pulled as fast as results are consumed.
+    """
+    if ordered:
+        queue: Deque[Future[List[TOther]]] = deque()
+        for chunk in _batched(iterator, chunksize):
+            queue.append(executor.submit(_map_chunk, func, chunk))
+            if len(queue) >= max_in_flight:
+                yield from queue.popleft().result()
+        while queue:
+            yield from queue.popleft().result()
+    else:
+        pending: Set[Future[List[TOther]]] = set()
+        for chunk in _batched(iterator, chunksize):
+            pending.add(executor.submit(_map_chunk, func, chunk))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
+class filtering(ElementwiseLink[TEnd, TEnd]):  # noqa: N801
     def __init__(self, func: Callable[[TEnd], bool]):
         @functools.wraps(func)
         def new_action(previous_step: Iterator[TEnd]) -> Iterator[TEnd]:
             return filter(func, previous_step)
 
-        super().__init__(new_action)
+        super().__init__(new_action, func, is_filter=True)
 
 
-class mapping(ChainLink[TEnd, TOther]):  # noqa: N801
+class mapping(ElementwiseLink[TEnd, TOther]):  # noqa: N801
     def __init__(self, func: Callable[[TEnd], TOther]):
         @functools.wraps(func)
         def new_action(previous_step: Iterator[TEnd]) -> Iterator[TOther]:
             return map(func, previous_step)
 
-        super().__init__(new_action)
+        super().__init__(new_action, func, is_filter=False)
 
 
 class batched(ChainLink[TEnd, TOther]):  # noqa: N801
@@ -80,3 +154,649 @@ class grouper(ChainLink[TEnd, list[TEnd]]):  # noqa: N801
                 yield group
 
         super().__init__(grouper_)
+
+
+class parallel_mapping(ChainLink[TEnd, TOther]):  # noqa: N801
+    """Apply func to each element on a pool of worker processes.
+
+    Elements are sent to the workers in chunks of chunksize, with at most
+    max_in_flight chunks (default: twice the number of workers) outstanding
+    at any time. With ordered=False, results are yielded as chunks complete
+    rather than in input order. func, and the elements and results, must be
+    picklable.
+    """
+
+    reads_ahead = True
+
+    def __init__(  # noqa: PLR0913
+        self,
+        func: Callable[[TEnd], TOther],
+        workers: Optional[int] = None,
+        chunksize: int = 1,
+        ordered: bool = True,
+        max_in_flight: Optional[int] = None,
+    ) -> None:
+        n_workers = (os.cpu_count() or 1) if workers is None else workers
+        in_flight = 2 * n_workers if max_in_flight is None else max_in_flight
+        if min(n_workers, chunksize, in_flight) < 1:
+            msg = "workers, chunksize and max_in_flight must all be at least 1"
+            raise ValueError(msg)
+
+        @functools.wraps(func)
+        def new_action(previous_step: Iterator[TEnd]) -> Iterator[TOther]:
+            executor = ProcessPoolExecutor(max_workers=n_workers)
+            try:
+                yield from _executor_map(
+                    executor, func, previous_step, chunksize, in_flight, ordered
+                )
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        super().__init__(new_action)
+
+
+class concurrent_mapping(ChainLink[TEnd, TOther]):  # noqa: N801
+    """Apply func to each element on a pool of worker threads.
+
+    Suited to I/O bound functions. At most max_in_flight elements (default:
+    twice the number of workers) are submitted but not yet yielded, so the
+    upstream is only pulled as fast as results are consumed. Exceptions
+    raised by func are re-raised when the corresponding result is reached,
+    and any outstanding work is cancelled when the iterator is closed.
+    """
+
+    reads_ahead = True
+
+    def __init__(
+        self,
+        func: Callable[[TEnd], TOther],
+        workers: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        ordered: bool = True,
+    ) -> None:
+        n_workers = min(32, (os.cpu_count() or 1) + 4) if workers is None else workers
+        in_flight = 2 * n_workers if max_in_flight is None else max_in_flight
+        if min(n_workers, in_flight) < 1:
+            raise ValueError("workers and max_in_flight must both be at least 1")
+
+        @functools.wraps(func)
+        def new_action(previous_step: Iterator[TEnd]) -> Iterator[TOther]:
+            executor = ThreadPoolExecutor(max_workers=n_workers)
+            try:
+                yield from _executor_map(
+                    executor, func, previous_step, 1, in_flight, ordered
+                )
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        super().__init__(new_action)
+
+
+def _put_until_stopped(
+    items: "queue.Queue[Tuple[str, Any]]",
+    item: Tuple[str, Any],
+    stop: threading.Event,
+) -> bool:
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=0.1)
+        except queue.Full:
+            continue
+        return True
+    return False
+
+
+def _produce(
+    iterator: Iterator[Any],
+    items: "queue.Queue[Tuple[str, Any]]",
+    stop: threading.Event,
+) -> None:
+    try:
+        for element in iterator:
+            if not _put_until_stopped(items, ("item", element), stop):
+                return
+    except BaseException as err:  # noqa: BLE001
+        _put_until_stopped(items, ("error", err), stop)
+    else:
+        _put_until_stopped(items, ("end", None), stop)
+    finally:
+        # Closed from the thread advancing it, as the upstream steps may
+        # hold resources tied to it
+        _close(iterator)
+
+
+class prefetch(ChainLink[TEnd, TEnd]):  # noqa: N801
+    """Pull up to n elements ahead of the consumer on a background thread.
+
+    This lets the upstream steps (eg reading files) run while the downstream
+    steps are processing earlier elements. Exceptions raised upstream are
+    re-raised to the consumer, and closing the iterator stops the thread.
+    """
+
+    reads_ahead = True
+
+    def __init__(self, n: int = 1) -> None:
+        if n < 1:
+            raise ValueError("n must be at least 1")
+
+        def prefetch_(previous_step: Iterator[TEnd]) -> Iterator[TEnd]:
+            items: queue.Queue[Tuple[str, Any]] = queue.Queue(maxsize=n)
+            stop = threading.Event()
+            thread = threading.Thread(
+                target=_produce,
+                args=(previous_step, items, stop),
+                name="prefetch",
+                daemon=True,
+            )
+            thread.start()
+            try:
+                while True:
+                    kind, value = items.get()
+                    if kind == "end":
+                        return
+                    if kind == "error":
+                        raise value
+                    yield value
+            finally:
+                stop.set()
+                thread.join()
+
+        super().__init__(prefetch_)
+
+
+class _FanOut:
+    """Shares the elements of one iterator between several branches.
+
+    Each element pulled from upstream for one branch is buffered for the
+    other (still active) branches, up to buffer_size elements each.
+    """
+
+    def __init__(self, upstream: Iterator[Any], branches: int, buffer_size: int):
+        self._upstream = upstream
+        self._buffer_size = buffer_size
+        self._exhausted = False
+        self.buffers: List[Deque[Any]] = [deque() for _ in range(branches)]
+        self.active = [True] * branches
+
+    def next_for(self, branch: int) -> Any:
+        buffer = self.buffers[branch]
+        if buffer:
+            return buffer.popleft()
+        if self._exhausted:
+            raise StopIteration
+
+        try:
+            value = next(self._upstream)
+        except StopIteration:
+            self._exhausted = True
+            raise
+
+        for other, other_buffer in enumerate(self.buffers):
+            if other == branch or not self.active[other]:
+                continue
+            if len(other_buffer) >= self._buffer_size:
+                msg = f"tee branch {other} has {len(other_buffer)} buffered elements"
+                msg += " waiting; increase buffer_size, or use threaded=True"
+                raise RuntimeError(msg)
+            other_buffer.append(value)
+        return value
+
+    def finish(self, branch: int) -> None:
+        self.active[branch] = False
+        self.buffers[branch].clear()
+
+
+class _BranchInput(Iterator[Any]):
+    def __init__(self, fan_out: _FanOut, branch: int) -> None:
+        self._fan_out = fan_out
+        self._branch = branch
+
+    def __next__(self) -> Any:
+        return self._fan_out.next_for(self._branch)
+
+
+def _tee_sequential(
+    upstream: Iterator[Any],
+    branches: Sequence[Callable[[Iterator[Any]], Iterator[Any]]],
+    buffer_size: int,
+) -> List[List[Any]]:
+    fan_out = _FanOut(upstream, len(branches), buffer_size)
+    outputs = [branch(_BranchInput(fan_out, i)) for i, branch in enumerate(branches)]
+    results: List[List[Any]] = [[] for _ in branches]
+    while any(fan_out.active):
+        # Advance the branch furthest behind, so buffers are kept short
+        branch = max(
+            (i for i, active in enumerate(fan_out.active) if active),
+            key=lambda i: len(fan_out.buffers[i]),
+        )
+        try:
+            results[branch].append(next(outputs[branch]))
+        except StopIteration:  # noqa: PERF203
+            fan_out.finish(branch)
+    return results
+
+
+def _queue_iterator(items: "queue.Queue[Tuple[str, Any]]") -> Iterator[Any]:
+    while True:
+        kind, value = items.get()
+        if kind == "end":
+            return
+        yield value
+
+
+def _tee_threaded(
+    upstream: Iterator[Any],
+    branches: Sequence[Callable[[Iterator[Any]], Iterator[Any]]],
+    buffer_size: int,
+) -> List[List[Any]]:
+    queues: List[queue.Queue[Tuple[str, Any]]] = [
+        queue.Queue(maxsize=buffer_size) for _ in branches
+    ]
+    finished = [threading.Event() for _ in branches]
+    results: List[List[Any]] = [[] for _ in branches]
+    errors: List[BaseException] = []
+
+    def run_branch(i: int) -> None:
+        try:
+            results[i].extend(branches[i](_queue_iterator(queues[i])))
+        except BaseException as err:  # noqa: BLE001
+            errors.append(err)
+        finally:
+            finished[i].set()
+
+    threads = [
+        threading.Thread(target=run_branch, args=(i,), name=f"tee-{i}", daemon=True)
+        for i in range(len(branches))
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for element in upstream:
+            for items, done in zip(queues, finished):
+                _put_until_stopped(items, ("item", element), done)
+            if errors:
+                break
+    finally:
+        for items, done in zip(queues, finished):
+            _put_until_stopped(items, ("end", None), done)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    return results
+
+
+class tee(ChainLink[TEnd, Tuple[List[Any], ...]]):  # noqa: N801
+    """Feed every element into each of several branches, in a single pass.
+
+    Each branch is a chain (or any step taking an iterator), and once the
+    input is exhausted a single tuple is yielded, containing a list of the
+    outputs of each branch. As the branches are typically sinks (eg writing
+    files, or aggregating), these lists are expected to be short. The
+    counts of each branch are available from its own get_counts.
+
+    Up to buffer_size elements are buffered for each branch. By default
+    (threaded=True), each branch runs on its own thread, with the upstream
+    blocking until every branch has room for the next element. With
+    threaded=False, the branches are advanced in turn from this thread, and
+    a RuntimeError is raised if a branch gets more than buffer_size elements
+    behind, as happens once a sink branch (taking all of its input before
+    yielding) is advanced, so this only suits branches yielding as they go.
+    """
+
+    def __init__(
+        self,
+        *branches: Callable[[Iterator[TEnd]], Iterator[Any]],
+        buffer_size: int = 1000,
+        threaded: bool = True,
+    ) -> None:
+        if len(branches) == 0:
+            raise ValueError("tee needs at least one branch")
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be at least 1")
+
+        def tee_(previous_step: Iterator[TEnd]) -> Iterator[Tuple[List[Any], ...]]:
+            run = _tee_threaded if threaded else _tee_sequential
+            yield tuple(run(previous_step, branches, buffer_size))
+
+        super().__init__(tee_)
+
+
+def _approximate_size(element: Any) -> int:
+    """The size of an element, and of the elements of a container one deep."""
+    size = sys.getsizeof(element)
+    if isinstance(element, dict):
+        size += sum(sys.getsizeof(v) for v in element.values())
+    elif isinstance(element, (list, tuple)):
+        size += sum(sys.getsizeof(v) for v in element)
+    return size
+
+
+class sorted_by(ChainLink[TEnd, TEnd]):  # noqa: N801
+    """Sort the elements, spilling sorted runs to disk beyond memory_limit.
+
+    Elements are held in memory until their approximate size reaches
+    memory_limit (in bytes), and then sorted and pickled to a temporary file
+    (in spill_dir, if given). Once the input is exhausted, the runs are
+    lazily merged, holding a chunk of each run in memory. The sort is
+    stable, and without exceeding memory_limit nothing is written to disk.
+    """
+
+    reads_ahead = True
+
+    def __init__(
+        self,
+        key: Optional[Callable[[TEnd], Any]] = None,
+        *,
+        reverse: bool = False,
+        memory_limit: int = 256 * 1024 * 1024,
+        spill_dir: Optional[str] = None,
+    ) -> None:
+        if memory_limit < 1:
+            raise ValueError("memory_limit must be at least 1")
+
+        def sorted_by_(previous_step: Iterator[TEnd]) -> Iterator[TEnd]:
+            spilled: List[Tuple[IO[bytes], int]] = []
+            try:
+                run: List[TEnd] = []
+                run_size = 0
+                for element in previous_step:
+                    run.append(element)
+                    run_size += _approximate_size(element)
+                    if run_size >= memory_limit:
+                        run.sort(key=key, reverse=reverse)
+                        file = spill_file(spill_dir)
+                        spilled.append((file, write_chunks(file, run)))
+                        run = []
+                        run_size = 0
+
+                run.sort(key=key, reverse=reverse)
+                if len(spilled) == 0:
+                    yield from run
+                    return
+
+                runs = [read_chunks(file, chunks) for file, chunks in spilled]
+                yield from heapq.merge(
+                    *runs, iter(run), key=cast(Any, key), reverse=reverse
+                )
+            finally:
+                for file, _ in spilled:
+                    file.close()
+
+        super().__init__(sorted_by_)
+
+
+class cached_mapping(ChainLink[TEnd, TOther]):  # noqa: N801
+    """Apply func to each element, caching the results by key.
+
+    The key is the element itself, unless a key function of it is given.
+    At most maxsize results are cached (None for no limit), evicting the
+    least recently used, and each expires ttl seconds after being cached.
+    The memory backend keeps the cache for the lifetime of the link, while
+    the disk backend keeps it (with pickled keys and results) in an sqlite
+    file at path, to be reused by later runs. The cache hits, misses,
+    evictions and size are reported in the step stats.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        func: Callable[[TEnd], TOther],
+        key: Optional[Callable[[TEnd], Any]] = None,
+        *,
+        maxsize: Optional[int] = 1024,
+        ttl: Optional[float] = None,
+        backend: Literal["memory", "disk"] = "memory",
+        path: Optional[str] = None,
+    ) -> None:
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        if backend == "disk" and path is None:
+            raise ValueError("A path is needed for the disk backend")
+        if backend not in ("memory", "disk"):
+            raise ValueError(f"Unknown cache backend {backend}")
+        self._cache: Optional[Cache] = (
+            MemoryCache(maxsize, ttl) if backend == "memory" else None
+        )
+
+        @functools.wraps(func)
+        def new_action(previous_step: Iterator[TEnd]) -> Iterator[TOther]:
+            if path is not None and backend == "disk":
+                self._cache = SqliteCache(path, maxsize, ttl)
+            cache = cast(Cache, self._cache)
+            try:
+                for element in previous_step:
+                    cache_key = element if key is None else key(element)
+                    found, value = cache.get(cache_key)
+                    if not found:
+                        value = func(element)
+                        cache.put(cache_key, value)
+                    yield value
+            finally:
+                cache.close()
+
+        super().__init__(new_action)
+
+    def get_extra_stats(self) -> Dict[str, Any]:
+        if self._cache is None:
+            return {}
+        return self._cache.info()
+
+
+class distinct(ChainLink[TEnd, TEnd]):  # noqa: N801
+    """Drop the elements with a key (by default the element) already seen.
+
+    With exact=True, the keys seen are held as 64 bit digests in a compact
+    hash table (pre-sized for capacity keys, and growing as needed). With
+    exact=False, they are held in a Bloom filter sized for capacity keys
+    (by default a million), which wrongly drops a new element with a
+    probability of around error_rate. The number of distinct keys and the
+    memory used by them are reported in the step stats.
+
+    Keys are compared by value as in a set, so 1, 1.0 and True are the same
+    key, and dicts are the same whatever the order of their items. Keys
+    must be numbers, strings, bytes, or containers of them, or otherwise
+    have a repr of their value (a TypeError is raised for objects with the
+    default repr).
+    """
+
+    def __init__(
+        self,
+        key: Optional[Callable[[TEnd], Any]] = None,
+        *,
+        exact: bool = True,
+        capacity: Optional[int] = None,
+        error_rate: float = 0.001,
+    ) -> None:
+        if capacity is not None and capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self._seen: Union[DigestSet, BloomSet, None] = None
+
+        def distinct_(previous_step: Iterator[TEnd]) -> Iterator[TEnd]:
+            if exact:
+                self._seen = DigestSet(capacity or 1024)
+            else:
+                self._seen = BloomSet(capacity or 1_000_000, error_rate)
+            add = self._seen.add
+            if key is None:
+                return filter(add, previous_step)
+            return (element for element in previous_step if add(key(element)))
+
+        super().__init__(distinct_)
+
+    def get_extra_stats(self) -> Dict[str, Any]:
+        if self._seen is None:
+            return {"distinct_keys": 0, "memory_bytes": 0}
+        return {
+            "distinct_keys": len(self._seen),
+            "memory_bytes": self._seen.memory_bytes,
+        }
+
+
+class tumbling_window(ChainLink[Any, Dict[str, Any]]):  # noqa: N801
+    """Aggregate consecutive, non-overlapping windows of the elements.
+
+    Windows are of size elements, or with a timestamp (a key of each element
+    or a function of it), of timestamps in intervals of size from origin
+    (by default the first timestamp), with elements in timestamp order.
+    Each window is output as a dict of the window_start, window_end and the
+    result of each of the aggregates, without holding its elements.
+    """
+
+    def __init__(
+        self,
+        size: Any,
+        aggregates: Dict[str, Aggregate],
+        *,
+        timestamp: Optional[Timestamp] = None,
+        origin: Any = None,
+    ) -> None:
+        if timestamp is None and size < 1:
+            raise ValueError("size must be at least 1")
+
+        def tumbling_window_(previous_step: Iterator[Any]) -> Iterator[Dict[str, Any]]:
+            return windows.tumbling(previous_step, size, aggregates, timestamp, origin)
+
+        super().__init__(tumbling_window_)
+
+
+class sliding_window(ChainLink[Any, Dict[str, Any]]):  # noqa: N801
+    """Aggregate windows of size, starting every step, of the elements.
+
+    Windows are by count or timestamp, and output, as for tumbling_window.
+    By count, only full windows are output, whereas by timestamp every window
+    holding any elements is output (and size must be a multiple of step).
+    The elements are aggregated into panes of the greatest common divisor of
+    size and step, and each window is updated as panes are added and removed,
+    so only the aggregate states of its panes are held.
+    """
+
+    reads_ahead = True
+
+    def __init__(  # noqa: PLR0913
+        self,
+        size: Any,
+        step: Any,
+        aggregates: Dict[str, Aggregate],
+        *,
+        timestamp: Optional[Timestamp] = None,
+        origin: Any = None,
+    ) -> None:
+        if timestamp is None and (size < 1 or step < 1):
+            raise ValueError("size and step must be at least 1")
+
+        def sliding_window_(previous_step: Iterator[Any]) -> Iterator[Dict[str, Any]]:
+            return windows.sliding(
+                previous_step, size, step, aggregates, timestamp, origin
+            )
+
+        super().__init__(sliding_window_)
+
+
+class session_window(ChainLink[Any, Dict[str, Any]]):  # noqa: N801
+    """Aggregate sessions of elements, ending at a gap between timestamps.
+
+    A session ends when the next timestamp is more than gap after the last.
+    The window_start and window_end of a session are its first and last
+    timestamps.
+    """
+
+    def __init__(
+        self,
+        gap: Any,
+        aggregates: Dict[str, Aggregate],
+        *,
+        timestamp: Timestamp,
+    ) -> None:
+        def session_window_(previous_step: Iterator[Any]) -> Iterator[Dict[str, Any]]:
+            return windows.session(previous_step, gap, aggregates, timestamp)
+
+        super().__init__(session_window_)
+
+
+class amapping(AsyncChainLink[TEnd, TOther]):  # noqa: N801
+    """Apply func to each element of an async chain.
+
+    A coroutine function is awaited, with up to concurrency calls running
+    at once and results yielded in input order. A plain function is called
+    inline on the event loop.
+    """
+
+    @overload
+    def __init__(
+        self: "amapping[TEnd, TOther]",
+        func: Callable[[TEnd], Awaitable[TOther]],
+        concurrency: int = 1,
+    ) -> None:
+        ...
+
+    @overload
+    def __init__(
+        self: "amapping[TEnd, TOther]",
+        func: Callable[[TEnd], TOther],
+        concurrency: int = 1,
+    ) -> None:
+        ...
+
+    def __init__(
+        self,
+        func: Callable[[TEnd], Union[TOther, Awaitable[TOther]]],
+        concurrency: int = 1,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        if not inspect.iscoroutinefunction(func):
+            sync_func = cast(Callable[[TEnd], TOther], func)
+
+            @functools.wraps(func)
+            async def new_action(
+                previous_step: AsyncIterator[TEnd],
+            ) -> AsyncIterator[TOther]:
+                async for element in previous_step:
+                    yield sync_func(element)
+
+            super().__init__(new_action)
+            return
+
+        async_func = cast(Callable[[TEnd], Awaitable[TOther]], func)
+
+        @functools.wraps(func)
+        async def new_async_action(
+            previous_step: AsyncIterator[TEnd],
+        ) -> AsyncIterator[TOther]:
+            pending: Deque[asyncio.Future[TOther]] = deque()
+            try:
+                async for element in previous_step:
+                    pending.append(asyncio.ensure_future(async_func(element)))
+                    if len(pending) >= concurrency:
+                        yield await pending.popleft()
+                while pending:
+                    yield await pending.popleft()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+        super().__init__(new_async_action)
+
+
+class afiltering(AsyncChainLink[TEnd, TEnd]):  # noqa: N801
+    """Filter the elements of an async chain.
+
+    func can be a coroutine function, which is awaited, or a plain
+    function, which is called inline on the event loop.
+    """
+
+    def __init__(self, func: Callable[[TEnd], Union[bool, Awaitable[bool]]]) -> None:
+        is_async = inspect.iscoroutinefunction(func)
+
+        @functools.wraps(func)
+        async def new_action(previous_step: AsyncIterator[TEnd]) -> AsyncIterator[TEnd]:
+            async for element in previous_step:
+                keep = func(element)
+                if is_async:
+                    keep = await cast(Awaitable[bool], keep)
+                if keep:
+                    yield element
+
+        super().__init__(new_action)
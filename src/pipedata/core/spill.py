@@ -0,0 +1,29 @@
+import pickle
+import tempfile
+from typing import IO, Any, Iterator, Optional, Sequence
+
+# Elements are pickled in chunks of this many, so that reading them back
+# only holds one chunk of each file in memory
+SPILL_CHUNK = 1000
+
+
+def spill_file(directory: Optional[str]) -> IO[bytes]:
+    """A temporary file (in directory, if given), deleted once closed."""
+    return tempfile.TemporaryFile(dir=directory)  # noqa: SIM115
+
+
+def write_chunks(file: IO[bytes], elements: Sequence[Any]) -> int:
+    """Append the elements to the file, returning the number of chunks."""
+    chunks = 0
+    for start in range(0, len(elements), SPILL_CHUNK):
+        chunk = elements[start : start + SPILL_CHUNK]
+        pickle.dump(chunk, file, protocol=pickle.HIGHEST_PROTOCOL)
+        chunks += 1
+    return chunks
+
+
+def read_chunks(file: IO[bytes], chunks: int) -> Iterator[Any]:
+    """The elements of the chunks written to the file, in order."""
+    file.seek(0)
+    for _ in range(chunks):
+        yield from pickle.load(file)  # noqa: S301
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 import functools
+import heapq
 import itertools
+from collections import deque
+from types import TracebackType
 from typing import (
     Any,
     Callable,
@@ -10,22 +13,43 @@ from typing import (
     Iterator,
     List,
     Optional,
+    Tuple,
+    Type,
     TypeVar,
+    Union,
+    cast,
     overload,
 )
 
+from . import ops
 from .chain import Chain, ChainType
+from .checkpoint import Checkpoint
+from .links import Instrumentation, MultiSourceLink
 
 TStart = TypeVar("TStart")
 TEnd = TypeVar("TEnd")
 TNewEnd = TypeVar("TNewEnd")
 
 
+def _reads_ahead(func: Callable[[Iterator[Any]], Iterator[Any]]) -> bool:
+    if isinstance(func, ChainType):
+        return any(_reads_ahead(step) for step in func._steps())
+    return bool(getattr(func, "reads_ahead", False))
+
+
 class StreamType(Iterable[TEnd]):
-    def __init__(self, items: Iterable[TStart], chain: ChainType[TStart, TEnd]) -> None:
+    def __init__(
+        self,
+        items: Iterable[TStart],
+        chain: ChainType[TStart, TEnd],
+        checkpoint: Optional[Checkpoint] = None,
+    ) -> None:
         self._items = iter(items)
         self._chain = chain
+        self._checkpoint = checkpoint
         self._iter = self._chain(self._items)
+        if checkpoint is not None:
+            self._iter = checkpoint.track(self._iter)
 
     def __iter__(self) -> Iterator[TEnd]:
         return self
@@ -36,12 +60,22 @@ class StreamType(Iterable[TEnd]):
     def then(
         self, func: Callable[[Iterator[TEnd]], Iterator[TNewEnd]]
     ) -> StreamType[TNewEnd]:
-        return StreamType(self._items, self._chain.then(func))
+        if self._checkpoint is not None and _reads_ahead(func):
+            msg = "Steps reading ahead of their outputs cannot be checkpointed"
+            raise ValueError(msg)
+        return StreamType(self._items, self._chain.then(func), self._checkpoint)
 
     def __or__(
         self, func: Callable[[Iterator[TEnd]], Iterator[TNewEnd]]
     ) -> StreamType[TNewEnd]:
-        return StreamType(self._items, self._chain.then(func))
+        return self.then(func)
+
+    def compile(self) -> StreamType[TEnd]:  # noqa: A003
+        """Return the stream with its chain compiled (see ChainType.compile).
+
+        This should be called before the stream is iterated.
+        """
+        return StreamType(self._items, self._chain.compile(), self._checkpoint)
 
     @overload
     def reduce(self, func: Callable[[TEnd, TEnd], TEnd]) -> TEnd:
@@ -58,16 +92,122 @@ class StreamType(Iterable[TEnd]):
             return functools.reduce(func, self)
         return functools.reduce(func, self, initializer)
 
+    def tee(
+        self,
+        *branches: Callable[[Iterator[TEnd]], Iterator[Any]],
+        buffer_size: int = 1000,
+        threaded: bool = True,
+    ) -> Tuple[List[Any], ...]:
+        """Run the stream through several branches, returning their outputs.
+
+        See ops.tee for the details of buffering and threading.
+        """
+        step = ops.tee(*branches, buffer_size=buffer_size, threaded=threaded)
+        return next(self.then(step))
+
     def to_list(
         self,
         stop: Optional[int] = None,
     ) -> List[TEnd]:
         return list(itertools.islice(self, stop))
 
+    def close(self) -> None:
+        """Stop the stream early, closing each step of the chain."""
+        self._chain.close()
+
+    def __enter__(self) -> StreamType[TEnd]:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
     def get_counts(self) -> List[Dict[str, Any]]:
         return self._chain.get_counts()
 
+    def get_stats(self) -> List[Dict[str, Any]]:
+        return self._chain.get_stats()
+
 
 class Stream(StreamType[TEnd]):
-    def __init__(self, items: Iterable[TEnd]) -> None:
-        super().__init__(items, Chain[TEnd]())
+    def __init__(
+        self,
+        items: Iterable[TEnd],
+        instrumentation: Instrumentation = Instrumentation.COUNTS,
+        checkpoint: Union[str, Checkpoint, None] = None,
+    ) -> None:
+        """A stream of the items.
+
+        With a checkpoint (or the path of its manifest), items completed by
+        an earlier run are skipped, and the completed items are recorded.
+        """
+        if isinstance(checkpoint, str):
+            checkpoint = Checkpoint(checkpoint)
+        if checkpoint is not None:
+            items = checkpoint.pending(items)
+        super().__init__(items, Chain[TEnd](instrumentation), checkpoint)
+
+
+_DONE = object()
+
+
+def _interleave(iterators: List[Iterator[Any]]) -> Iterator[Any]:
+    active = deque(iterators)
+    while active:
+        iterator = active.popleft()
+        value = next(iterator, _DONE)
+        if value is not _DONE:
+            yield value
+            active.append(iterator)
+
+
+def _combined(
+    streams: Tuple[Iterable[Any], ...],
+    link: MultiSourceLink[TEnd],
+    instrumentation: Instrumentation,
+) -> StreamType[TEnd]:
+    return StreamType(streams, ChainType(None, link, instrumentation))
+
+
+def merge_sorted(
+    *streams: Iterable[TEnd],
+    key: Optional[Callable[[TEnd], Any]] = None,
+    reverse: bool = False,
+    instrumentation: Instrumentation = Instrumentation.COUNTS,
+) -> StreamType[TEnd]:
+    """Merge streams, each already sorted, into a single sorted stream.
+
+    This is a k-way merge with a heap, holding one element of each stream
+    in memory at a time.
+    """
+
+    def merge(iterators: List[Iterator[TEnd]]) -> Iterator[TEnd]:
+        return heapq.merge(*iterators, key=cast(Any, key), reverse=reverse)
+
+    return _combined(streams, MultiSourceLink("merge_sorted", merge), instrumentation)
+
+
+def zip_streams(
+    *streams: Iterable[Any],
+    instrumentation: Instrumentation = Instrumentation.COUNTS,
+) -> StreamType[Tuple[Any, ...]]:
+    """Zip streams element by element into tuples, until one is exhausted."""
+
+    def zip_(iterators: List[Iterator[Any]]) -> Iterator[Tuple[Any, ...]]:
+        return zip(*iterators)
+
+    return _combined(streams, MultiSourceLink("zip_streams", zip_), instrumentation)
+
+
+def interleave(
+    *streams: Iterable[TEnd],
+    instrumentation: Instrumentation = Instrumentation.COUNTS,
+) -> StreamType[TEnd]:
+    """Take an element from each stream in turn, until all are exhausted."""
+    return _combined(
+        streams, MultiSourceLink("interleave", _interleave), instrumentation
+    )
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import itertools
+import math
+import operator
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, Union
+
+from .aggregates import Aggregate
+
+Timestamp = Union[str, Callable[[Any], Any]]
+Pane = Tuple[int, int, List[Any]]
+
+_EMPTY = object()
+
+
+def _timestamp_getter(timestamp: Timestamp) -> Callable[[Any], Any]:
+    if isinstance(timestamp, str):
+        return operator.itemgetter(timestamp)
+    return timestamp
+
+
+def _with_origin(
+    elements: Iterator[Any], timestamp: Optional[Timestamp], origin: Any
+) -> Tuple[Iterator[Any], Any]:
+    """The elements, and the origin of timestamp windows (by default the
+    first timestamp)."""
+    if timestamp is None or origin is not None:
+        return elements, origin
+    first = next(elements, _EMPTY)
+    if first is _EMPTY:
+        return elements, origin
+    return itertools.chain([first], elements), _timestamp_getter(timestamp)(first)
+
+
+def _results(
+    start: Any, end: Any, aggregates: Dict[str, Aggregate], states: List[Any]
+) -> Dict[str, Any]:
+    results = {"window_start": start, "window_end": end}
+    for (name, aggregate), state in zip(aggregates.items(), states):
+        results[name] = aggregate.result(state)
+    return results
+
+
+def _panes(
+    elements: Iterator[Any],
+    aggregates: Dict[str, Aggregate],
+    pane_size: Any,
+    timestamp: Optional[Timestamp],
+    origin: Any,
+) -> Iterator[Pane]:
+    """The (index, number of elements, aggregate states) of each pane.
+
+    Panes are consecutive runs of pane_size elements, or of timestamps in
+    intervals of pane_size from the origin, only yielded once complete.
+    Panes without any elements are skipped.
+    """
+    get_timestamp = None if timestamp is None else _timestamp_getter(timestamp)
+    aggregate_list = list(aggregates.values())
+    current: Optional[int] = None
+    count = 0
+    states: List[Any] = []
+    for position, element in enumerate(elements):
+        if get_timestamp is None:
+            index = position // pane_size
+        else:
+            index = int((get_timestamp(element) - origin) // pane_size)
+
+        if index != current:
+            if current is not None:
+                if index < current:
+                    msg = f"Window timestamps must be non-decreasing, at {element!r}"
+                    raise ValueError(msg)
+                yield current, count, states
+            current = index
+            count = 0
+            states = [aggregate.create() for aggregate in aggregate_list]
+
+        count += 1
+        states = [
+            aggregate.update(state, element)
+            for aggregate, state in zip(aggregate_list, states)
+        ]
+
+    if current is not None:
+        yield current, count, states
+
+
+def tumbling(
+    elements: Iterator[Any],
+    size: Any,
+    aggregates: Dict[str, Aggregate],
+    timestamp: Optional[Timestamp],
+    origin: Any,
+) -> Iterator[Dict[str, Any]]:
+    elements, origin = _with_origin(elements, timestamp, origin)
+    for index, count, states in _panes(elements, aggregates, size, timestamp, origin):
+        if timestamp is None:
+            start = index * size
+            yield _results(start, start + count, aggregates, states)
+        else:
+            start = origin + index * size
+            yield _results(start, start + size, aggregates, states)
+
+
+class _SlidingWindow:
+    """The panes of a window, with the combined state of each aggregate.
+
+    Windows are identified by the index of their last pane, and by count
+    only the full windows starting every step are output.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        aggregates: Dict[str, Aggregate],
+        size: Any,
+        step: Any,
+        pane_size: Any,
+        origin: Any,
+    ) -> None:
+        self._aggregates = aggregates
+        self._size = size
+        self._step = step
+        self._pane_size = pane_size
+        self._origin = origin
+        self.panes = size // pane_size
+        self._window: Deque[Pane] = deque()
+        self._slidings = [aggregate.sliding() for aggregate in aggregates.values()]
+
+    def push(self, pane: Pane) -> None:
+        index, _, states = pane
+        self._window.append(pane)
+        for sliding, state in zip(self._slidings, states):
+            sliding.push(index, state)
+
+    def _slide_to(self, last_index: int) -> None:
+        window = self._window
+        while window and window[0][0] <= last_index - self.panes:
+            index, _, states = window.popleft()
+            for sliding, state in zip(self._slidings, states):
+                sliding.evict(index, state)
+
+    def results(self, last_index: int) -> Iterator[Dict[str, Any]]:
+        """The results of the window ending with pane last_index, if any."""
+        self._slide_to(last_index)
+        if self._origin is None:
+            end = (last_index + 1) * self._pane_size
+            if end < self._size or (end - self._size) % self._step != 0:
+                return
+        else:
+            end = self._origin + (last_index + 1) * self._pane_size
+
+        states = [sliding.state() for sliding in self._slidings]
+        yield _results(end - self._size, end, self._aggregates, states)
+
+
+def sliding(  # noqa: PLR0913
+    elements: Iterator[Any],
+    size: Any,
+    step: Any,
+    aggregates: Dict[str, Aggregate],
+    timestamp: Optional[Timestamp],
+    origin: Any,
+) -> Iterator[Dict[str, Any]]:
+    """Windows of size, starting every step, built from panes.
+
+    Each pane is aggregated once, and the window combines the states of its
+    panes, so memory is proportional to the number of panes in a window
+    rather than the number of elements.
+    """
+    if timestamp is None:
+        pane_size = math.gcd(size, step)
+    else:
+        pane_size = step
+        if size % step != 0:
+            raise ValueError("For timestamp windows, size must be a multiple of step")
+    elements, origin = _with_origin(elements, timestamp, origin)
+    window = _SlidingWindow(aggregates, size, step, pane_size, origin)
+
+    last: Optional[int] = None
+    for pane in _panes(elements, aggregates, pane_size, timestamp, origin):
+        index, count, _ = pane
+        if last is not None:
+            # Windows ending in the gap between panes, still holding old panes
+            for gap_index in range(last + 1, min(index, last + window.panes)):
+                yield from window.results(gap_index)
+        window.push(pane)
+        if timestamp is not None or count == pane_size:
+            yield from window.results(index)
+        last = index
+
+    if last is not None and timestamp is not None:
+        for trailing_index in range(last + 1, last + window.panes):
+            yield from window.results(trailing_index)
+
+
+def session(
+    elements: Iterator[Any],
+    gap: Any,
+    aggregates: Dict[str, Aggregate],
+    timestamp: Timestamp,
+) -> Iterator[Dict[str, Any]]:
+    get_timestamp = _timestamp_getter(timestamp)
+    aggregate_list = list(aggregates.values())
+    start: Any = None
+    last: Any = None
+    states: List[Any] = []
+    for element in elements:
+        value = get_timestamp(element)
+        if last is not None:
+            if value < last:
+                msg = f"Window timestamps must be non-decreasing, at {element!r}"
+                raise ValueError(msg)
+            if value - last > gap:
+                yield _results(start, last, aggregates, states)
+                last = None
+        if last is None:
+            start = value
+            states = [aggregate.create() for aggregate in aggregate_list]
+        last = value
+        states = [
+            aggregate.update(state, element)
+            for aggregate, state in zip(aggregate_list, states)
+        ]
+
+    if last is not None:
+        yield _results(start, last, aggregates, states)
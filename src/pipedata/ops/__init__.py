@@ -1,10 +1,37 @@
-from .files import zipped_files
+from .aggregation import group_aggregate
+from .caching import FileCache, set_file_cache
+from .columnar import filter_batches, rechunk_batches, select_columns, with_columns
+from .discovery import discovered_files
+from .files import (
+    arrow_ipc_reader,
+    compressed_files,
+    read_from_parquet,
+    tarred_files,
+    zipped_files,
+    zipped_files_reader,
+)
+from .joins import hash_join
 from .records import csv_records, json_records
-from .storage import parquet_writer
+from .storage import arrow_ipc_writer, parquet_writer
 
 __all__ = [
+    "FileCache",
+    "set_file_cache",
+    "discovered_files",
     "zipped_files",
+    "zipped_files_reader",
+    "tarred_files",
+    "compressed_files",
+    "read_from_parquet",
+    "arrow_ipc_reader",
     "csv_records",
     "json_records",
     "parquet_writer",
+    "arrow_ipc_writer",
+    "filter_batches",
+    "select_columns",
+    "with_columns",
+    "rechunk_batches",
+    "group_aggregate",
+    "hash_join",
 ]
@@ -0,0 +1,274 @@
+import logging
+import operator
+import sys
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import pyarrow as pa  # type: ignore
+
+from pipedata.core.aggregates import Aggregate, Count, Max, Mean, Min, Sum
+from pipedata.core.spill import read_chunks, spill_file, write_chunks
+
+from .storage import _batched
+
+logger = logging.getLogger(__name__)
+
+GroupKey = Union[str, Sequence[str], Callable[[Any], Any]]
+
+_GROUP_OVERHEAD = 200
+
+# The pyarrow aggregations giving the partial state of each aggregate
+_ARROW_AGGREGATIONS: Dict[type, Tuple[str, ...]] = {
+    Count: ("count",),
+    Sum: ("sum",),
+    Mean: ("sum", "count"),
+    Min: ("min",),
+    Max: ("max",),
+}
+
+
+def _key_names(key: GroupKey) -> Optional[List[str]]:
+    if isinstance(key, str):
+        return [key]
+    if callable(key):
+        return None
+    return list(key)
+
+
+def _key_getter(key: GroupKey) -> Callable[[Any], Any]:
+    names = _key_names(key)
+    if names is None:
+        return key  # type: ignore[return-value]
+    return operator.itemgetter(*names)
+
+
+def _is_arrow_compatible(key: GroupKey, aggregates: Dict[str, Aggregate]) -> bool:
+    if _key_names(key) is None:
+        return False
+    for aggregate in aggregates.values():
+        if type(aggregate) not in _ARROW_AGGREGATIONS:
+            return False
+        # Only a field name can be given to pyarrow, and no field only
+        # counts rows
+        field = aggregate.field
+        if not (isinstance(field, str) or (field is None and type(aggregate) is Count)):
+            return False
+    return True
+
+
+class _GroupTable:
+    """The partial aggregate states of each group, spilling to disk.
+
+    Once the approximate size of the groups reaches memory_limit, they are
+    hash partitioned into temporary files, and the partitions are merged
+    separately at the end, so only one partition's groups are then in memory.
+    """
+
+    def __init__(
+        self,
+        aggregates: Dict[str, Aggregate],
+        memory_limit: int,
+        spill_dir: Optional[str],
+        partitions: int,
+    ) -> None:
+        self._aggregates = list(aggregates.values())
+        self._memory_limit = memory_limit
+        self._spill_dir = spill_dir
+        self._partitions = partitions
+        self.groups: Dict[Any, List[Any]] = {}
+        self._size = 0
+        self._spilled: List[Tuple[IO[bytes], int]] = []
+
+    def states(self, key: Any) -> List[Any]:
+        states = self.groups.get(key)
+        if states is None:
+            if self._size >= self._memory_limit:
+                self.spill()
+            states = [aggregate.create() for aggregate in self._aggregates]
+            self.groups[key] = states
+            self._size += sys.getsizeof(key) + _GROUP_OVERHEAD
+        return states
+
+    def update(self, key: Any, element: Any) -> None:
+        states = self.states(key)
+        for i, aggregate in enumerate(self._aggregates):
+            states[i] = aggregate.update(states[i], element)
+
+    def merge(self, key: Any, partials: List[Any]) -> None:
+        states = self.states(key)
+        for i, aggregate in enumerate(self._aggregates):
+            states[i] = aggregate.merge(states[i], partials[i])
+
+    def spill(self) -> None:
+        if len(self._spilled) == 0:
+            logger.info(f"Spilling groups to disk, beyond {self._memory_limit=}")
+            self._spilled = [
+                (spill_file(self._spill_dir), 0) for _ in range(self._partitions)
+            ]
+        partitioned: List[List[Tuple[Any, List[Any]]]] = [
+            [] for _ in range(self._partitions)
+        ]
+        for key, states in self.groups.items():
+            partitioned[hash(key) % self._partitions].append((key, states))
+        for i, entries in enumerate(partitioned):
+            file, chunks = self._spilled[i]
+            self._spilled[i] = (file, chunks + write_chunks(file, entries))
+        self.groups = {}
+        self._size = 0
+
+    def results(self) -> Iterator[Tuple[Any, List[Any]]]:
+        """The key and results of each group, once all have been added."""
+        if len(self._spilled) == 0:
+            yield from self._results()
+            return
+
+        self.spill()
+        spilled, self._spilled = self._spilled, []
+        # With the partitions already on disk, merging can't spill again
+        self._memory_limit = sys.maxsize
+        try:
+            for file, chunks in spilled:
+                for key, partials in read_chunks(file, chunks):
+                    self.merge(key, partials)
+                yield from self._results()
+                self.groups = {}
+        finally:
+            for file, _ in spilled:
+                file.close()
+
+    def _results(self) -> Iterator[Tuple[Any, List[Any]]]:
+        for key, states in self.groups.items():
+            yield key, [
+                aggregate.result(state)
+                for aggregate, state in zip(self._aggregates, states)
+            ]
+
+
+def _arrow_partials(
+    batch: pa.RecordBatch,
+    key_names: List[str],
+    aggregates: Dict[str, Aggregate],
+) -> Iterator[Tuple[Any, List[Any]]]:
+    """The key and partial aggregate states of each group in a batch."""
+    requested: Dict[str, Tuple[Any, str]] = {}
+    for aggregate in aggregates.values():
+        field = aggregate.field
+        for function in _ARROW_AGGREGATIONS[type(aggregate)]:
+            if field is None:
+                requested["count_all"] = ([], "count_all")
+            else:
+                requested[f"{field}_{function}"] = (field, function)
+
+    table = pa.Table.from_batches([batch])
+    grouped = table.group_by(key_names).aggregate(list(requested.values()))
+    get_key = operator.itemgetter(*key_names)
+    for row in grouped.to_pylist():
+        partials = []
+        for aggregate in aggregates.values():
+            field = aggregate.field
+            if field is None:
+                partials.append(row["count_all"])
+            elif isinstance(aggregate, Mean):
+                partials.append((row[f"{field}_sum"] or 0, row[f"{field}_count"]))
+            else:
+                function = _ARROW_AGGREGATIONS[type(aggregate)][0]
+                value = row[f"{field}_{function}"]
+                partials.append(aggregate.create() if value is None else value)
+        yield get_key(row), partials
+
+
+def _add_batch(
+    table: _GroupTable,
+    batch: pa.RecordBatch,
+    key: GroupKey,
+    aggregates: Dict[str, Aggregate],
+    use_arrow: bool,
+) -> None:
+    key_names = _key_names(key)
+    if key_names is not None and use_arrow:
+        for group_key, partials in _arrow_partials(batch, key_names, aggregates):
+            table.merge(group_key, partials)
+    else:
+        get_key = _key_getter(key)
+        for row in batch.to_pylist():
+            table.update(get_key(row), row)
+
+
+def _to_record(
+    key_names: Optional[List[str]],
+    aggregates: Dict[str, Aggregate],
+    group_key: Any,
+    results: List[Any],
+) -> Dict[str, Any]:
+    if key_names is None:
+        record = {"key": group_key}
+    elif len(key_names) == 1:
+        record = {key_names[0]: group_key}
+    else:
+        record = dict(zip(key_names, group_key))
+    record.update(zip(aggregates, results))
+    return record
+
+
+def group_aggregate(  # noqa: PLR0913
+    key: GroupKey,
+    aggregates: Dict[str, Aggregate],
+    memory_limit: int = 256 * 1024 * 1024,
+    spill_dir: Optional[str] = None,
+    partitions: int = 16,
+    batch_size: int = 65536,
+) -> Callable[[Iterator[Any]], Iterator[Any]]:
+    """Aggregate the elements by key, for input in any order.
+
+    key is a field name, a list of field names, or a function of each
+    element. A hash table holds the partial aggregate states (from
+    pipedata.core.aggregates) of each group, spilling hash partitions to
+    disk when the groups reach memory_limit (approximately, in bytes). The
+    results are output at the end of the input, in no particular order, as a
+    dict of the key field(s) (or "key", for a function) and the aggregates.
+
+    For record batch input, the output is record batches of up to
+    batch_size rows. With field name keys, and aggregates of field names,
+    each batch is first aggregated by pyarrow, with only the partial states
+    of its groups being merged in Python.
+    """
+    if memory_limit < 1 or partitions < 1:
+        raise ValueError("memory_limit and partitions must be at least 1")
+    logger.info(f"Initializing group aggregation by {key=} of {list(aggregates)}")
+    key_names = _key_names(key)
+    get_key = _key_getter(key)
+    use_arrow = _is_arrow_compatible(key, aggregates)
+
+    def group_aggregate_func(elements: Iterator[Any]) -> Iterator[Any]:
+        table = _GroupTable(aggregates, memory_limit, spill_dir, partitions)
+        is_arrow = False
+        for element in elements:
+            if isinstance(element, pa.RecordBatch):
+                is_arrow = True
+                _add_batch(table, element, key, aggregates, use_arrow)
+            else:
+                table.update(get_key(element), element)
+
+        records = (
+            _to_record(key_names, aggregates, group_key, results)
+            for group_key, results in table.results()
+        )
+        if not is_arrow:
+            yield from records
+            return
+        for chunk in _batched(records, batch_size):
+            yield pa.RecordBatch.from_pylist(list(chunk))
+
+    # The results are only output once all the input is taken
+    group_aggregate_func.reads_ahead = True  # type: ignore[attr-defined]
+    return group_aggregate_func
@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from types import TracebackType
+from typing import IO, Any, Dict, Literal, Optional, Tuple, Type
+
+import fsspec  # type: ignore
+
+from pipedata.core.checkpoint import write_json
+
+logger = logging.getLogger(__name__)
+
+_INDEX_NAME = "pipedata-lru.json"
+
+
+class FileCache:
+    """A local cache of the files read by the file ops (eg zipped_files).
+
+    While the cache is set (with set_file_cache, or as a context manager),
+    files given by url (eg s3://bucket/data.zip, or file:///data.zip, but
+    not plain local paths) are read through an fsspec caching filesystem
+    with its storage in cache_dir, so that reruns read from local disk.
+    With cache_type="filecache", each file is downloaded whole when first
+    opened, while with "blockcache" only the blocks (of block_size bytes)
+    read are downloaded, suiting eg the central directory of a zip file.
+
+    There is one caching filesystem for each protocol, shared by all the
+    files (and threads), so connections to the origin are reused. With
+    max_size (in bytes), the least recently used files are evicted once
+    the files in the cache (at their full size, even if only some of their
+    blocks are cached) total more than max_size.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        cache_type: Literal["filecache", "blockcache"] = "filecache",
+        max_size: Optional[int] = None,
+        block_size: Optional[int] = None,
+    ) -> None:
+        if cache_type not in ("filecache", "blockcache"):
+            raise ValueError(f"Unknown cache type {cache_type}")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.cache_type = cache_type
+        self.max_size = max_size
+        self.block_size = block_size
+        self.evictions = 0
+        self._filesystems: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._open_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._previous: Optional[FileCache] = None
+
+        # The size of each cached (protocol, path), least recently used first
+        self._used: OrderedDict[Tuple[str, str], int] = OrderedDict()
+        self._index_path = os.path.join(cache_dir, _INDEX_NAME)
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as file:
+                for protocol, path, size in json.load(file):
+                    self._used[(protocol, path)] = size
+
+    def filesystem(self, protocol: str) -> Any:
+        """The (shared) caching filesystem for files of the protocol."""
+        with self._lock:
+            if protocol not in self._filesystems:
+                options = (
+                    {} if self.block_size is None else {"block_size": self.block_size}
+                )
+                self._filesystems[protocol] = fsspec.filesystem(
+                    self.cache_type,
+                    target_protocol=protocol,
+                    cache_storage=self.cache_dir,
+                    **options,
+                )
+            return self._filesystems[protocol]
+
+    def open(self, file_ref: str) -> IO[bytes]:  # noqa: A003
+        protocol, path = fsspec.core.split_protocol(file_ref)
+        filesystem = self.filesystem(protocol)
+        # Opening (eg the download by filecache) is not safe to run
+        # concurrently for the same file, as from zipped_files_reader, but
+        # different files are opened concurrently
+        with self._lock:
+            open_lock = self._open_locks.setdefault((protocol, path), threading.Lock())
+        with open_lock:
+            file = filesystem.open(path, "rb")
+        # The size from the opened file, so that a cached file needs no
+        # further requests to the origin
+        size = getattr(file, "size", None)
+        if not isinstance(size, int):
+            size = os.fstat(file.fileno()).st_size
+        self.mark_used(protocol, path, size)
+        return file  # type: ignore[no-any-return]
+
+    def mark_used(self, protocol: str, path: str, size: Optional[int] = None) -> None:
+        """Record the file as the most recently used, evicting others if the
+        cache is over max_size."""
+        if size is None:
+            size = int(self.filesystem(protocol).size(path))
+        with self._lock:
+            self._used.pop((protocol, path), None)
+            self._used[(protocol, path)] = size
+            evicted = []
+            total = sum(self._used.values())
+            # The file just used is kept, even if alone over max_size
+            while (
+                self.max_size is not None
+                and total > self.max_size
+                and len(self._used) > 1
+            ):
+                key, evicted_size = self._used.popitem(last=False)
+                evicted.append(key)
+                total -= evicted_size
+            self._save()
+
+        for evicted_protocol, evicted_path in evicted:
+            logger.info(f"Evicting {evicted_path} from file cache")
+            self.filesystem(evicted_protocol).pop_from_cache(evicted_path)
+            self.evictions += 1
+
+    def _save(self) -> None:
+        entries = [
+            [protocol, path, size] for (protocol, path), size in self._used.items()
+        ]
+        write_json(self._index_path, entries)
+
+    def __enter__(self) -> "FileCache":
+        self._previous = set_file_cache(self)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        set_file_cache(self._previous)
+
+
+_file_cache: Optional[FileCache] = None
+
+
+def set_file_cache(cache: Optional[FileCache]) -> Optional[FileCache]:
+    """Set the cache for the file ops to read through (or None for no
+    cache), returning the previous cache."""
+    global _file_cache  # noqa: PLW0603
+    previous = _file_cache
+    _file_cache = cache
+    return previous
+
+
+def get_file_cache(file_ref: str) -> Optional[FileCache]:
+    """The cache to read the file through, if any."""
+    if _file_cache is None or "://" not in file_ref:
+        return None
+    return _file_cache
+
+
+def open_file(file_ref: str) -> IO[bytes]:
+    """Open the file for reading, through the file cache if there is one."""
+    cache = get_file_cache(file_ref)
+    if cache is not None:
+        return cache.open(file_ref)
+    return fsspec.open(file_ref, "rb").open()  # type: ignore[no-any-return]
@@ -0,0 +1,140 @@
+import logging
+from typing import Callable, Dict, Iterator, List, Union
+
+import pyarrow as pa  # type: ignore
+import pyarrow.compute as pc  # type: ignore
+import pyarrow.dataset as pa_dataset  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+BatchPredicate = Union[pc.Expression, Callable[[pa.RecordBatch], pa.Array]]
+BatchColumn = Union[pc.Expression, Callable[[pa.RecordBatch], pa.Array]]
+
+
+def _to_batch(table: pa.Table) -> pa.RecordBatch:
+    batches = table.combine_chunks().to_batches()
+    if len(batches) == 0:
+        return pa.RecordBatch.from_pylist([], schema=table.schema)
+    return batches[0]
+
+
+def filter_batches(
+    predicate: BatchPredicate,
+) -> Callable[[Iterator[pa.RecordBatch]], Iterator[pa.RecordBatch]]:
+    """Filter the rows of each record batch, skipping any emptied batches.
+
+    predicate is either a pyarrow.compute expression (eg pc.field("a") > 1)
+    or a function from a record batch to a boolean mask array.
+    """
+    logger.info(f"Initializing record batch filter with {predicate=}")
+
+    def filter_batches_func(
+        batches: Iterator[pa.RecordBatch],
+    ) -> Iterator[pa.RecordBatch]:
+        for batch in batches:
+            if isinstance(predicate, pc.Expression):
+                filtered = _to_batch(pa.Table.from_batches([batch]).filter(predicate))
+            else:
+                filtered = batch.filter(predicate(batch))
+            if filtered.num_rows > 0:
+                yield filtered
+
+    # Recognized by read_from_parquet, to push the filter into the scan
+    filter_batches_func.batch_filter = predicate  # type: ignore[attr-defined]
+    return filter_batches_func
+
+
+def select_columns(
+    columns: List[str],
+) -> Callable[[Iterator[pa.RecordBatch]], Iterator[pa.RecordBatch]]:
+    logger.info(f"Initializing record batch column selection of {columns=}")
+
+    def select_columns_func(
+        batches: Iterator[pa.RecordBatch],
+    ) -> Iterator[pa.RecordBatch]:
+        for batch in batches:
+            yield batch.select(columns)
+
+    select_columns_func.batch_columns = columns  # type: ignore[attr-defined]
+    return select_columns_func
+
+
+def with_columns(
+    **columns: BatchColumn,
+) -> Callable[[Iterator[pa.RecordBatch]], Iterator[pa.RecordBatch]]:
+    """Add (or replace) columns computed from each record batch.
+
+    Each column is given either as a pyarrow.compute expression, or as a
+    function from a record batch to an array.
+    """
+    logger.info(f"Initializing record batch columns {list(columns)}")
+    expressions = {
+        name: column
+        for name, column in columns.items()
+        if isinstance(column, pc.Expression)
+    }
+
+    def with_columns_func(
+        batches: Iterator[pa.RecordBatch],
+    ) -> Iterator[pa.RecordBatch]:
+        for batch in batches:
+            if len(expressions) > 0:
+                projection: Dict[str, pc.Expression] = {
+                    name: pc.field(name)
+                    for name in batch.schema.names
+                    if name not in expressions
+                }
+                projection.update(expressions)
+                table = pa.Table.from_batches([batch])
+                batch = _to_batch(  # noqa: PLW2901
+                    pa_dataset.dataset(table).to_table(columns=projection)
+                )
+            for name, column in columns.items():
+                if isinstance(column, pc.Expression):
+                    continue
+                values = column(batch)
+                index = batch.schema.get_field_index(name)
+                if index == -1:
+                    batch = batch.append_column(name, values)  # noqa: PLW2901
+                else:
+                    batch = batch.set_column(index, name, values)  # noqa: PLW2901
+            yield batch
+
+    return with_columns_func
+
+
+def rechunk_batches(
+    batch_size: int,
+) -> Callable[[Iterator[pa.RecordBatch]], Iterator[pa.RecordBatch]]:
+    """Regroup record batches into batches of batch_size rows.
+
+    All but the final batch have exactly batch_size rows, so that many small
+    batches (eg after filtering) can be combined for downstream steps.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    logger.info(f"Initializing record batch rechunking with {batch_size=}")
+
+    def rechunk_batches_func(
+        batches: Iterator[pa.RecordBatch],
+    ) -> Iterator[pa.RecordBatch]:
+        pending: List[pa.RecordBatch] = []
+        num_rows = 0
+        for batch in batches:
+            pending.append(batch)
+            num_rows += batch.num_rows
+            if num_rows < batch_size:
+                continue
+
+            table = pa.Table.from_batches(pending)
+            offset = 0
+            while num_rows - offset >= batch_size:
+                yield _to_batch(table.slice(offset, batch_size))
+                offset += batch_size
+            pending = table.slice(offset).to_batches()
+            num_rows -= offset
+
+        if num_rows > 0:
+            yield _to_batch(pa.Table.from_batches(pending))
+
+    return rechunk_batches_func
@@ -0,0 +1,99 @@
+import fnmatch
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import fsspec  # type: ignore
+
+from pipedata.core.checkpoint import Checkpoint
+
+logger = logging.getLogger(__name__)
+
+_SAVE_INTERVAL = 100
+
+# The keys that filesystems use in their listings, in order of preference
+_ETAG_KEYS = ("ETag", "etag", "md5Hash")
+_MTIME_KEYS = ("mtime", "LastModified", "last_modified", "updated")
+
+
+def _signature(info: Dict[str, Any]) -> Dict[str, Any]:
+    """The size, modification time and etag of a file, as far as known."""
+    signature: Dict[str, Any] = {"size": info.get("size")}
+    for name, keys in (("mtime", _MTIME_KEYS), ("etag", _ETAG_KEYS)):
+        value = next((info[key] for key in keys if info.get(key) is not None), None)
+        signature[name] = None if value is None else str(value)
+    return signature
+
+
+def _list_files(
+    fs: Any, root: str, pool: ThreadPoolExecutor
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """All the files under root, listing each level of directories in parallel."""
+    info = fs.info(root)
+    if info["type"] != "directory":
+        return [(info["name"], info)]
+
+    files = []
+    directories = [root]
+    while len(directories) > 0:
+        listings = pool.map(lambda path: fs.ls(path, detail=True), directories)
+        directories = []
+        for listing in listings:
+            for entry in listing:
+                if entry["type"] == "directory":
+                    directories.append(entry["name"])
+                else:
+                    files.append((entry["name"], entry))
+    return files
+
+
+def _file_key(file: Tuple[str, Dict[str, Any]]) -> str:
+    """The file ref and signature, as the key of the file in the checkpoint."""
+    return json.dumps(file, sort_keys=True)
+
+
+def discovered_files(
+    manifest: Optional[str] = None,
+    pattern: str = "*",
+    max_workers: int = 8,
+) -> Callable[[Iterator[str]], Iterator[str]]:
+    """The files under each root (a path or url), new or changed since a
+    previous run, for zipped_files, read_from_parquet and the like.
+
+    Files are listed through fsspec, with each level of directories listed
+    in parallel, and kept if their name matches pattern. A file is skipped
+    if its size, modification time and etag (those that the filesystem
+    gives) match those recorded in the manifest, a Checkpoint at the local
+    path manifest, keyed by the file and its signature. A file is recorded
+    once the next file is taken (as the following steps have then finished
+    with it), or at the end, with the manifest saved every 100 files and at
+    the end.
+    """
+    logger.info(f"Initializing file discovery with {manifest=}")
+
+    def candidates(
+        roots: Iterator[str], pool: ThreadPoolExecutor
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for root in roots:
+            fs, root_path = fsspec.core.url_to_fs(root)
+            prefix = root.rsplit("://", 1)[0] + "://" if "://" in root else ""
+            files = _list_files(fs, root_path, pool)
+            logger.info(f"Found {len(files)} files under {root}")
+            for path, info in sorted(files, key=lambda file: file[0]):
+                if fnmatch.fnmatch(path.rsplit("/", 1)[-1], pattern):
+                    yield prefix + path, _signature(info)
+
+    def discovered_files_func(roots: Iterator[str]) -> Iterator[str]:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            files = candidates(roots, pool)
+            if manifest is not None:
+                checkpoint = Checkpoint(
+                    manifest, key=_file_key, save_interval=_SAVE_INTERVAL
+                )
+                files = checkpoint.completing(files)
+            for file_ref, _ in files:
+                logger.info(f"Discovered new or changed file {file_ref}")
+                yield file_ref
+
+    return discovered_files_func
@@ -1,6 +1,17 @@
+import bz2
+import contextlib
+import fnmatch
+import functools
+import gzip
+import io
 import logging
+import lzma
+import queue
+import tarfile
+import threading
 import zipfile
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from typing import (
     IO,
     Any,
@@ -10,12 +21,20 @@ from typing import (
     List,
     Literal,
     Optional,
+    Tuple,
     Union,
+    cast,
 )
 
 import fsspec  # type: ignore
 import pyarrow as pa  # type: ignore
+import pyarrow.compute as pc  # type: ignore
 import pyarrow.dataset as pa_dataset  # type: ignore
+import pyarrow.fs as pa_fs  # type: ignore
+
+from pipedata.core.ops import _executor_map, _put_until_stopped
+
+from .caching import get_file_cache, open_file
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +53,7 @@ def zipped_files(file_refs: Iterator[str]) -> Iterator[OpenedFileRef]:
     logger.info("Initializing zipped files reader")
     for file_ref in file_refs:
         logger.info(f"Opening zip file at {file_ref}")
-        with fsspec.open(file_ref, "rb") as file:
+        with open_file(file_ref) as file:
             with zipfile.ZipFile(file) as zip_file:
                 infos = zip_file.infolist()
                 logger.info(f"Found {len(infos)} files in zip file")
@@ -48,35 +67,554 @@ def zipped_files(file_refs: Iterator[str]) -> Iterator[OpenedFileRef]:
                         )
 
 
-def read_from_parquet(
+Compression = Optional[Literal["auto", "gzip", "bz2", "xz", "zstd"]]
+
+# The magic bytes starting each compressed format, and its file suffix
+_COMPRESSIONS = {
+    "gzip": (b"\x1f\x8b", ".gz"),
+    "bz2": (b"BZh", ".bz2"),
+    "xz": (b"\xfd7zXZ\x00", ".xz"),
+    "zstd": (b"\x28\xb5\x2f\xfd", ".zst"),
+}
+
+
+class _RawReader(io.RawIOBase):
+    """A file as a raw stream, so it can be buffered (eg to peek at its
+    start) without needing to seek."""
+
+    def __init__(self, file: IO[bytes]) -> None:
+        self._file = file
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        data = self._file.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def _detect_compression(stream: "io.BufferedReader[Any]") -> Optional[str]:
+    start = stream.peek(6)
+    for compression, (magic, _) in _COMPRESSIONS.items():
+        if start.startswith(magic):
+            return compression
+    return None
+
+
+_DECOMPRESSORS: Dict[str, Callable[[IO[bytes]], Any]] = {
+    "gzip": lambda stream: gzip.GzipFile(fileobj=stream, mode="rb"),
+    "bz2": bz2.BZ2File,
+    "xz": lzma.LZMAFile,
+    "zstd": lambda stream: pa.CompressedInputStream(stream, "zstd"),
+}
+
+
+def _decompressed(file: IO[bytes], compression: Compression) -> IO[bytes]:
+    """The decompressed contents of the file, read as a stream."""
+    stream = io.BufferedReader(_RawReader(file))
+    detected = _detect_compression(stream) if compression == "auto" else compression
+    if detected is None:
+        return stream
+    return cast(IO[bytes], _DECOMPRESSORS[detected](stream))
+
+
+def _check_compression(compression: Compression) -> None:
+    if compression is not None and compression not in ("auto", *_COMPRESSIONS):
+        raise FilesReaderError(f"Unknown compression {compression}")
+
+
+def compressed_files(
+    compression: Compression = "auto",
+) -> Callable[[Iterator[str]], Iterator[OpenedFileRef]]:
+    """Decompress each file as a stream, without temporary files or seeking.
+
+    compression is one of gzip, bz2, xz or zstd (decompressed by pyarrow),
+    None for uncompressed files, or by default detected from the first
+    bytes of each file. The name of each file is its ref, without a
+    suffix for its compression (eg .gz).
+    """
+    _check_compression(compression)
+    logger.info(f"Initializing compressed files reader with {compression=}")
+
+    def compressed_files_func(file_refs: Iterator[str]) -> Iterator[OpenedFileRef]:
+        for file_ref in file_refs:
+            logger.info(f"Opening compressed file at {file_ref}")
+            with open_file(file_ref) as file:
+                with _decompressed(file, compression) as contents:
+                    name = next(
+                        (
+                            file_ref[: -len(suffix)]
+                            for _, suffix in _COMPRESSIONS.values()
+                            if file_ref.endswith(suffix)
+                        ),
+                        file_ref,
+                    )
+                    yield OpenedFileRef(name=name, contents=contents)
+
+    return compressed_files_func
+
+
+def tarred_files(
+    compression: Compression = "auto",
+) -> Callable[[Iterator[str]], Iterator[OpenedFileRef]]:
+    """Read the files in each tar archive (eg .tar.gz), as a stream.
+
+    The archive is read sequentially, so each file must be read before the
+    next is taken, and needs no seeking (eg on a remote stream). compression
+    is as for compressed_files. Entries other than files are skipped.
+    """
+    _check_compression(compression)
+    logger.info(f"Initializing tar files reader with {compression=}")
+
+    def tarred_files_func(file_refs: Iterator[str]) -> Iterator[OpenedFileRef]:
+        for file_ref in file_refs:
+            logger.info(f"Opening tar file at {file_ref}")
+            with open_file(file_ref) as file:
+                with _decompressed(file, compression) as stream:
+                    with tarfile.open(fileobj=stream, mode="r|") as tar_file:
+                        for i, member in enumerate(tar_file):
+                            if not member.isfile():
+                                continue
+                            logger.info(f"Reading file {i} ({member.name}) from tar")
+                            inner_file = tar_file.extractfile(member)
+                            yield OpenedFileRef(
+                                name=member.name, contents=cast(IO[bytes], inner_file)
+                            )
+
+    return tarred_files_func
+
+
+class _ZipArchive:
+    """Handles to a zip archive, one for each thread reading from it, so
+    that members can be decompressed concurrently."""
+
+    def __init__(self, file_ref: str) -> None:
+        self._file_ref = file_ref
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._opened: List[Any] = []
+
+    def read(self, info: zipfile.ZipInfo) -> bytes:
+        zip_file = getattr(self._local, "zip_file", None)
+        if zip_file is None:
+            file = open_file(self._file_ref)
+            zip_file = zipfile.ZipFile(file)
+            self._local.zip_file = zip_file
+            with self._lock:
+                self._opened.extend([zip_file, file])
+        return zip_file.read(info)
+
+    def close(self) -> None:
+        for handle in self._opened:
+            handle.close()
+
+
+def _read_member(archive: _ZipArchive, info: zipfile.ZipInfo) -> OpenedFileRef:
+    return OpenedFileRef(name=info.filename, contents=io.BytesIO(archive.read(info)))
+
+
+def _member_filter(
+    members: Union[str, Callable[[str], bool], None]
+) -> Optional[Callable[[str], bool]]:
+    if isinstance(members, str):
+        return lambda name: fnmatch.fnmatch(name, members)
+    return members
+
+
+def zipped_files_reader(
+    members: Union[str, Callable[[str], bool], None] = None,
+    max_workers: int = 4,
+    ordered: bool = True,
+    max_in_flight: Optional[int] = None,
+) -> Callable[[Iterator[str]], Iterator[OpenedFileRef]]:
+    """Read the files in each zip archive, decompressing them concurrently.
+
+    Unlike zipped_files, the files of an archive are decompressed on
+    max_workers threads, each with its own handle to the archive, and read
+    into memory, with at most max_in_flight (default: twice max_workers)
+    files read ahead. Only the files with names matching members (a glob
+    pattern, or a function of the name) are read, chosen from the central
+    directory of the archive. Directories are skipped. With ordered=False,
+    files are returned as they are decompressed, rather than in order.
+    """
+    in_flight = 2 * max_workers if max_in_flight is None else max_in_flight
+    if min(max_workers, in_flight) < 1:
+        raise ValueError("max_workers and max_in_flight must both be at least 1")
+    keep = _member_filter(members)
+    logger.info(f"Initializing zipped files reader with {max_workers=}")
+
+    def zipped_files_reader_func(file_refs: Iterator[str]) -> Iterator[OpenedFileRef]:
+        for file_ref in file_refs:
+            logger.info(f"Opening zip file at {file_ref}")
+            with open_file(file_ref) as file:
+                with zipfile.ZipFile(file) as zip_file:
+                    infos = [
+                        info
+                        for info in zip_file.infolist()
+                        if not info.is_dir() and (keep is None or keep(info.filename))
+                    ]
+            logger.info(f"Reading {len(infos)} files from zip file")
+
+            archive = _ZipArchive(file_ref)
+            read = functools.partial(_read_member, archive)
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            try:
+                yield from _executor_map(
+                    executor, read, iter(infos), 1, in_flight, ordered
+                )
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+                archive.close()
+
+    return zipped_files_reader_func
+
+
+def read_from_parquet(  # noqa: PLR0913
     columns: Optional[Union[List[str], Dict[str, Any]]] = None,
     return_as: Literal["recordbatch", "record"] = "record",
     batch_size: Optional[int] = 100_000,
+    filter: Optional[pc.Expression] = None,  # noqa: A002
+    partitioning: Optional[str] = None,
+    parallel: bool = False,
+    ordered: bool = True,
+    max_workers: int = 8,
+    fragment_readahead: int = 4,
+    batch_readahead: int = 16,
+    memory_map: bool = False,
 ) -> Callable[[Iterator[str]], Iterator[Union[Dict[str, Any], pa.RecordBatch]]]:
+    """Read the rows of each parquet file (or directory of files).
+
+    filter is a pyarrow.compute expression, for the rows to read, with row
+    groups skipped using their statistics where possible, and with
+    partitioning (eg "hive") files skipped by their partition values.
+    When a chain is compiled, a filter_batches with an expression, or a
+    select_columns, directly after a reader returning record batches is
+    pushed into the filter and columns of the reader.
+
+    By default, each file is read in turn. With parallel=True, all the
+    files are read as one dataset (so must share a schema), with up to
+    fragment_readahead files and batch_readahead batches per file read
+    ahead on pyarrow's thread pools (which are shared by the process, so
+    max_workers has no effect here). With ordered=False as well, files are
+    instead read on max_workers threads of their own, with each batch
+    returned as soon as it is read, whichever file it is from.
+
+    With memory_map=True, local files are memory mapped (rather than read
+    into buffers), so that the pages are read from the page cache without
+    copies, and only decoded columns take up memory.
+    """
     logger.info(f"Initializing parquet reader with {batch_size=}")
 
     if return_as not in ("recordbatch", "record"):
         raise FilesReaderError(f"Unknown return_as value {return_as}")
+    if not (ordered or parallel):
+        raise FilesReaderError("Unordered reading requires parallel=True")
 
+    scan = _ParquetScan(
+        columns=columns,
+        return_as=return_as,
+        batch_size=batch_size,
+        filter=filter,
+        partitioning=partitioning,
+        parallel=parallel,
+        ordered=ordered,
+        max_workers=max_workers,
+        fragment_readahead=fragment_readahead,
+        batch_readahead=batch_readahead,
+        memory_map=memory_map,
+    )
+    return _parquet_reader(scan)
+
+
+@dataclass(frozen=True)
+class _ParquetScan:
+    columns: Optional[Union[List[str], Dict[str, Any]]]
+    return_as: Literal["recordbatch", "record"]
+    batch_size: Optional[int]
+    filter: Optional[pc.Expression]  # noqa: A003
+    partitioning: Optional[str]
+    parallel: bool
+    ordered: bool
+    max_workers: int
+    fragment_readahead: int
+    batch_readahead: int
+    memory_map: bool
+
+    def options(self) -> Dict[str, Any]:
+        """The keyword arguments for to_batches of a dataset or fragment."""
+        return {
+            "columns": self.columns,
+            "filter": self.filter,
+            "batch_size": self.batch_size,
+            "batch_readahead": self.batch_readahead,
+        }
+
+
+def _push_down(
+    step: Callable[[Iterator[Any]], Iterator[Any]], scan: _ParquetScan
+) -> Optional[_ParquetScan]:
+    """The scan with the step pushed into it, if the step is a
+    filter_batches with an expression, or a select_columns."""
+    columns = scan.columns
+    predicate = getattr(step, "batch_filter", None)
+    # The filter is on the file's columns, so not after renaming by columns
+    if isinstance(predicate, pc.Expression) and not isinstance(columns, dict):
+        if scan.filter is not None:
+            predicate = scan.filter & predicate
+        logger.info(f"Pushing filter {predicate} into parquet reader")
+        return replace(scan, filter=predicate)
+
+    selected = getattr(step, "batch_columns", None)
+    if selected is None:
+        return None
+    if columns is None:
+        pushed_columns: Union[List[str], Dict[str, Any]] = list(selected)
+    elif all(name in columns for name in selected):
+        pushed_columns = (
+            {name: columns[name] for name in selected}
+            if isinstance(columns, dict)
+            else list(selected)
+        )
+    else:
+        return None
+    logger.info(f"Pushing column selection {selected} into parquet reader")
+    return replace(scan, columns=pushed_columns)
+
+
+class _FragmentScanner:
+    """Scans the fragments of a dataset on threads, each taking the next
+    fragment once done with its last, putting the batches onto items."""
+
+    def __init__(
+        self, dataset: pa_dataset.Dataset, scan: _ParquetScan, readahead: int
+    ) -> None:
+        self._fragments = iter(dataset.get_fragments(filter=scan.filter))
+        self._lock = threading.Lock()
+        self._schema = dataset.schema
+        self._options = scan.options()
+        self.items: queue.Queue[Tuple[str, Any]] = queue.Queue(maxsize=readahead)
+        self.stop = threading.Event()
+
+    def _next_fragment(self) -> Any:
+        with self._lock:
+            return next(self._fragments, None)
+
+    def run(self) -> None:
+        try:
+            # Once stopped, the next put returns False, ending the thread
+            for fragment in iter(self._next_fragment, None):
+                for batch in fragment.to_batches(schema=self._schema, **self._options):
+                    if not _put_until_stopped(self.items, ("item", batch), self.stop):
+                        return
+        except BaseException as err:  # noqa: BLE001
+            _put_until_stopped(self.items, ("error", err), self.stop)
+        else:
+            _put_until_stopped(self.items, ("end", None), self.stop)
+
+
+def _unordered_batches(
+    dataset: pa_dataset.Dataset, scan: _ParquetScan
+) -> Iterator[pa.RecordBatch]:
+    scanner = _FragmentScanner(dataset, scan, scan.batch_readahead)
+    threads = [
+        threading.Thread(target=scanner.run, name=f"parquet-reader-{i}", daemon=True)
+        for i in range(scan.max_workers)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        finished = 0
+        while finished < len(threads):
+            kind, value = scanner.items.get()
+            if kind == "end":
+                finished += 1
+            elif kind == "error":
+                raise value
+            else:
+                yield value
+    finally:
+        scanner.stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def _local_path(file_ref: str) -> Optional[str]:
+    if file_ref.startswith("file://"):
+        return file_ref[len("file://") :]
+    return None if "://" in file_ref else file_ref
+
+
+class _ClosingHandler(pa_fs.FSSpecHandler):  # type: ignore[misc]
+    """Keeps the files opened by pyarrow, which leaves them to be garbage
+    collected, so they can be closed once the scan is done."""
+
+    def __init__(self, filesystem: Any) -> None:
+        super().__init__(filesystem)
+        self.opened: List[Any] = []
+
+    def open_input_file(self, path: str) -> Any:
+        file = super().open_input_file(path)
+        self.opened.append(file)
+        return file
+
+    def close(self) -> None:
+        for file in self.opened:
+            file.close()
+
+
+def _dataset(
+    file_ref: str, scan: _ParquetScan, stack: contextlib.ExitStack
+) -> pa_dataset.Dataset:
+    path = _local_path(file_ref)
+    if scan.memory_map and path is not None:
+        # Pre-buffering would copy the mapped pages into buffers of their own
+        file_format = pa_dataset.ParquetFileFormat(
+            default_fragment_scan_options=pa_dataset.ParquetFragmentScanOptions(
+                pre_buffer=False
+            )
+        )
+        return pa_dataset.dataset(
+            path,
+            format=file_format,
+            partitioning=scan.partitioning,
+            filesystem=pa_fs.LocalFileSystem(use_mmap=True),
+        )
+
+    cache = get_file_cache(file_ref)
+    if cache is None:
+        return pa_dataset.dataset(
+            file_ref, format="parquet", partitioning=scan.partitioning
+        )
+    protocol, cached_path = fsspec.core.split_protocol(file_ref)
+    handler = _ClosingHandler(cache.filesystem(protocol))
+    stack.callback(handler.close)
+    ds = pa_dataset.dataset(
+        cached_path,
+        format="parquet",
+        partitioning=scan.partitioning,
+        filesystem=pa_fs.PyFileSystem(handler),
+    )
+    for fragment_path in ds.files:
+        cache.mark_used(protocol, fragment_path)
+    return ds
+
+
+def _scan_batches(
+    file_refs: Iterator[str], scan: _ParquetScan
+) -> Iterator[Tuple[str, pa.RecordBatch]]:
+    """The batches of the files, with the file (or files) they are from."""
+    if not scan.parallel:
+        for file_ref in file_refs:
+            logger.info(f"Reading parquet file {file_ref}")
+            with contextlib.ExitStack() as stack:
+                ds = _dataset(file_ref, scan, stack)
+                for batch in ds.to_batches(
+                    columns=scan.columns,
+                    filter=scan.filter,
+                    batch_size=scan.batch_size,
+                ):
+                    yield file_ref, batch
+        return
+
+    refs = list(file_refs)
+    if len(refs) == 0:
+        return
+    logger.info(f"Reading {len(refs)} parquet files in parallel")
+    with contextlib.ExitStack() as stack:
+        ds = pa_dataset.dataset([_dataset(ref, scan, stack) for ref in refs])
+        source = f"{len(refs)} files"
+        if scan.ordered:
+            batches = ds.to_batches(
+                fragment_readahead=scan.fragment_readahead, **scan.options()
+            )
+        else:
+            batches = _unordered_batches(ds, scan)
+        for batch in batches:
+            yield source, batch
+
+
+def _parquet_reader(
+    scan: _ParquetScan,
+) -> Callable[[Iterator[str]], Iterator[Union[Dict[str, Any], pa.RecordBatch]]]:
     def parquet_batch_reader(
         file_refs: Iterator[str],
+    ) -> Iterator[Union[Dict[str, Any], pa.RecordBatch]]:
+        for i, (source, batch) in enumerate(_scan_batches(file_refs, scan)):
+            logger.info(f"Processing batch {i} (length {len(batch)}) from {source}")
+            if scan.filter is not None and batch.num_rows == 0:
+                continue
+            if scan.return_as == "recordbatch":
+                yield batch
+            elif scan.return_as == "record":
+                yield from batch.to_pylist()
+            else:
+                raise FilesReaderError(
+                    f"Unknown return_as value {scan.return_as}"
+                )  # pragma: no cover
+
+    def push_down(
+        step: Callable[[Iterator[Any]], Iterator[Any]]
+    ) -> Optional[Callable[[Iterator[str]], Iterator[Any]]]:
+        if scan.return_as != "recordbatch":
+            return None
+        pushed = _push_down(step, scan)
+        return None if pushed is None else _parquet_reader(pushed)
+
+    parquet_batch_reader.push_down = push_down  # type: ignore[attr-defined]
+    # In parallel, all the files are taken before any batch is output
+    parquet_batch_reader.reads_ahead = scan.parallel  # type: ignore[attr-defined]
+    return parquet_batch_reader
+
+
+def _ipc_batches(source: Any, format_: str) -> Iterator[pa.RecordBatch]:
+    if format_ == "stream":
+        yield from pa.ipc.open_stream(source)
+    else:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+
+
+def arrow_ipc_reader(
+    columns: Optional[List[str]] = None,
+    return_as: Literal["recordbatch", "record"] = "recordbatch",
+    memory_map: bool = True,
+    format: Literal["file", "stream"] = "file",  # noqa: A002
+) -> Callable[[Iterator[str]], Iterator[Union[Dict[str, Any], pa.RecordBatch]]]:
+    """Read the record batches of each Arrow IPC (or Feather v2) file.
+
+    format is the IPC file format, or the stream format (as written by
+    arrow_ipc_writer), which is read sequentially, so needs no seeking.
+    With memory_map=True, local files are memory mapped, and the batches
+    (unless compressed) refer directly to the mapped file rather than to
+    copies, so reading them costs page cache reads. Other files are read
+    through fsspec.
+    """
+    logger.info(f"Initializing arrow ipc reader with {memory_map=}")
+
+    if return_as not in ("recordbatch", "record"):
+        raise FilesReaderError(f"Unknown return_as value {return_as}")
+    if format not in ("file", "stream"):
+        raise FilesReaderError(f"Unknown arrow ipc format {format}")
+
+    def arrow_ipc_reader_func(
+        file_refs: Iterator[str],
     ) -> Iterator[Union[Dict[str, Any], pa.RecordBatch]]:
         for file_ref in file_refs:
-            logger.info(f"Reading parquet file {file_ref}")
-            ds = pa_dataset.dataset(file_ref, format="parquet")
-            for i, batch in enumerate(
-                ds.to_batches(columns=columns, batch_size=batch_size)
-            ):
-                logger.info(
-                    f"Processing batch {i} (length {len(batch)}) from {file_ref}"
-                )
-                if return_as == "recordbatch":
-                    yield batch
-                elif return_as == "record":
-                    yield from batch.to_pylist()
+            logger.info(f"Reading arrow ipc file {file_ref}")
+            path = _local_path(file_ref)
+            with contextlib.ExitStack() as stack:
+                if memory_map and path is not None:
+                    source = stack.enter_context(pa.memory_map(path, "r"))
                 else:
-                    raise FilesReaderError(
-                        f"Unknown return_as value {return_as}"
-                    )  # pragma: no cover
+                    source = stack.enter_context(open_file(file_ref))
+                for batch in _ipc_batches(source, format):
+                    if columns is not None:
+                        batch = batch.select(columns)  # noqa: PLW2901
+                    if return_as == "recordbatch":
+                        yield batch
+                    else:
+                        yield from batch.to_pylist()
 
-    return parquet_batch_reader
+    return arrow_ipc_reader_func
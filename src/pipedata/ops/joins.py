@@ -0,0 +1,191 @@
+import logging
+from array import array
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import pyarrow as pa  # type: ignore
+
+from .files import read_from_parquet
+
+logger = logging.getLogger(__name__)
+
+JoinRight = Union[str, pa.Table, Iterable[pa.RecordBatch]]
+
+# Records are joined in chunks of this many, so that the right rows they
+# match are taken and converted together
+_RECORD_CHUNK = 1024
+
+
+class _BuildSide:
+    """The right side of a join, as an Arrow table and an index of its keys.
+
+    The index maps each key to its first row, with any further rows of the
+    same key chained through an array of the next row, so there is one
+    Python object per distinct key rather than one per value.
+    """
+
+    def __init__(self, table: pa.Table, on: List[str]) -> None:
+        self.table = table.combine_chunks()
+        self.columns = [name for name in self.table.column_names if name not in on]
+        self.first: Dict[Any, int] = {}
+        self.next_row = array("q", [-1]) * self.table.num_rows
+        keys = _keys(self.table, on)
+        # Built backwards, so that chained rows are in table order
+        for row in range(len(keys) - 1, -1, -1):
+            key = keys[row]
+            if key is None:
+                continue
+            previous = self.first.get(key)
+            if previous is not None:
+                self.next_row[row] = previous
+            self.first[key] = row
+
+    def rows(self, key: Any) -> Iterator[int]:
+        row = -1 if key is None else self.first.get(key, -1)
+        while row >= 0:
+            yield row
+            row = self.next_row[row]
+
+
+def _keys(data: Union[pa.Table, pa.RecordBatch], on: List[str]) -> List[Any]:
+    """The key of each row, or None for a null key (which never matches)."""
+    if len(on) == 1:
+        return list(data.column(on[0]).to_pylist())
+    columns = [data.column(name).to_pylist() for name in on]
+    return [None if None in key else key for key in zip(*columns)]
+
+
+def _load_right(
+    right: JoinRight, on: List[str], columns: Optional[List[str]]
+) -> pa.Table:
+    read_columns = None if columns is None else on + [c for c in columns if c not in on]
+    if isinstance(right, str):
+        reader = read_from_parquet(columns=read_columns, return_as="recordbatch")
+        right = list(reader(iter([right])))
+    if not isinstance(right, pa.Table):
+        batches = list(right)
+        if len(batches) == 0:
+            # Eg a filtered read without any rows left, so with no schema,
+            # the right columns (if given) are empty null columns
+            names = on if read_columns is None else read_columns
+            right = pa.table({name: pa.nulls(0) for name in names})
+        else:
+            right = pa.Table.from_batches(batches)
+    if read_columns is not None:
+        right = right.select(read_columns)
+    return right
+
+
+def _match(
+    keys: List[Any], build: _BuildSide, how: str
+) -> Tuple["array[int]", List[Optional[int]]]:
+    """The left and right row of each joined row, in left order, with a
+    right row of None for an unmatched left row of a left join."""
+    left_rows = array("q")
+    right_rows: List[Optional[int]] = []
+    for i, key in enumerate(keys):
+        matched = False
+        for row in build.rows(key):
+            left_rows.append(i)
+            right_rows.append(row)
+            matched = True
+        if not matched and how == "left":
+            left_rows.append(i)
+            right_rows.append(None)
+    return left_rows, right_rows
+
+
+def _join_batch(
+    batch: pa.RecordBatch, build: _BuildSide, on: List[str], how: str
+) -> pa.RecordBatch:
+    left_rows, right_rows = _match(_keys(batch, on), build, how)
+    left = batch.take(pa.array(left_rows, type=pa.int64()))
+    right = build.table.take(pa.array(right_rows, type=pa.int64()))
+    names = list(batch.schema.names)
+    arrays = list(left.columns)
+    for name in build.columns:
+        names.append(f"{name}_right" if name in batch.schema.names else name)
+        arrays.append(right.column(name).combine_chunks())
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def _record_key(record: Dict[str, Any], on: List[str]) -> Any:
+    if len(on) == 1:
+        return record[on[0]]
+    key = tuple(record[name] for name in on)
+    return None if None in key else key
+
+
+def _join_records(
+    records: List[Dict[str, Any]], build: _BuildSide, on: List[str], how: str
+) -> Iterator[Dict[str, Any]]:
+    """Join a chunk of records, taking the matched right rows together.
+
+    The records are kept as they are (rather than converted into a record
+    batch, which would give each record the columns and types of the first),
+    with only the right columns converted from Arrow.
+    """
+    keys = [_record_key(record, on) for record in records]
+    left_rows, right_rows = _match(keys, build, how)
+    right = build.table.take(pa.array(right_rows, type=pa.int64()))
+    right_columns = {name: right.column(name).to_pylist() for name in build.columns}
+    for i, left_row in enumerate(left_rows):
+        record = records[left_row]
+        joined = dict(record)
+        for name, values in right_columns.items():
+            joined[f"{name}_right" if name in record else name] = values[i]
+        yield joined
+
+
+def hash_join(
+    right: JoinRight,
+    on: Union[str, List[str]],
+    how: Literal["inner", "left"] = "inner",
+    columns: Optional[List[str]] = None,
+) -> Callable[[Iterator[Any]], Iterator[Any]]:
+    """Join each record or record batch to the matching rows of right.
+
+    right is a parquet file (path or url, read with read_from_parquet), an
+    Arrow table, or an iterable of record batches, of which only the
+    columns (as well as the on columns) are kept, if given. It is loaded
+    once, when first needed, into an Arrow table with an index of its keys.
+    Columns of right with the same name as in the left side are suffixed
+    with _right. With how="left", unmatched rows are kept with nulls for
+    the right columns. The order of the left side is preserved, with dict
+    records joined in chunks of up to 1024 records.
+    """
+    if how not in ("inner", "left"):
+        raise ValueError(f"Unknown join type {how}")
+    on_columns = [on] if isinstance(on, str) else list(on)
+    logger.info(f"Initializing {how} hash join on {on_columns}")
+    build: List[_BuildSide] = []
+
+    def hash_join_func(elements: Iterator[Any]) -> Iterator[Any]:
+        if len(build) == 0:
+            table = _load_right(right, on_columns, columns)
+            logger.info(f"Built hash join table of {table.num_rows} rows")
+            build.append(_BuildSide(table, on_columns))
+        records: List[Dict[str, Any]] = []
+        for element in elements:
+            if isinstance(element, pa.RecordBatch):
+                yield from _join_records(records, build[0], on_columns, how)
+                records = []
+                yield _join_batch(element, build[0], on_columns, how)
+            else:
+                records.append(element)
+                if len(records) == _RECORD_CHUNK:
+                    yield from _join_records(records, build[0], on_columns, how)
+                    records = []
+        yield from _join_records(records, build[0], on_columns, how)
+
+    return hash_join_func
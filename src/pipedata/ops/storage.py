@@ -1,6 +1,17 @@
 import itertools
 import logging
-from typing import Any, Callable, Dict, Iterator, Optional, Tuple, TypeVar
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import pyarrow as pa  # type: ignore
 import pyarrow.parquet as pq  # type: ignore
@@ -17,56 +28,200 @@ def _batched(iterable: Iterator[T], n: Optional[int]) -> Iterator[Tuple[T, ...]]
         yield elements
 
 
-def parquet_writer(
-    file_path: str,
-    schema: Optional[pa.Schema] = None,
-    row_group_length: Optional[int] = None,
-    max_file_length: Optional[int] = None,
-) -> Callable[[Iterator[Dict[str, Any]]], Iterator[str]]:
-    if row_group_length is None and max_file_length is not None:
-        row_group_length = max_file_length
+def _to_tables(
+    records: Iterator[Union[Dict[str, Any], pa.RecordBatch]],
+    schema: Optional[pa.Schema],
+    row_group_length: Optional[int],
+) -> Iterator[pa.Table]:
+    """Convert either dict records or record batches into tables.
+
+    The type of the first element decides how the rest are converted. Dict
+    records are grouped into tables of row_group_length rows, while each
+    record batch becomes a table of its own, without copying.
+    """
+    first = next(records, None)
+    if first is None:
+        return
+    records = itertools.chain([first], records)
+
+    if isinstance(first, pa.RecordBatch):
+        for batch in records:
+            table = pa.Table.from_batches([batch])
+            yield table if schema is None else table.cast(schema)
+    else:
+        for batch in _batched(records, row_group_length):
+            yield pa.Table.from_pylist(batch, schema=schema)
+
 
-    multi_file = max_file_length is not None
-    if multi_file:
+def _check_file_path(file_path: str, max_file_length: Optional[int]) -> None:
+    if max_file_length is not None:
         if file_path.format(i=1) == file_path:
             msg = "When (possibly) writing to multiple files (as the file_length"
             msg += " argument is not None), the file_path argument must be a"
             msg += " format string that contains a format specifier for the file."
             raise ValueError(msg)
 
-    logger.info(f"Initializing parquet writer with {file_path=}")
 
-    def parquet_writer_func(records: Iterator[Dict[str, Any]]) -> Iterator[str]:
-        writer = None
-        file_number = 1
-        file_length = 0
-        for batch in _batched(records, row_group_length):
-            table = pa.Table.from_pylist(batch, schema=schema)
-            if writer is None:
-                formated_file_path = file_path
-                if multi_file:
-                    formated_file_path = file_path.format(i=file_number)
-                logger.info(f"Writing to {formated_file_path=}")
-                writer = pq.ParquetWriter(formated_file_path, table.schema)
-
-            writer.write_table(table)
-            file_length += len(batch)
-            logger.info(
-                f"Written {len(batch)} ({file_length} total) rows "
-                f"to {formated_file_path}"
-            )
-
-            if max_file_length is not None and file_length >= max_file_length:
-                writer.close()
-                writer = None
+def _row_groups(
+    tables: Iterator[pa.Table],
+    row_group_length: Optional[int],
+    max_file_length: Optional[int],
+) -> Iterator[pa.Table]:
+    """Regroup the tables into tables of row_group_length rows, first split
+    where they cross the end of a file (every max_file_length rows), so
+    only the last table of each file is shorter. Without a
+    row_group_length, the tables are only split."""
+    pending: List[pa.Table] = []
+    pending_length = 0
+    file_length = 0
+    for table in tables:
+        offset = 0
+        while True:
+            length = table.num_rows - offset
+            if max_file_length is not None:
+                length = min(length, max_file_length - file_length)
+            if row_group_length is not None:
+                length = min(length, row_group_length - pending_length)
+            pending.append(table.slice(offset, length))
+            pending_length += length
+            file_length += length
+            offset += length
+
+            ends_file = file_length == max_file_length
+            if (
+                ends_file
+                or row_group_length is None
+                or (pending_length == row_group_length)
+            ):
+                yield _concat(pending)
+                pending, pending_length = [], 0
+            if ends_file:
                 file_length = 0
-                file_number += 1
-                logger.info(f"Finished writing to {formated_file_path}")
-                yield formated_file_path
+            if offset >= table.num_rows:
+                break
+    if pending:
+        yield _concat(pending)
+
 
-        if writer is not None:
+def _concat(tables: List[pa.Table]) -> pa.Table:
+    if len(tables) == 1:
+        return tables[0]
+    return pa.concat_tables(tables).combine_chunks()
+
+
+def _write_files(
+    tables: Iterator[pa.Table],
+    file_path: str,
+    max_file_length: Optional[int],
+    new_writer: Callable[[str, pa.Schema], Any],
+    write_table: Callable[[Any, pa.Table], None],
+) -> Iterator[str]:
+    """Write the tables to a file, or a new file (numbered from 1 in the
+    format string file_path) once max_file_length rows have been written,
+    returning the path of each file once it is closed."""
+    writer = None
+    file_number = 1
+    file_length = 0
+    for table in tables:
+        if writer is None:
+            formated_file_path = file_path
+            if max_file_length is not None:
+                formated_file_path = file_path.format(i=file_number)
+            logger.info(f"Writing to {formated_file_path=}")
+            writer = new_writer(formated_file_path, table.schema)
+
+        write_table(writer, table)
+        file_length += table.num_rows
+        logger.info(
+            f"Written {table.num_rows} ({file_length} total) rows "
+            f"to {formated_file_path}"
+        )
+
+        if max_file_length is not None and file_length >= max_file_length:
             writer.close()
-            logger.info(f"Final file closed at {formated_file_path}")
+            writer = None
+            file_length = 0
+            file_number += 1
+            logger.info(f"Finished writing to {formated_file_path}")
             yield formated_file_path
 
+    if writer is not None:
+        writer.close()
+        logger.info(f"Final file closed at {formated_file_path}")
+        yield formated_file_path
+
+
+def parquet_writer(
+    file_path: str,
+    schema: Optional[pa.Schema] = None,
+    row_group_length: Optional[int] = None,
+    max_file_length: Optional[int] = None,
+) -> Callable[[Iterator[Union[Dict[str, Any], pa.RecordBatch]]], Iterator[str]]:
+    if row_group_length is None and max_file_length is not None:
+        row_group_length = max_file_length
+
+    _check_file_path(file_path, max_file_length)
+    logger.info(f"Initializing parquet writer with {file_path=}")
+
+    def write_table(writer: pq.ParquetWriter, table: pa.Table) -> None:
+        writer.write_table(table, row_group_size=row_group_length)
+
+    def parquet_writer_func(
+        records: Iterator[Union[Dict[str, Any], pa.RecordBatch]],
+    ) -> Iterator[str]:
+        tables = _row_groups(
+            _to_tables(records, schema, row_group_length),
+            row_group_length,
+            max_file_length,
+        )
+        yield from _write_files(
+            tables, file_path, max_file_length, pq.ParquetWriter, write_table
+        )
+
     return parquet_writer_func
+
+
+def arrow_ipc_writer(  # noqa: PLR0913
+    file_path: str,
+    schema: Optional[pa.Schema] = None,
+    batch_length: Optional[int] = None,
+    max_file_length: Optional[int] = None,
+    format: Literal["file", "stream"] = "file",  # noqa: A002
+    compression: Optional[Literal["lz4", "zstd"]] = None,
+) -> Callable[[Iterator[Union[Dict[str, Any], pa.RecordBatch]]], Iterator[str]]:
+    """Write dict records or record batches to Arrow IPC files, as a fast
+    format to hand off to a later run (eg with arrow_ipc_reader).
+
+    The options are as for parquet_writer, with batch_length the rows of
+    each batch written (and record batches are split between files at
+    max_file_length rows). format is the IPC file format (which can be
+    memory mapped and read at random), or the stream format, and the
+    buffers of each batch can be compressed with lz4 or zstd.
+    """
+    if batch_length is None and max_file_length is not None:
+        batch_length = max_file_length
+    if format not in ("file", "stream"):
+        raise ValueError(f"Unknown arrow ipc format {format}")
+
+    _check_file_path(file_path, max_file_length)
+    logger.info(f"Initializing arrow ipc writer with {file_path=}")
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    open_writer = pa.ipc.new_file if format == "file" else pa.ipc.new_stream
+
+    def new_writer(path: str, table_schema: pa.Schema) -> Any:
+        return open_writer(path, table_schema, options=options)
+
+    def write_table(writer: Any, table: pa.Table) -> None:
+        writer.write_table(table, max_chunksize=batch_length)
+
+    def arrow_ipc_writer_func(
+        records: Iterator[Union[Dict[str, Any], pa.RecordBatch]],
+    ) -> Iterator[str]:
+        tables = _row_groups(
+            _to_tables(records, schema, batch_length), batch_length, max_file_length
+        )
+        yield from _write_files(
+            tables, file_path, max_file_length, new_writer, write_table
+        )
+
+    return arrow_ipc_writer_func
@@ -0,0 +1,194 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Iterator, List
+
+import pytest
+
+from pipedata.core import AsyncChain, AsyncChainType, ops
+
+
+async def _from_list(values: List[int]) -> AsyncIterator[int]:
+    for value in values:
+        yield value
+
+
+async def _collect(iterator: AsyncIterator[Any]) -> List[Any]:
+    return [value async for value in iterator]
+
+
+def test_async_chain() -> None:
+    chain = AsyncChain[int]()
+    result = asyncio.run(_collect(chain(_from_list([0, 1, 2, 3]))))
+    assert result == [0, 1, 2, 3]
+    assert chain.get_counts() == [
+        {
+            "name": "_identity",
+            "inputs": 4,
+            "outputs": 4,
+        },
+    ]
+
+
+def test_async_chain_async_generator() -> None:
+    async def add_one(input_iterator: AsyncIterator[int]) -> AsyncIterator[int]:
+        async for element in input_iterator:
+            await asyncio.sleep(0)
+            yield element + 1
+
+    chain = AsyncChain[int]() | add_one
+    result = asyncio.run(_collect(chain(_from_list([0, 1, 2, 3]))))
+    assert result == [1, 2, 3, 4]
+    assert chain.get_counts()[1] == {"name": "add_one", "inputs": 4, "outputs": 4}
+
+
+def test_async_chain_mixed_with_sync_steps() -> None:
+    def add_one(input_iterator: Iterator[int]) -> Iterator[int]:
+        for element in input_iterator:
+            yield element + 1
+
+    def is_even(value: int) -> bool:
+        return value % 2 == 0
+
+    chain = (
+        AsyncChain[int]()
+        .then(add_one)
+        .then(ops.filtering(is_even))
+        .then(ops.amapping(str))
+    )
+    result = asyncio.run(_collect(chain(_from_list([0, 1, 2, 3]))))
+    assert result == ["2", "4"]
+    assert chain.get_counts() == [
+        {"name": "_identity", "inputs": 4, "outputs": 4},
+        {"name": "add_one", "inputs": 4, "outputs": 4},
+        {"name": "is_even", "inputs": 4, "outputs": 2},
+        {"name": "str", "inputs": 2, "outputs": 2},
+    ]
+
+
+def test_async_chain_more_sync_steps_than_workers() -> None:
+    def add_one(value: int) -> int:
+        return value + 1
+
+    async def run() -> List[int]:
+        # Each sync step waits on its upstream, so sharing these two
+        # workers between the steps would hang
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=2))
+        chain: AsyncChainType[int, int] = AsyncChain[int]()
+        for _ in range(6):
+            chain = chain.then(ops.mapping(add_one))
+        return await asyncio.wait_for(_collect(chain(_from_list([0, 1, 2]))), 10)
+
+    assert asyncio.run(run()) == [6, 7, 8]
+
+
+def test_async_chain_sync_step_stopped_early() -> None:
+    finished = []
+
+    def generate(input_iterator: Iterator[int]) -> Iterator[int]:
+        try:
+            yield from input_iterator
+        finally:
+            finished.append(True)
+
+    async def run() -> int:
+        chain = AsyncChain[int]().then(generate)
+        output = chain(_from_list([0, 1, 2]))
+        first = await output.__anext__()
+        await chain.aclose()
+        return first
+
+    assert asyncio.run(run()) == 0
+    assert finished == [True]
+
+
+def test_amapping_concurrency() -> None:
+    running = 0
+    max_running = 0
+
+    async def double(value: int) -> int:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.001 * (5 - value))
+        running -= 1
+        return value * 2
+
+    chain = AsyncChain[int]().then(ops.amapping(double, concurrency=3))
+    result = asyncio.run(_collect(chain(_from_list([0, 1, 2, 3, 4]))))
+    assert result == [0, 2, 4, 6, 8]
+    assert max_running == 3  # noqa: PLR2004
+    assert chain.get_counts()[1] == {"name": "double", "inputs": 5, "outputs": 5}
+
+
+def test_amapping_cancels_pending_on_close() -> None:
+    started: List[int] = []
+
+    async def slow(value: int) -> int:
+        started.append(value)
+        await asyncio.sleep(0.001 if value == 0 else 10)
+        return value
+
+    async def run() -> int:
+        chain = AsyncChain[int]().then(ops.amapping(slow, concurrency=3))
+        output = chain(_from_list(list(range(10))))
+        first = await output.__anext__()
+        await chain.aclose()
+        return first
+
+    assert asyncio.run(run()) == 0
+    assert len(started) <= 3  # noqa: PLR2004
+
+
+def test_amapping_invalid_concurrency() -> None:
+    with pytest.raises(ValueError, match="at least 1"):
+        ops.amapping(str, concurrency=0)
+
+
+def test_afiltering() -> None:
+    def is_even(value: int) -> bool:
+        return value % 2 == 0
+
+    async def is_small(value: int) -> bool:
+        await asyncio.sleep(0)
+        return value < 3  # noqa: PLR2004
+
+    chain = (
+        AsyncChain[int]().then(ops.afiltering(is_even)).then(ops.afiltering(is_small))
+    )
+    result = asyncio.run(_collect(chain(_from_list([0, 1, 2, 3, 4]))))
+    assert result == [0, 2]
+    assert chain.get_counts()[1:] == [
+        {"name": "is_even", "inputs": 5, "outputs": 3},
+        {"name": "is_small", "inputs": 3, "outputs": 2},
+    ]
+
+
+class _Countdown:
+    """An async iterator without an aclose method."""
+
+    def __init__(self, start: int) -> None:
+        self._value = start
+
+    def __aiter__(self) -> "_Countdown":
+        return self
+
+    async def __anext__(self) -> int:
+        if self._value <= 0:
+            raise StopAsyncIteration
+        self._value -= 1
+        return self._value
+
+
+def test_async_chain_close() -> None:
+    async def run() -> List[int]:
+        chain = AsyncChain[int]()
+        # Closing before the chain has been called is a no-op
+        await chain.aclose()
+
+        output = chain(_Countdown(3))
+        first = await output.__anext__()
+        await chain.aclose()
+        return [first] + await _collect(output)
+
+    assert asyncio.run(run()) == [2]
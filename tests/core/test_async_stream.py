@@ -0,0 +1,101 @@
+import asyncio
+from typing import AsyncIterator, Iterator, List
+
+from pipedata.core import AsyncChain, AsyncStream, Instrumentation, ops
+
+
+async def _from_list(values: List[int]) -> AsyncIterator[int]:
+    for value in values:
+        yield value
+
+
+def test_async_stream_to_list() -> None:
+    result = asyncio.run(AsyncStream([1, 2, 3]).to_list())
+    assert result == [1, 2, 3]
+
+
+def test_async_stream_from_async_iterable() -> None:
+    stream = AsyncStream(_from_list([0, 1, 2]))
+    result = asyncio.run(stream.to_list())
+    assert result == [0, 1, 2]
+    assert stream.get_counts() == [
+        {"name": "_identity", "inputs": 3, "outputs": 3},
+    ]
+
+
+def test_async_stream_to_list_smaller_length() -> None:
+    result = asyncio.run(AsyncStream([0, 1, 2, 3]).to_list(2))
+    assert result == [0, 1]
+
+    result = asyncio.run(AsyncStream([0, 1, 2, 3]).to_list(0))
+    assert result == []
+
+
+def test_async_stream_async_for() -> None:
+    async def double(value: int) -> int:
+        await asyncio.sleep(0)
+        return value * 2
+
+    async def run() -> List[int]:
+        stream = AsyncStream([0, 1, 2]) | ops.amapping(double, concurrency=2)
+        return [value async for value in stream]
+
+    assert asyncio.run(run()) == [0, 2, 4]
+
+
+def test_async_stream_then_chain() -> None:
+    def add_one(input_iterator: Iterator[int]) -> Iterator[int]:
+        for element in input_iterator:
+            yield element + 1
+
+    chain = AsyncChain[int]().then(add_one)
+    stream = AsyncStream([0, 1, 2]).then(chain)
+    assert asyncio.run(stream.to_list()) == [1, 2, 3]
+
+
+def test_async_stream_context_manager() -> None:
+    finished = []
+
+    async def generate(input_iterator: AsyncIterator[int]) -> AsyncIterator[int]:
+        try:
+            async for element in input_iterator:
+                yield element
+        finally:
+            finished.append(True)
+
+    async def run() -> int:
+        async with AsyncStream([0, 1, 2]).then(generate) as stream:
+            return await stream.__anext__()
+
+    assert asyncio.run(run()) == 0
+    assert finished == [True]
+
+
+def test_async_stream_instrumentation_off() -> None:
+    stream = AsyncStream([0, 1, 2], Instrumentation.OFF).then(ops.amapping(str))
+    assert asyncio.run(stream.to_list()) == ["0", "1", "2"]
+    assert stream.get_counts() == [
+        {"name": "_identity", "inputs": None, "outputs": None},
+        {"name": "str", "inputs": None, "outputs": None},
+    ]
+
+
+def test_async_stream_chain_as_step() -> None:
+    async def double(value: int) -> int:
+        await asyncio.sleep(0)
+        return value * 2
+
+    stream = AsyncStream([1, 2, 3]).then(AsyncChain[int]().then(ops.amapping(double)))
+    assert asyncio.run(stream.to_list()) == [2, 4, 6]
+    assert stream.get_counts() == [
+        {"name": "_identity", "inputs": 3, "outputs": 3},
+        {
+            "name": "_identity+double",
+            "inputs": 3,
+            "outputs": 3,
+            "steps": [
+                {"name": "_identity", "inputs": 3, "outputs": 3},
+                {"name": "double", "inputs": 3, "outputs": 3},
+            ],
+        },
+    ]
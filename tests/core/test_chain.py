@@ -1,6 +1,10 @@
-from typing import Iterator, Tuple
+import itertools
+from typing import Callable, Generator, Iterator, List, Optional, Tuple
 
-from pipedata.core import Chain, ChainType, ops
+import pytest
+
+from pipedata.core import Chain, ChainType, Instrumentation, ops
+from pipedata.core.links import CountingIterator, FusedLink
 
 
 def test_chain() -> None:
@@ -293,3 +297,215 @@ def test_chain_grouper_no_end() -> None:
             "outputs": 2,
         },
     ]
+
+
+def test_chain_close() -> None:
+    chain = Chain[int]().then(ops.mapping(str))
+    # Closing before the chain has been called is a no-op
+    chain.close()
+
+    output = chain(iter([0, 1, 2]))
+    assert next(output) == "0"
+    chain.close()
+    assert list(output) == []
+
+
+def test_chain_compile() -> None:
+    def add_one(input_iterator: Iterator[int]) -> Iterator[int]:
+        for element in input_iterator:
+            yield element + 1
+
+    @ops.mapping
+    def multiply_two(value: int) -> int:
+        return value * 2
+
+    @ops.filtering
+    def is_even(value: int) -> bool:
+        return value % 2 == 0
+
+    @ops.filtering
+    def is_small(value: int) -> bool:
+        return value < 10  # noqa: PLR2004
+
+    chain = (
+        Chain[int]()
+        .then(is_even)
+        .then(multiply_two)
+        .then(is_small)
+        .then(add_one)
+        .then(multiply_two)
+    ).compile()
+    result = list(chain(iter(range(10))))
+    assert result == [2, 10, 18]
+    assert chain.get_counts() == [
+        {"name": "_identity", "inputs": 10, "outputs": 10},
+        {"name": "is_even", "inputs": 10, "outputs": 5},
+        {"name": "multiply_two", "inputs": 5, "outputs": 5},
+        {"name": "is_small", "inputs": 5, "outputs": 3},
+        {"name": "add_one", "inputs": 3, "outputs": 3},
+        {"name": "multiply_two", "inputs": 3, "outputs": 3},
+    ]
+
+    # Compiling an already compiled chain gives the same steps
+    recompiled = chain.compile()
+    assert list(recompiled(iter([0, 1, 12]))) == [2]
+    assert [step["outputs"] for step in recompiled.get_counts()] == [3, 2, 2, 1, 1, 1]
+
+
+def test_chain_compile_matches_uncompiled() -> None:
+    chain = (
+        Chain[int]()
+        | ops.mapping(lambda x: x + 1)  # type: ignore
+        | ops.filtering(lambda x: x % 3 != 0)  # type: ignore
+        | ops.batched(sum, 2)
+        | ops.mapping(lambda x: x * 2)  # type: ignore
+        | ops.filtering(lambda x: x > 5)  # type: ignore  # noqa: PLR2004
+    )
+    compiled = chain.compile()
+    assert list(compiled(iter(range(20)))) == list(chain(iter(range(20))))
+    assert compiled.get_counts() == chain.get_counts()
+
+
+def test_chain_compile_push_down() -> None:
+    def add(n: int) -> Callable[[Iterator[int]], Iterator[int]]:
+        def add_func(input_iterator: Iterator[int]) -> Iterator[int]:
+            for element in input_iterator:
+                yield element + n
+
+        def push_down(
+            step: Callable[[Iterator[int]], Iterator[int]]
+        ) -> Optional[Callable[[Iterator[int]], Iterator[int]]]:
+            other = getattr(step, "n", None)
+            return None if other is None else add(n + other)
+
+        add_func.n = n  # type: ignore[attr-defined]
+        add_func.push_down = push_down  # type: ignore[attr-defined]
+        return add_func
+
+    chain = (
+        Chain[int]()
+        .then(add(1))
+        .then(add(2))
+        .then(ops.mapping[int, int](abs))
+        .then(add(3))
+    )
+    compiled = chain.compile()
+    assert list(compiled(iter([-5, 1]))) == [5, 7]
+    assert list(compiled(iter([-5, 1]))) == list(chain(iter([-5, 1])))
+    # The second step is pushed into the first, and counted with it
+    assert [step["name"] for step in compiled.get_counts()] == [
+        "_identity",
+        "add_func",
+        "abs",
+        "add_func",
+    ]
+
+
+def test_chain_compile_close() -> None:
+    chain = Chain[int]().then(ops.mapping(str)).then(ops.mapping(len)).compile()
+    # Closing before the chain has been called is a no-op
+    chain.close()
+
+    output = chain(iter([1, 10, 100]))
+    assert next(output) == 1
+    chain.close()
+    assert list(output) == []
+
+
+def test_fused_link() -> None:
+    link = FusedLink([ops.mapping(str), ops.filtering(bool)])
+    assert link.__name__ == "str+bool"
+    assert list(link(iter([0, 1]))) == ["0", "1"]
+    assert link.get_counts() == (2, 2)
+
+
+@pytest.mark.parametrize(
+    "instrumentation",
+    [Instrumentation.COUNTS, Instrumentation.SAMPLED, Instrumentation.FULL],
+)
+def test_chain_instrumentation_counts(instrumentation: Instrumentation) -> None:
+    def add_one(input_iterator: Iterator[int]) -> Iterator[int]:
+        for element in input_iterator:
+            yield element + 1
+
+    @ops.filtering
+    def is_even(value: int) -> bool:
+        return value % 2 == 0
+
+    chain = Chain[int](instrumentation).then(add_one).then(is_even)
+    assert chain.get_counts()[1] == {"name": "add_one", "inputs": 0, "outputs": 0}
+
+    output = chain(iter(range(10)))
+    assert list(itertools.islice(output, 2)) == [2, 4]
+    assert chain.get_counts() == [
+        {"name": "_identity", "inputs": 4, "outputs": 4},
+        {"name": "add_one", "inputs": 4, "outputs": 4},
+        {"name": "is_even", "inputs": 4, "outputs": 2},
+    ]
+
+    assert list(output) == [6, 8, 10]
+    assert chain.get_counts()[-1] == {"name": "is_even", "inputs": 10, "outputs": 5}
+
+
+def test_chain_instrumentation_off() -> None:
+    chain = (
+        Chain[int]("off")  # type: ignore
+        .then(ops.mapping(str))
+        .then(ops.batched(len, 2))  # type: ignore
+    )
+    output = chain(iter(range(5)))
+    assert list(output) == [2, 2, 1]
+    assert isinstance(output, Generator)
+    assert chain.get_counts() == [
+        {"name": "_identity", "inputs": None, "outputs": None},
+        {"name": "str", "inputs": None, "outputs": None},
+        {"name": "len", "inputs": None, "outputs": None},
+    ]
+
+
+@pytest.mark.parametrize(
+    "instrumentation",
+    [Instrumentation.OFF, Instrumentation.COUNTS, Instrumentation.FULL],
+)
+def test_chain_compile_instrumentation(instrumentation: Instrumentation) -> None:
+    chain = (
+        Chain[int](instrumentation)
+        .then(ops.mapping(str))
+        .then(ops.filtering(lambda x: len(x) > 1))  # type: ignore
+        .compile()
+    )
+    # Nothing has been recorded before the chain is first called
+    assert chain.get_counts()[-1] == {"name": "<lambda>", "inputs": 0, "outputs": 0}
+
+    assert list(chain(iter([1, 10, 100]))) == ["10", "100"]
+    expected_counts: List[Optional[int]] = [3, 3, 3, 2]
+    if instrumentation == Instrumentation.OFF:
+        expected_counts = [None, None, None, None]
+    assert [step["inputs"] for step in chain.get_counts()] + [
+        chain.get_counts()[-1]["outputs"]
+    ] == expected_counts
+
+
+def test_chain_stats() -> None:
+    chain = Chain[int]("full").then(ops.mapping(str)).then(ops.mapping(len))  # type: ignore
+    stats = chain.get_stats()
+    assert stats[1]["outputs"] == 0
+    assert stats[1]["wall_time"] is None
+
+    assert list(chain(iter(range(3)))) == [1, 1, 1]
+    stats = chain.get_stats()
+    assert stats[1]["outputs"] == 3  # noqa: PLR2004
+    assert stats[1]["wall_time"] >= 0
+
+    compiled = chain.compile()
+    assert list(compiled(iter(range(3)))) == [1, 1, 1]
+    assert [step["outputs"] for step in compiled.get_stats()] == [3, 3, 3]
+    assert compiled.get_stats()[1]["wall_time"] is None
+
+
+def test_counting_iterator() -> None:
+    counter = CountingIterator(iter([0, 1, 2]))
+    assert next(counter) == 0
+    assert counter.get_count() == 1
+    assert list(counter) == [1, 2]
+    assert counter.get_count() == 3  # noqa: PLR2004
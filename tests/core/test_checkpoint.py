@@ -0,0 +1,150 @@
+import json
+import os
+import tempfile
+from typing import Iterator, List
+
+import pytest
+
+from pipedata.core import Chain, Checkpoint, Stream, ops
+from pipedata.core.aggregates import Sum
+
+
+def _expand(inputs: Iterator[int]) -> Iterator[int]:
+    for value in inputs:
+        yield value * 10
+        yield value * 10 + 1
+
+
+def _fail_on_30(value: int) -> int:
+    if value == 30:  # noqa: PLR2004
+        raise ValueError("30")
+    return value
+
+
+def test_checkpoint_resumes() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "manifest.json")
+        stream = Stream(range(5), checkpoint=path).then(_expand)
+        with pytest.raises(ValueError, match="30"):
+            stream.then(ops.mapping(_fail_on_30)).to_list()
+        # Input 2 was output, but is only completed once a later output is
+        with open(path) as file:
+            assert json.load(file) == {"completed": ["0", "1"], "outputs": []}
+
+        result = Stream(range(5), checkpoint=path).then(_expand).to_list()
+        assert result == [20, 21, 30, 31, 40, 41]
+        assert Checkpoint(path).completed == ["0", "1", "2", "3", "4"]
+
+        assert Stream(range(6), checkpoint=path).then(_expand).to_list() == [50, 51]
+
+
+def test_checkpoint_outputs_and_key() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "manifest.json")
+        checkpoint = Checkpoint(path, key=lambda x: f"file-{x}", outputs=True)
+        stream = (
+            Stream([1, 2, 3], checkpoint=checkpoint)
+            .then(ops.batched[int, int](sum, 2))
+            .compile()
+        )
+        assert stream.to_list() == [3, 3]
+        with open(path) as file:
+            assert json.load(file) == {
+                "completed": ["file-1", "file-2", "file-3"],
+                "outputs": ["3", "3"],
+            }
+        assert os.listdir(temp_dir) == ["manifest.json"]
+
+
+def test_checkpoint_save_interval() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "manifest.json")
+        checkpoint = Checkpoint(path, save_interval=3)
+        saved = [
+            Checkpoint(path).completed if os.path.exists(path) else []
+            for _ in Stream(range(5), checkpoint=checkpoint)
+        ]
+        # Saved once 3 inputs are completed, and at the end
+        assert saved == [[], [], [], [], ["0", "1", "2"]]
+        assert Checkpoint(path).completed == ["0", "1", "2", "3", "4"]
+
+
+def test_checkpoint_completing() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "manifest.json")
+        items = Checkpoint(path).completing(["a", "b", "c"])
+        assert next(items) == "a"
+        # Completed once the next item is taken
+        assert next(items) == "b"
+        assert Checkpoint(path).completed == ["a"]
+        assert list(Checkpoint(path).completing(["a", "b", "c"])) == ["b", "c"]
+        assert Checkpoint(path).completed == ["a", "b", "c"]
+
+
+def test_checkpoint_nothing_pending() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "manifest.json")
+        assert Stream([], checkpoint=path).to_list() == []
+        assert not os.path.exists(path)
+
+
+def test_checkpoint_completes_once_output_handled() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "manifest.json")
+        stream = (
+            Stream([1, 2, 3], checkpoint=path)
+            .then(_expand)
+            .then(ops.batched[int, List[int]](list, 3))
+        )
+        assert next(stream) == [10, 11, 20]
+        # A crash while handling the first batch loses none of its rows
+        assert not os.path.exists(path)
+
+        stream = (
+            Stream([1, 2, 3], checkpoint=path)
+            .then(_expand)
+            .then(ops.batched[int, List[int]](list, 3))
+        )
+        assert next(stream) == [10, 11, 20]
+        assert next(stream) == [21, 30, 31]
+        assert Checkpoint(path).completed == ["1"]
+
+        result = (
+            Stream([1, 2, 3], checkpoint=path)
+            .then(_expand)
+            .then(ops.batched[int, List[int]](list, 3))
+            .to_list()
+        )
+        assert result == [[20, 21, 30], [31]]
+
+
+def test_checkpoint_rejects_reading_ahead() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "manifest.json")
+        stream = Stream([1, 2, 3], checkpoint=path)
+        with pytest.raises(ValueError, match="reading ahead"):
+            stream.then(ops.prefetch[int](2))
+        with pytest.raises(ValueError, match="reading ahead"):
+            stream | Chain[int]().then(ops.concurrent_mapping(str))
+        assert stream.then(Chain[int]().then(_expand)).to_list() == [
+            10,
+            11,
+            20,
+            21,
+            30,
+            31,
+        ]
+
+
+def test_checkpoint_rejects_sliding_window() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "manifest.json")
+        stream = Stream(range(1, 7), checkpoint=path)
+        # Later windows still need the inputs of a window once it is output
+        with pytest.raises(ValueError, match="reading ahead"):
+            stream.then(ops.sliding_window(3, 1, {"s": Sum()}))
+        step = ops.tumbling_window(3, {"s": Sum()})
+        assert stream.then(step).to_list() == [
+            {"window_start": 0, "window_end": 3, "s": 6},
+            {"window_start": 3, "window_end": 6, "s": 15},
+        ]
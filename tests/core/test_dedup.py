@@ -0,0 +1,55 @@
+from fractions import Fraction
+
+import pytest
+
+from pipedata.core.dedup import BloomSet, DigestSet, digest
+
+
+def test_digest_distinguishes_types() -> None:
+    digests = {digest(1), digest("1"), digest(b"1"), digest(None), digest((1,))}
+    assert len(digests) == 5  # noqa: PLR2004
+    assert digest(("a", 1)) == digest(("a", 1))
+    assert digest((1,)) != digest([1])
+    assert digest(("ab", "c")) != digest(("a", "bc"))
+
+
+def test_digest_compares_by_value() -> None:
+    assert digest(1) == digest(1.0) == digest(True)
+    assert digest(1.5) != digest(1)
+    assert digest({"a": 1, "b": [2.0]}) == digest({"b": [2], "a": 1})
+    assert digest({1, "a"}) == digest(frozenset(["a", 1.0]))
+    assert digest(Fraction(1, 2)) == digest(Fraction(2, 4))
+
+
+def test_digest_rejects_identity_repr() -> None:
+    with pytest.raises(TypeError, match="object"):
+        digest(object())
+    with pytest.raises(TypeError, match="object"):
+        digest(("a", object()))
+
+
+def test_digest_set_grows() -> None:
+    seen = DigestSet(capacity=4)
+    initial_memory = seen.memory_bytes
+    assert all(seen.add(i) for i in range(10_000))
+    assert not any(seen.add(i) for i in range(10_000))
+    assert len(seen) == 10_000  # noqa: PLR2004
+    assert seen.memory_bytes > initial_memory
+    # 8 byte slots, at a load between 0.35 and 0.7
+    assert seen.memory_bytes <= 8 * 10_000 / 0.35  # noqa: PLR2004
+
+
+def test_bloom_set_scales() -> None:
+    seen = BloomSet(capacity=1000, error_rate=0.01)
+    added = sum(seen.add(i) for i in range(10_000))
+    # Keys added are always found again
+    assert not any(seen.add(i) for i in range(10_000))
+    false_positives = sum(not seen.add(i) for i in range(10_000, 20_000))
+    assert added >= 10_000 * 0.99  # noqa: PLR2004
+    assert false_positives <= 10_000 * 0.02  # noqa: PLR2004
+    assert len(seen) == added + 10_000 - false_positives
+
+
+def test_bloom_set_invalid_error_rate() -> None:
+    with pytest.raises(ValueError, match="error_rate"):
+        BloomSet(error_rate=1)
@@ -0,0 +1,471 @@
+import itertools
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterator, List
+
+import pytest
+
+from pipedata.core import Chain, Instrumentation, Stream, ops
+
+
+def square(value: int) -> int:
+    return value * value
+
+
+def fail_on_three(value: int) -> int:
+    if value == 3:  # noqa: PLR2004
+        raise ValueError("three")
+    return value
+
+
+def test_parallel_mapping() -> None:
+    chain = Chain[int]().then(ops.parallel_mapping(square, workers=2))
+    result = list(chain(iter(range(10))))
+    assert result == [value * value for value in range(10)]
+    assert chain.get_counts() == [
+        {
+            "name": "_identity",
+            "inputs": 10,
+            "outputs": 10,
+        },
+        {
+            "name": "square",
+            "inputs": 10,
+            "outputs": 10,
+        },
+    ]
+
+
+def test_parallel_mapping_chunked() -> None:
+    result = (
+        Stream(range(11))
+        .then(ops.parallel_mapping(square, workers=2, chunksize=3, max_in_flight=2))
+        .to_list()
+    )
+    assert result == [value * value for value in range(11)]
+
+
+def test_parallel_mapping_unordered() -> None:
+    result = (
+        Stream(range(20))
+        .then(ops.parallel_mapping(square, workers=3, chunksize=2, ordered=False))
+        .to_list()
+    )
+    assert sorted(result) == [value * value for value in range(20)]
+
+
+def test_parallel_mapping_bounded_in_flight() -> None:
+    stream = Stream(range(100)).then(
+        ops.parallel_mapping(square, workers=1, chunksize=2, max_in_flight=3)
+    )
+    assert stream.to_list(1) == [0]
+    # Only the chunks in flight have been pulled from upstream
+    assert stream.get_counts()[0]["outputs"] == 6  # noqa: PLR2004
+
+
+def test_parallel_mapping_raises() -> None:
+    stream = Stream(range(5)).then(ops.parallel_mapping(fail_on_three, workers=2))
+    with pytest.raises(ValueError, match="three"):
+        stream.to_list()
+
+
+def test_parallel_mapping_invalid_arguments() -> None:
+    with pytest.raises(ValueError, match="at least 1"):
+        ops.parallel_mapping(square, workers=0)
+    with pytest.raises(ValueError, match="at least 1"):
+        ops.parallel_mapping(square, chunksize=0)
+
+
+def test_concurrent_mapping() -> None:
+    chain = Chain[int]().then(ops.concurrent_mapping(square, workers=4))
+    result = list(chain(iter(range(10))))
+    assert result == [value * value for value in range(10)]
+    assert chain.get_counts()[1] == {"name": "square", "inputs": 10, "outputs": 10}
+
+
+def test_concurrent_mapping_unordered() -> None:
+    def slow_first(value: int) -> int:
+        if value == 0:
+            time.sleep(0.05)
+        return value
+
+    result = (
+        Stream(range(5))
+        .then(ops.concurrent_mapping(slow_first, workers=5, ordered=False))
+        .to_list()
+    )
+    assert sorted(result) == [0, 1, 2, 3, 4]
+    assert result[-1] == 0
+
+
+def test_concurrent_mapping_overlaps_work() -> None:
+    barrier = threading.Barrier(4, timeout=5)
+
+    def wait_for_all(value: int) -> int:
+        barrier.wait()
+        return value
+
+    result = (
+        Stream(range(4)).then(ops.concurrent_mapping(wait_for_all, workers=4)).to_list()
+    )
+    assert result == [0, 1, 2, 3]
+
+
+def test_concurrent_mapping_raises_with_traceback() -> None:
+    stream = Stream(range(5)).then(ops.concurrent_mapping(fail_on_three, workers=2))
+    with pytest.raises(ValueError, match="three") as excinfo:
+        stream.to_list()
+    assert excinfo.traceback[-1].name == "fail_on_three"
+
+
+def test_concurrent_mapping_cancelled_on_close() -> None:
+    processed: List[int] = []
+
+    def record(value: int) -> int:
+        time.sleep(0.01)
+        processed.append(value)
+        return value
+
+    with Stream(range(100)).then(
+        ops.concurrent_mapping(record, workers=1, max_in_flight=3)
+    ) as stream:
+        assert next(stream) == 0
+
+    assert len(processed) <= 3  # noqa: PLR2004
+    assert stream.get_counts()[0]["outputs"] <= 3  # noqa: PLR2004
+
+
+def test_concurrent_mapping_invalid_arguments() -> None:
+    with pytest.raises(ValueError, match="at least 1"):
+        ops.concurrent_mapping(square, max_in_flight=0)
+
+
+def test_prefetch() -> None:
+    chain = Chain[int]().then(ops.prefetch[int](2)).then(ops.mapping(square))
+    assert list(chain(iter(range(5)))) == [0, 1, 4, 9, 16]
+    assert chain.get_counts()[1] == {"name": "prefetch_", "inputs": 5, "outputs": 5}
+
+
+def test_prefetch_overlaps_upstream() -> None:
+    read = [threading.Event() for _ in range(10)]
+
+    def read_elements(input_iterator: Iterator[int]) -> Iterator[int]:
+        for element in input_iterator:
+            read[element].set()
+            yield element
+
+    def process_while_reading(value: int) -> int:
+        # Waits for the next element to be read, so fails if run in turn
+        if value + 1 < len(read):
+            assert read[value + 1].wait(timeout=5)
+        return value
+
+    result = (
+        Stream(range(10))
+        .then(read_elements)
+        .then(ops.prefetch[int](4))
+        .then(ops.mapping(process_while_reading))
+        .to_list()
+    )
+    assert result == list(range(10))
+
+
+def test_prefetch_bounded() -> None:
+    stream = Stream(range(100)).then(ops.prefetch[int](3))
+    assert next(stream) == 0
+    time.sleep(0.05)
+    # 1 taken, 3 in the queue, and 1 waiting to be added
+    assert stream.get_counts()[0]["outputs"] <= 5  # noqa: PLR2004
+    stream.close()
+
+
+def test_prefetch_raises() -> None:
+    def failing(input_iterator: Iterator[int]) -> Iterator[int]:
+        yield from input_iterator
+        raise ValueError("upstream failed")
+
+    stream = Stream(range(3)).then(failing).then(ops.prefetch[int](2))
+    with pytest.raises(ValueError, match="upstream failed") as excinfo:
+        stream.to_list()
+    assert excinfo.traceback[-1].name == "failing"
+
+
+def test_prefetch_stops_on_close() -> None:
+    before = threading.active_count()
+    with Stream(itertools.count()).then(ops.prefetch[int](2)) as stream:
+        assert stream.to_list(3) == [0, 1, 2]
+        assert threading.active_count() == before + 1
+    assert threading.active_count() == before
+
+
+def test_prefetch_closes_upstream_on_its_thread() -> None:
+    closed_on: List[str] = []
+
+    def upstream(input_iterator: Iterator[int]) -> Iterator[int]:
+        try:
+            yield from input_iterator
+        finally:
+            closed_on.append(threading.current_thread().name)
+
+    stream = (
+        Stream(itertools.count(), Instrumentation.OFF)
+        .then(upstream)
+        .then(ops.prefetch[int](2))
+    )
+    assert next(stream) == 0
+    stream.close()
+    assert closed_on == ["prefetch"]
+
+
+def test_prefetch_invalid_size() -> None:
+    with pytest.raises(ValueError, match="at least 1"):
+        ops.prefetch(0)
+
+
+def is_even(value: int) -> bool:
+    return value % 2 == 0
+
+
+def _total(input_iterator: Iterator[int]) -> Iterator[int]:
+    yield sum(input_iterator)
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_tee(threaded: bool) -> None:  # noqa: FBT001
+    squares = Chain[int]().then(ops.mapping(square))
+    evens = Chain[int]().then(ops.filtering(is_even)).then(_total)
+    result = Stream(range(10)).tee(squares, evens, threaded=threaded)
+    assert result == ([x * x for x in range(10)], [20])
+    assert evens.get_counts()[1] == {"name": "is_even", "inputs": 10, "outputs": 5}
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_tee_branch_stops_early(threaded: bool) -> None:  # noqa: FBT001
+    first_three = Chain[int]().then(lambda items: itertools.islice(items, 3))
+    result = Stream(range(10)).tee(
+        first_three, _total, buffer_size=10, threaded=threaded
+    )
+    assert result == ([0, 1, 2], [45])
+
+
+def test_tee_in_chain() -> None:
+    chain = Chain[int]().then(ops.tee[int](_total, ops.batched[int, int](sum, 4)))
+    assert list(chain(iter(range(10)))) == [([45], [6, 22, 17])]
+
+
+def test_tee_buffer_overflow() -> None:
+    with pytest.raises(RuntimeError, match="increase buffer_size"):
+        Stream(range(10)).tee(
+            _total, ops.mapping(square), buffer_size=5, threaded=False
+        )
+
+
+def test_tee_threaded_no_overflow() -> None:
+    result = Stream(range(10)).tee(
+        _total, ops.mapping(square), buffer_size=5, threaded=True
+    )
+    assert result == ([45], [x * x for x in range(10)])
+
+
+def test_tee_threaded_branch_raises() -> None:
+    before = threading.active_count()
+    with pytest.raises(ValueError, match="three"):
+        Stream(range(100)).tee(
+            _total, ops.mapping(fail_on_three), buffer_size=2, threaded=True
+        )
+    assert threading.active_count() == before
+
+
+def test_tee_threaded_upstream_raises() -> None:
+    def failing(input_iterator: Iterator[int]) -> Iterator[int]:
+        yield from input_iterator
+        raise ValueError("upstream failed")
+
+    before = threading.active_count()
+    with pytest.raises(ValueError, match="upstream failed"):
+        Stream(range(3)).then(failing).tee(_total, threaded=True)
+    assert threading.active_count() == before
+
+
+def test_tee_invalid() -> None:
+    with pytest.raises(ValueError, match="at least one branch"):
+        ops.tee()
+    with pytest.raises(ValueError, match="at least 1"):
+        ops.tee(_total, buffer_size=0)
+
+
+def test_sorted_by_in_memory() -> None:
+    values = [5, 3, 8, 1, 9, 2]
+    assert Stream(values).then(ops.sorted_by[int]()).to_list() == sorted(values)
+
+
+def test_sorted_by_spills() -> None:
+    rng = random.Random(1)
+    records = [{"key": rng.randint(0, 100), "position": i} for i in range(5000)]
+    with tempfile.TemporaryDirectory() as spill_dir:
+        step = ops.sorted_by[Dict[str, int]](
+            lambda x: x["key"], memory_limit=50_000, spill_dir=spill_dir
+        )
+        result = Stream(records).then(step).to_list()
+    # Stable, so equal keys remain in input order
+    assert result == sorted(records, key=lambda x: x["key"])
+
+
+def test_sorted_by_reverse_spills() -> None:
+    values = [(i * 7919) % 1000 for i in range(1000)]
+    step = ops.sorted_by[int](reverse=True, memory_limit=1000)
+    assert Stream(values).then(step).to_list() == sorted(values, reverse=True)
+
+
+def test_sorted_by_spilled_files_closed_early() -> None:
+    values = [[i % 10, str(i)] for i in range(100)]
+    step = ops.sorted_by[List[Any]](memory_limit=500)
+    with Stream(values).then(step) as stream:
+        assert stream.to_list(2) == [[0, "0"], [0, "10"]]
+
+
+def test_sorted_by_invalid() -> None:
+    with pytest.raises(ValueError, match="at least 1"):
+        ops.sorted_by(memory_limit=0)
+
+
+@pytest.mark.parametrize("exact", [True, False])
+def test_distinct(exact: bool) -> None:  # noqa: FBT001
+    values = [3, 1, 3, 2, 1, 3, 4]
+    stream = Stream(values).then(ops.distinct[int](exact=exact))
+    assert stream.to_list() == [3, 1, 2, 4]
+    stats = stream.get_stats()[1]
+    assert stats["distinct_keys"] == 4  # noqa: PLR2004
+    assert stats["memory_bytes"] > 0
+
+
+def test_distinct_by_key() -> None:
+    records = [{"id": 1, "v": "a"}, {"id": 2, "v": "b"}, {"id": 1, "v": "c"}]
+    step = ops.distinct[Dict[str, Any]](lambda r: r["id"], capacity=10)
+    assert Stream(records).then(step).to_list() == records[:2]
+
+
+def test_distinct_by_value() -> None:
+    records: List[Dict[str, Any]] = [
+        {"a": 1, "b": 2},
+        {"b": 2.0, "a": 1},
+        {"a": True, "b": 3},
+    ]
+    step = ops.distinct[Dict[str, Any]]()
+    assert Stream(records).then(step).to_list() == [
+        records[0],
+        records[2],
+    ]
+
+
+def test_distinct_stats_before_run() -> None:
+    stats = Chain[int]().then(ops.distinct[int]()).get_stats()[1]
+    assert stats["distinct_keys"] == 0
+    assert stats["memory_bytes"] == 0
+
+
+def test_distinct_invalid() -> None:
+    with pytest.raises(ValueError, match="at least 1"):
+        ops.distinct(capacity=0)
+
+
+class _CountingSquare:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self, value: int) -> int:
+        self.calls += 1
+        return value * value
+
+
+def test_cached_mapping() -> None:
+    func = _CountingSquare()
+    step = ops.cached_mapping(func, maxsize=2)
+    stream = Stream([1, 2, 1, 3, 2, 1]).then(step)
+    assert stream.to_list() == [1, 4, 1, 9, 4, 1]
+    # 2 is evicted by 3, and then 1 by 2
+    assert func.calls == 5  # noqa: PLR2004
+    stats = stream.get_stats()[1]
+    assert stats["inputs"] == stats["outputs"] == 6  # noqa: PLR2004
+    assert {k: v for k, v in stats.items() if k.startswith("cache_")} == {
+        "cache_hits": 1,
+        "cache_misses": 5,
+        "cache_evictions": 3,
+        "cache_size": 2,
+    }
+
+
+def test_cached_mapping_key_and_ttl() -> None:
+    func = _CountingSquare()
+    step = ops.cached_mapping[int, int](func, key=lambda x: x % 2, ttl=0.05)
+    assert Stream([1, 3, 2]).then(step).to_list() == [1, 1, 4]
+    time.sleep(0.06)
+    assert Stream([3]).then(step).to_list() == [9]
+    assert func.calls == 3  # noqa: PLR2004
+
+
+def test_cached_mapping_disk() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "cache.sqlite")
+        func = _CountingSquare()
+        step = ops.cached_mapping(func, backend="disk", path=path, maxsize=2)
+        assert Stream([1, 2, 1, 3]).then(step).to_list() == [1, 4, 1, 9]
+        assert func.calls == 3  # noqa: PLR2004
+
+        # The cache persists for a new link
+        step = ops.cached_mapping(func, backend="disk", path=path, ttl=0.05)
+        stream = Stream([3, 1, 2]).then(step)
+        assert stream.to_list() == [9, 1, 4]
+        assert func.calls == 4  # noqa: PLR2004
+        assert stream.get_stats()[1]["cache_hits"] == 2  # noqa: PLR2004
+
+        time.sleep(0.06)
+        assert Stream([2]).then(step).to_list() == [4]
+        assert func.calls == 5  # noqa: PLR2004
+
+
+def test_cached_mapping_disk_commits_in_batches() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "cache.sqlite")
+        step = ops.cached_mapping(square, backend="disk", path=path, maxsize=None)
+        assert Stream(range(1500)).then(step).to_list()[-1] == 1499 * 1499
+        stats = Chain[int]().then(step).get_stats()[1]
+        assert stats["cache_size"] == 1500  # noqa: PLR2004
+
+
+@pytest.mark.parametrize(
+    "instrumentation", [Instrumentation.COUNTS, Instrumentation.OFF]
+)
+def test_cached_mapping_disk_before_prefetch(instrumentation: Instrumentation) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "cache.sqlite")
+        step = ops.cached_mapping(square, backend="disk", path=path, maxsize=None)
+        stream = (
+            Stream(range(10), instrumentation).then(step).then(ops.prefetch[int](2))
+        )
+        assert next(stream) == 0
+        # Closed from this thread, with the cache used on the prefetch thread
+        stream.close()
+
+        func = _CountingSquare()
+        step = ops.cached_mapping(func, backend="disk", path=path)
+        assert Stream([0]).then(step).to_list() == [0]
+        assert func.calls == 0
+
+
+def test_cached_mapping_disk_stats_before_run() -> None:
+    step = ops.cached_mapping(square, backend="disk", path="unused.sqlite")
+    stats = Chain[int]().then(step).get_stats()[1]
+    assert "cache_hits" not in stats
+
+
+def test_cached_mapping_invalid() -> None:
+    with pytest.raises(ValueError, match="at least 1"):
+        ops.cached_mapping(square, maxsize=0)
+    with pytest.raises(ValueError, match="path"):
+        ops.cached_mapping(square, backend="disk")
+    with pytest.raises(ValueError, match="Unknown cache backend"):
+        ops.cached_mapping(square, backend="redis")  # type: ignore[arg-type]
@@ -1,7 +1,19 @@
+import itertools
+import time
 from itertools import islice
 from typing import Iterable, Iterator, List
 
-from pipedata.core import Chain, Stream, ops
+import pytest
+
+from pipedata.core import (
+    Chain,
+    Instrumentation,
+    Stream,
+    interleave,
+    merge_sorted,
+    ops,
+    zip_streams,
+)
 
 
 def test_stream_to_list() -> None:
@@ -174,3 +186,182 @@ def test_stream_batched() -> None:
 
     result = Stream([0, 1, 2, 3, 4]).then(ops.batched(add_values, 2)).to_list()
     assert result == [1, 5, 4]
+
+
+def test_stream_close() -> None:
+    finished = []
+
+    def generate(input_iterator: Iterator[int]) -> Iterator[int]:
+        try:
+            yield from input_iterator
+        finally:
+            finished.append(True)
+
+    stream = Stream([0, 1, 2, 3]).then(generate).then(ops.mapping(str))
+    assert next(stream) == "0"
+    stream.close()
+    assert finished == [True]
+    assert stream.to_list() == []
+
+
+def test_stream_compile() -> None:
+    stream = (
+        Stream(range(10))
+        .then(ops.filtering(lambda x: x % 2 == 0))  # type: ignore
+        .then(ops.mapping(lambda x: x * 3))
+        .compile()
+    )
+    assert stream.to_list() == [0, 6, 12, 18, 24]
+    assert stream.get_counts() == [
+        {"name": "_identity", "inputs": 10, "outputs": 10},
+        {"name": "<lambda>", "inputs": 10, "outputs": 5},
+        {"name": "<lambda>", "inputs": 5, "outputs": 5},
+    ]
+
+
+def test_stream_instrumentation() -> None:
+    stream = Stream(range(10), Instrumentation.COUNTS).then(
+        ops.filtering(lambda x: x > 3)  # type: ignore  # noqa: PLR2004
+    )
+    assert stream.to_list() == [4, 5, 6, 7, 8, 9]
+    assert stream.get_counts()[-1] == {"name": "<lambda>", "inputs": 10, "outputs": 6}
+
+    stream_off = Stream(range(10), Instrumentation.OFF).then(ops.mapping(str))
+    assert len(stream_off.to_list()) == 10  # noqa: PLR2004
+    assert stream_off.get_counts()[-1] == {
+        "name": "str",
+        "inputs": None,
+        "outputs": None,
+    }
+
+
+def test_stream_stats() -> None:
+    def slow(input_iterator: Iterator[int]) -> Iterator[int]:
+        for element in input_iterator:
+            time.sleep(0.01)
+            yield element
+
+    stream = Stream(range(5), Instrumentation.FULL).then(slow).then(ops.mapping(str))
+    assert stream.to_list() == ["0", "1", "2", "3", "4"]
+
+    stats = stream.get_stats()
+    assert [step["name"] for step in stats] == ["_identity", "slow", "str"]
+    slow_stats = stats[1]
+    assert slow_stats["inputs"] == slow_stats["outputs"] == 5  # noqa: PLR2004
+    assert slow_stats["wall_time"] >= 0.05  # noqa: PLR2004
+    assert slow_stats["time_to_first_output"] >= 0.01  # noqa: PLR2004
+    assert slow_stats["outputs_per_second"] <= 100  # noqa: PLR2004
+    # 5 outputs, and the final call that finds the input exhausted
+    assert sum(slow_stats["latency_histogram"].values()) == 6  # noqa: PLR2004
+    assert max(slow_stats["latency_histogram"]) >= 0.01  # noqa: PLR2004
+
+    # The time spent in the slow step is excluded from the later step
+    str_stats = stats[2]
+    assert str_stats["wall_time"] < 0.01  # noqa: PLR2004
+    assert str_stats["time_to_first_output"] >= 0.01  # noqa: PLR2004
+
+
+def test_stream_stats_prefetch_excludes_other_threads() -> None:
+    def busy(input_iterator: Iterator[int]) -> Iterator[int]:
+        for element in input_iterator:
+            sum(range(100_000))
+            yield element
+
+    stream = (
+        Stream(range(20), Instrumentation.FULL).then(busy).then(ops.prefetch[int](4))
+    )
+    assert stream.to_list() == list(range(20))
+    # The busy step runs on the prefetch thread, so is not subtracted from
+    # the time of prefetch on the consuming thread
+    prefetch_stats = stream.get_stats()[2]
+    assert prefetch_stats["cpu_time"] >= 0
+    assert prefetch_stats["wall_time"] >= 0
+
+
+def test_stream_stats_sampled() -> None:
+    stream = Stream(range(1000), Instrumentation.SAMPLED).then(ops.mapping(str))
+    assert len(stream.to_list()) == 1000  # noqa: PLR2004
+    stats = stream.get_stats()[1]
+    assert stats["inputs"] == stats["outputs"] == 1000  # noqa: PLR2004
+    assert stats["wall_time"] > 0
+    # One in 100 calls is timed (including the final, exhausted call)
+    assert sum(stats["latency_histogram"].values()) == 11  # noqa: PLR2004
+
+
+@pytest.mark.parametrize(
+    "instrumentation", [Instrumentation.COUNTS, Instrumentation.OFF]
+)
+def test_stream_stats_not_timed(instrumentation: Instrumentation) -> None:
+    stream = Stream(range(3), instrumentation).then(ops.mapping(str))
+    stream.to_list()
+    assert stream.get_stats()[1] == {
+        "name": "str",
+        "inputs": None if instrumentation == Instrumentation.OFF else 3,
+        "outputs": None if instrumentation == Instrumentation.OFF else 3,
+        "wall_time": None,
+        "cpu_time": None,
+        "outputs_per_second": None,
+        "time_to_first_output": None,
+        "latency_histogram": None,
+    }
+
+
+def test_merge_sorted() -> None:
+    stream = merge_sorted(Stream([1, 4, 7]), [2, 5], Stream(range(3, 10, 3)))
+    assert stream.to_list() == [1, 2, 3, 4, 5, 6, 7, 9]
+    assert stream.get_counts() == [
+        {"name": "merge_sorted", "inputs": 8, "outputs": 8},
+    ]
+
+
+def test_merge_sorted_key_reverse() -> None:
+    stream = merge_sorted(
+        [{"t": 3}, {"t": 1}], [{"t": 2}], key=lambda x: x["t"], reverse=True
+    )
+    assert stream.to_list() == [{"t": 3}, {"t": 2}, {"t": 1}]
+
+
+def test_merge_sorted_is_lazy() -> None:
+    stream = merge_sorted(Stream(itertools.count(0, 2)), itertools.count(1, 2))
+    assert stream.then(ops.mapping[int, int](lambda x: x * 10)).to_list(5) == [
+        0,
+        10,
+        20,
+        30,
+        40,
+    ]
+
+
+def test_zip_streams() -> None:
+    stream = zip_streams(Stream([1, 2, 3]), ["a", "b"])
+    assert stream.to_list() == [(1, "a"), (2, "b")]
+    counts = stream.get_counts()
+    assert counts[0]["name"] == "zip_streams"
+    assert counts[0]["outputs"] == 2  # noqa: PLR2004
+
+
+def test_interleave() -> None:
+    stream = interleave(Stream([1, 2, 3]), [10], Stream([20, 30]))
+    assert stream.to_list() == [1, 10, 20, 2, 30, 3]
+    assert stream.get_counts() == [
+        {"name": "interleave", "inputs": 6, "outputs": 6},
+    ]
+
+
+def test_combined_stream_not_counted() -> None:
+    stream = interleave([1, 2], [3], instrumentation=Instrumentation.OFF)
+    assert stream.to_list() == [1, 3, 2]
+    assert stream.get_counts() == [
+        {"name": "interleave", "inputs": None, "outputs": None},
+    ]
+
+
+def test_combined_stream_compile_and_close() -> None:
+    first = Stream(itertools.count()).then(ops.mapping[int, int](lambda x: x + 1))
+    second = Stream(itertools.count())
+    stream = interleave(first, second).then(ops.mapping(str)).compile()
+    assert stream.to_list(4) == ["1", "0", "2", "1"]
+    assert stream.get_counts()[0]["name"] == "interleave"
+    stream.close()
+    with pytest.raises(StopIteration):
+        next(first)
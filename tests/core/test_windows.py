@@ -0,0 +1,227 @@
+import datetime
+import random
+from typing import Any, Dict, List
+
+import pytest
+
+from pipedata.core import Stream, ops
+from pipedata.core.aggregates import Aggregate, Count, Max, Mean, Min, Sum
+
+
+def _aggregates() -> Dict[str, Aggregate]:
+    return {
+        "count": Count(),
+        "total": Sum("value"),
+        "mean": Mean("value"),
+        "min": Min("value"),
+        "max": Max(lambda x: x["value"]),
+    }
+
+
+def _expected(start: Any, end: Any, values: List[int]) -> Dict[str, Any]:
+    return {
+        "window_start": start,
+        "window_end": end,
+        "count": len(values),
+        "total": sum(values),
+        "mean": sum(values) / len(values),
+        "min": min(values),
+        "max": max(values),
+    }
+
+
+def _events(values: List[int]) -> List[Dict[str, int]]:
+    return [{"value": value} for value in values]
+
+
+def test_tumbling_window_by_count() -> None:
+    result = (
+        Stream(_events([3, 1, 4, 1, 5, 9, 2]))
+        .then(ops.tumbling_window(3, _aggregates()))
+        .to_list()
+    )
+    assert result == [
+        _expected(0, 3, [3, 1, 4]),
+        _expected(3, 6, [1, 5, 9]),
+        _expected(6, 7, [2]),
+    ]
+
+
+def test_tumbling_window_by_timestamp() -> None:
+    events = [{"t": t, "value": t * 10} for t in [1, 2, 4, 5, 12, 13]]
+    result = (
+        Stream(events)
+        .then(ops.tumbling_window(4, {"total": Sum("value")}, timestamp="t"))
+        .to_list()
+    )
+    assert result == [
+        {"window_start": 1, "window_end": 5, "total": 70},
+        {"window_start": 5, "window_end": 9, "total": 50},
+        {"window_start": 9, "window_end": 13, "total": 120},
+        {"window_start": 13, "window_end": 17, "total": 130},
+    ]
+
+
+def test_tumbling_window_datetimes() -> None:
+    midnight = datetime.datetime(2024, 1, 1)
+    times = [midnight + datetime.timedelta(minutes=m) for m in [5, 50, 61, 200]]
+    result = (
+        Stream(times)
+        .then(
+            ops.tumbling_window(
+                datetime.timedelta(hours=1),
+                {"n": Count()},
+                timestamp=lambda t: t,
+                origin=midnight,
+            )
+        )
+        .to_list()
+    )
+    assert [(r["window_start"].hour, r["n"]) for r in result] == [
+        (0, 2),
+        (1, 1),
+        (3, 1),
+    ]
+
+
+def test_tumbling_window_empty() -> None:
+    step = ops.tumbling_window(4, {"n": Count()}, timestamp="t")
+    assert Stream([]).then(step).to_list() == []
+
+
+def _brute_force_sliding(
+    values: List[int], size: int, step: int
+) -> List[Dict[str, Any]]:
+    return [
+        _expected(start, start + size, values[start : start + size])
+        for start in range(0, len(values) - size + 1, step)
+    ]
+
+
+@pytest.mark.parametrize(("size", "step"), [(3, 1), (4, 2), (6, 4), (2, 3), (5, 5)])
+def test_sliding_window_by_count(size: int, step: int) -> None:
+    rng = random.Random(size * 10 + step)
+    values = [rng.randint(-20, 20) for _ in range(51)]
+    result = (
+        Stream(_events(values))
+        .then(ops.sliding_window(size, step, _aggregates()))
+        .to_list()
+    )
+    assert result == _brute_force_sliding(values, size, step)
+
+
+def test_sliding_window_by_timestamp() -> None:
+    events = [{"t": t, "value": v} for t, v in [(0, 5), (1, 2), (3, 7), (10, 1)]]
+    result = (
+        Stream(events)
+        .then(
+            ops.sliding_window(
+                4,
+                2,
+                {"n": Count(), "max": Max("value")},
+                timestamp="t",
+            )
+        )
+        .to_list()
+    )
+    # Windows start every 2 from the first timestamp, skipping empty windows
+    assert result == [
+        {"window_start": -2, "window_end": 2, "n": 2, "max": 5},
+        {"window_start": 0, "window_end": 4, "n": 3, "max": 7},
+        {"window_start": 2, "window_end": 6, "n": 1, "max": 7},
+        {"window_start": 8, "window_end": 12, "n": 1, "max": 1},
+        {"window_start": 10, "window_end": 14, "n": 1, "max": 1},
+    ]
+
+
+def test_sliding_window_skips_none() -> None:
+    result = (
+        Stream([{"value": None}, {"value": None}, {"value": 3}, {"value": 1}])
+        .then(ops.sliding_window(2, 1, {"n": Count("value"), "min": Min("value")}))
+        .to_list()
+    )
+    assert result == [
+        {"window_start": 0, "window_end": 2, "n": 0, "min": None},
+        {"window_start": 1, "window_end": 3, "n": 1, "min": 3},
+        {"window_start": 2, "window_end": 4, "n": 2, "min": 1},
+    ]
+
+
+def test_sliding_window_invalid() -> None:
+    with pytest.raises(ValueError, match="at least 1"):
+        ops.sliding_window(0, 1, {})
+    with pytest.raises(ValueError, match="multiple of step"):
+        Stream([{"t": 1}]).then(ops.sliding_window(5, 2, {}, timestamp="t")).to_list()
+
+
+def test_session_window() -> None:
+    events = [{"t": t, "value": 1} for t in [0, 1, 3, 10, 11, 30]]
+    result = (
+        Stream(events)
+        .then(ops.session_window(2, {"n": Sum("value")}, timestamp="t"))
+        .to_list()
+    )
+    assert result == [
+        {"window_start": 0, "window_end": 3, "n": 3},
+        {"window_start": 10, "window_end": 11, "n": 2},
+        {"window_start": 30, "window_end": 30, "n": 1},
+    ]
+
+
+def test_session_window_empty() -> None:
+    step = ops.session_window(2, {"n": Count()}, timestamp="t")
+    assert Stream([]).then(step).to_list() == []
+
+
+@pytest.mark.parametrize(
+    "step",
+    [
+        ops.tumbling_window(4, {"n": Count()}, timestamp="t"),
+        ops.session_window(4, {"n": Count()}, timestamp="t"),
+    ],
+)
+def test_window_timestamps_out_of_order(step: Any) -> None:
+    with pytest.raises(ValueError, match="non-decreasing"):
+        Stream([{"t": 5}, {"t": 10}, {"t": 1}]).then(step).to_list()
+
+
+def test_tumbling_window_invalid() -> None:
+    with pytest.raises(ValueError, match="at least 1"):
+        ops.tumbling_window(0, {})
+
+
+def test_count_non_null_field() -> None:
+    result = (
+        Stream([{"a": 1}, {"a": None}, {"a": 3}])
+        .then(ops.tumbling_window(5, {"n": Count("a"), "mean": Mean("a")}))
+        .to_list()
+    )
+    assert result == [{"window_start": 0, "window_end": 3, "n": 2, "mean": 2}]
+
+
+def test_aggregate_merge() -> None:
+    for aggregate, expected in [
+        (Count(), 4),
+        (Sum(), 10),
+        (Mean(), 2.5),
+        (Min(), 1),
+        (Max(), 4),
+    ]:
+        first = aggregate.create()
+        second = aggregate.create()
+        for value in [1, 2]:
+            first = aggregate.update(first, value)
+        for value in [3, 4]:
+            second = aggregate.update(second, value)
+        assert aggregate.result(aggregate.merge(first, second)) == expected
+        assert aggregate.result(aggregate.merge(first, aggregate.create())) in (
+            2,
+            3,
+            1.5,
+            1,
+        )
+
+
+def test_mean_of_nothing() -> None:
+    mean = Mean()
+    assert mean.result(mean.create()) is None
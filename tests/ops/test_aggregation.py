@@ -0,0 +1,163 @@
+import random
+import tempfile
+from typing import Any, Dict, List
+
+import pyarrow as pa  # type: ignore
+import pytest
+
+from pipedata.core import Stream
+from pipedata.core.aggregates import Aggregate, Count, Max, Mean, Min, Sum
+from pipedata.ops import group_aggregate
+
+
+def _records() -> List[Dict[str, Any]]:
+    rng = random.Random(0)
+    return [
+        {
+            "k": f"key-{rng.randint(0, 49)}",
+            "j": rng.randint(0, 1),
+            "v": None if rng.random() < 0.1 else rng.randint(0, 100),  # noqa: PLR2004
+        }
+        for _ in range(2000)
+    ]
+
+
+def _aggregates() -> Dict[str, Aggregate]:
+    return {
+        "n": Count(),
+        "n_v": Count("v"),
+        "total": Sum("v"),
+        "mean": Mean("v"),
+        "min": Min("v"),
+        "max": Max("v"),
+    }
+
+
+def _expected(records: List[Dict[str, Any]], keys: List[str]) -> List[Dict[str, Any]]:
+    groups: Dict[Any, List[Any]] = {}
+    for record in records:
+        groups.setdefault(tuple(record[k] for k in keys), []).append(record["v"])
+    expected = []
+    for group_key, all_values in groups.items():
+        values = [v for v in all_values if v is not None]
+        expected.append(
+            {
+                **dict(zip(keys, group_key)),
+                "n": len(all_values),
+                "n_v": len(values),
+                "total": sum(values),
+                "mean": sum(values) / len(values) if values else None,
+                "min": min(values, default=None),
+                "max": max(values, default=None),
+            }
+        )
+    return _sorted(expected, keys)
+
+
+def _sorted(records: List[Dict[str, Any]], keys: List[str]) -> List[Dict[str, Any]]:
+    return sorted(records, key=lambda r: tuple(r[k] for k in keys))
+
+
+def _assert_equal(result: List[Dict[str, Any]], expected: List[Dict[str, Any]]) -> None:
+    assert len(result) == len(expected)
+    for actual, wanted in zip(result, expected):
+        assert actual == pytest.approx(wanted)
+
+
+def test_group_aggregate_records() -> None:
+    records = _records()
+    result = Stream(records).then(group_aggregate("k", _aggregates())).to_list()
+    _assert_equal(_sorted(result, ["k"]), _expected(records, ["k"]))
+
+
+def test_group_aggregate_spills() -> None:
+    records = _records()
+    with tempfile.TemporaryDirectory() as spill_dir:
+        step = group_aggregate(
+            ["k", "j"], _aggregates(), memory_limit=2000, spill_dir=spill_dir
+        )
+        result = Stream(records).then(step).to_list()
+    _assert_equal(_sorted(result, ["k", "j"]), _expected(records, ["k", "j"]))
+
+
+def test_group_aggregate_key_function() -> None:
+    step = group_aggregate(lambda x: x % 3, {"n": Count(), "total": Sum()})
+    result = Stream(range(10)).then(step).to_list()
+    assert sorted(result, key=lambda r: r["key"]) == [
+        {"key": 0, "n": 4, "total": 18},
+        {"key": 1, "n": 3, "total": 12},
+        {"key": 2, "n": 3, "total": 15},
+    ]
+
+
+@pytest.mark.parametrize("memory_limit", [2000, 256 * 1024 * 1024])
+def test_group_aggregate_record_batches(memory_limit: int) -> None:
+    records = _records()
+    batches = [
+        pa.RecordBatch.from_pylist(records[start : start + 300])
+        for start in range(0, len(records), 300)
+    ]
+    step = group_aggregate(
+        ["k", "j"], _aggregates(), memory_limit=memory_limit, batch_size=40
+    )
+    result = Stream(batches).then(step).to_list()
+    assert all(isinstance(batch, pa.RecordBatch) for batch in result)
+    assert max(batch.num_rows for batch in result) == 40  # noqa: PLR2004
+    rows = pa.Table.from_batches(result).to_pylist()
+    _assert_equal(_sorted(rows, ["k", "j"]), _expected(records, ["k", "j"]))
+
+
+def test_group_aggregate_record_batches_without_arrow_aggregation() -> None:
+    batch = pa.RecordBatch.from_pylist(
+        [{"k": "a", "v": 1}, {"k": "b", "v": 2}, {"k": "a", "v": 3}]
+    )
+    step = group_aggregate("k", {"top": Max(lambda r: r["v"] * 10)})
+    result = Stream([batch]).then(step).to_list()
+    assert pa.Table.from_batches(result).to_pylist() == [
+        {"k": "a", "top": 30},
+        {"k": "b", "top": 20},
+    ]
+
+
+def test_group_aggregate_record_batches_count_function() -> None:
+    batch = pa.RecordBatch.from_pylist(
+        [{"k": "a", "x": 1}, {"k": "b", "x": None}, {"k": "a", "x": 3}]
+    )
+    step = group_aggregate("k", {"n": Count(lambda r: r["x"]), "all": Count()})
+    result = Stream([batch]).then(step).to_list()
+    assert pa.Table.from_batches(result).to_pylist() == [
+        {"k": "a", "n": 2, "all": 2},
+        {"k": "b", "n": 0, "all": 1},
+    ]
+
+
+def test_group_aggregate_empty() -> None:
+    assert Stream([]).then(group_aggregate("k", {"n": Count()})).to_list() == []
+
+
+def test_group_aggregate_invalid() -> None:
+    with pytest.raises(ValueError, match="at least 1"):
+        group_aggregate("k", {}, partitions=0)
+
+
+class _First(Aggregate):
+    def create(self) -> Any:
+        return None
+
+    def add(self, state: Any, value: Any) -> Any:
+        return value if state is None else state
+
+    def merge(self, state: Any, other: Any) -> Any:
+        return other if state is None else state
+
+
+def test_group_aggregate_record_batches_custom_aggregate() -> None:
+    batch = pa.RecordBatch.from_pylist(
+        [{"k": "a", "v": 1}, {"k": "a", "v": 3}, {"k": "b", "v": 2}]
+    )
+    step = group_aggregate("k", {"first": _First("v"), "n": Count()})
+    result = Stream([batch]).then(step).to_list()
+    assert pa.Table.from_batches(result).to_pylist() == [
+        {"k": "a", "first": 1, "n": 2},
+        {"k": "b", "first": 2, "n": 1},
+    ]
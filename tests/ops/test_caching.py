@@ -0,0 +1,210 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Iterator, List
+
+import fsspec  # type: ignore
+import pyarrow as pa  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+import pytest
+
+from pipedata.core import Stream
+from pipedata.ops import (
+    FileCache,
+    read_from_parquet,
+    set_file_cache,
+    zipped_files,
+    zipped_files_reader,
+)
+from pipedata.ops.caching import open_file
+from pipedata.ops.files import OpenedFileRef
+
+
+@pytest.fixture()
+def memory_fs() -> Iterator[fsspec.AbstractFileSystem]:
+    fs = fsspec.filesystem("memory")
+    yield fs
+    if fs.exists("/caching"):
+        fs.rm("/caching", recursive=True)
+
+
+def _zip_bytes(contents: str) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        zip_file.writestr("test.txt", contents)
+    return buffer.getvalue()
+
+
+def _read_contents(files: Iterator[OpenedFileRef]) -> Iterator[str]:
+    for file in files:
+        yield file.contents.read().decode("utf-8")
+
+
+def _cached_files(cache_dir: str) -> List[str]:
+    return [
+        name
+        for name in os.listdir(cache_dir)
+        if name not in ("cache", "pipedata-lru.json")
+    ]
+
+
+def test_file_cache_reruns_from_cache(memory_fs: fsspec.AbstractFileSystem) -> None:
+    memory_fs.pipe("caching/test.zip", _zip_bytes("Hello, world!"))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for run in range(2):
+            with FileCache(cache_dir):
+                result = (
+                    Stream(["memory://caching/test.zip"])
+                    .then(zipped_files)
+                    .then(_read_contents)
+                    .to_list()
+                )
+            assert result == ["Hello, world!"]
+            if run == 0:
+                # The rerun reads from the cache, without the origin
+                memory_fs.rm("caching/test.zip")
+
+        assert len(_cached_files(cache_dir)) == 1
+
+
+def test_file_cache_evicts_least_recently_used(
+    memory_fs: fsspec.AbstractFileSystem,
+) -> None:
+    for name in ["a", "b", "c"]:
+        memory_fs.pipe(f"caching/{name}.bin", name.encode() * 1000)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = FileCache(cache_dir, max_size=2500)
+        for name in ["a", "b", "a", "c"]:
+            with cache.open(f"memory://caching/{name}.bin") as file:
+                assert file.read() == name.encode() * 1000
+        assert cache.evictions == 1
+        assert len(_cached_files(cache_dir)) == 2  # noqa: PLR2004
+
+        with open(os.path.join(cache_dir, "pipedata-lru.json")) as file:
+            index = json.load(file)
+        assert [path for _, path, _ in index] == ["caching/a.bin", "caching/c.bin"]
+
+        # The order of use is kept between runs
+        rerun = FileCache(cache_dir, max_size=2500)
+        rerun.open("memory://caching/b.bin").close()
+        assert rerun.evictions == 1
+        with open(os.path.join(cache_dir, "pipedata-lru.json")) as file:
+            assert [path for _, path, _ in json.load(file)] == [
+                "caching/c.bin",
+                "caching/b.bin",
+            ]
+
+
+# fsspec's blockcache leaves the (memory mapped) cache file to be closed
+# by garbage collection
+@pytest.mark.filterwarnings("ignore::ResourceWarning")
+def test_file_cache_blockcache() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zip_path = Path(temp_dir) / "test.zip"
+        zip_path.write_bytes(_zip_bytes("Hello, world!" * 10_000))
+        cache_dir = os.path.join(temp_dir, "cache")
+
+        cache = FileCache(cache_dir, cache_type="blockcache", block_size=4096)
+        with cache:
+            result = (
+                Stream([f"file://{zip_path}"])
+                .then(zipped_files)
+                .then(_read_contents)
+                .to_list()
+            )
+        assert result == ["Hello, world!" * 10_000]
+        assert len(_cached_files(cache_dir)) == 1
+
+
+def test_file_cache_concurrent_reads(memory_fs: fsspec.AbstractFileSystem) -> None:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        for i in range(10):
+            zip_file.writestr(f"{i}.txt", str(i))
+    memory_fs.pipe("caching/test.zip", buffer.getvalue())
+
+    with tempfile.TemporaryDirectory() as cache_dir, FileCache(cache_dir):
+        result = (
+            Stream(["memory://caching/test.zip"])
+            .then(zipped_files_reader(max_workers=4))
+            .then(_read_contents)
+            .to_list()
+        )
+        assert result == [str(i) for i in range(10)]
+        assert len(_cached_files(cache_dir)) == 1
+
+
+def test_file_cache_opens_files_concurrently(
+    memory_fs: fsspec.AbstractFileSystem, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    for name in ["a", "b"]:
+        memory_fs.pipe(f"caching/{name}.bin", name.encode())
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = FileCache(cache_dir)
+        filesystem = cache.filesystem("memory")
+        # Each open waits for the other, so fails if they are serialized
+        barrier = threading.Barrier(2, timeout=5)
+        # The caching filesystems look up open on their class
+        original_open = type(filesystem).open
+
+        def open_together(self: Any, path: str, mode: str) -> Any:
+            barrier.wait()
+            return original_open(self, path, mode)
+
+        monkeypatch.setattr(type(filesystem), "open", open_together)
+
+        def read(name: str) -> bytes:
+            with cache.open(f"memory://caching/{name}.bin") as file:
+                return file.read()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            assert list(executor.map(read, ["a", "b"])) == [b"a", b"b"]
+
+
+def test_file_cache_parquet(memory_fs: fsspec.AbstractFileSystem) -> None:
+    buffer = io.BytesIO()
+    pq.write_table(pa.Table.from_pydict({"a": [1, 2, 3]}), buffer)
+    memory_fs.pipe("caching/test.parquet", buffer.getvalue())
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        with FileCache(cache_dir):
+            result = (
+                Stream(["memory://caching/test.parquet"])
+                .then(read_from_parquet())
+                .to_list()
+            )
+        assert result == [{"a": 1}, {"a": 2}, {"a": 3}]
+        assert len(_cached_files(cache_dir)) == 1
+        with open(os.path.join(cache_dir, "pipedata-lru.json")) as file:
+            assert json.load(file) == [
+                ["memory", "caching/test.parquet", len(buffer.getvalue())]
+            ]
+
+
+def test_file_cache_skips_local_paths() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "test.txt"
+        path.write_text("Hello")
+        cache_dir = os.path.join(temp_dir, "cache")
+
+        with FileCache(cache_dir), open_file(str(path)) as file:
+            assert file.read() == b"Hello"
+        assert _cached_files(cache_dir) == []
+
+
+def test_set_file_cache() -> None:
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = FileCache(cache_dir)
+        assert set_file_cache(cache) is None
+        assert set_file_cache(None) is cache
+
+        with pytest.raises(ValueError, match="cache type"):
+            FileCache(cache_dir, cache_type="simplecache")  # type: ignore[arg-type]
@@ -0,0 +1,138 @@
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa  # type: ignore
+import pyarrow.compute as pc  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+import pytest
+
+from pipedata.core import Stream
+from pipedata.ops import (
+    filter_batches,
+    parquet_writer,
+    rechunk_batches,
+    select_columns,
+    with_columns,
+)
+from pipedata.ops.files import read_from_parquet
+
+
+def _batches() -> list[pa.RecordBatch]:
+    return [
+        pa.RecordBatch.from_pydict({"a": [1, 2, 3], "b": [4, 5, 6]}),
+        pa.RecordBatch.from_pydict({"a": [7, 8], "b": [9, 10]}),
+    ]
+
+
+def test_filter_batches_expression() -> None:
+    predicate = pc.field("a") > 2  # noqa: PLR2004
+    result = Stream(_batches()).then(filter_batches(predicate)).to_list()
+    assert [batch.to_pydict() for batch in result] == [
+        {"a": [3], "b": [6]},
+        {"a": [7, 8], "b": [9, 10]},
+    ]
+
+
+def test_filter_batches_function() -> None:
+    def is_even(batch: pa.RecordBatch) -> pa.Array:
+        return pc.equal(pc.bit_wise_and(batch["a"], 1), 0)
+
+    result = Stream(_batches()).then(filter_batches(is_even)).to_list()
+    assert [batch.to_pydict() for batch in result] == [
+        {"a": [2], "b": [5]},
+        {"a": [8], "b": [10]},
+    ]
+
+
+def test_filter_batches_skips_empty() -> None:
+    predicate = pc.field("a") > 6  # noqa: PLR2004
+    result = Stream(_batches()).then(filter_batches(predicate)).to_list()
+    assert [batch.to_pydict() for batch in result] == [{"a": [7, 8], "b": [9, 10]}]
+
+
+def test_select_columns() -> None:
+    result = Stream(_batches()).then(select_columns(["b"])).to_list()
+    assert [batch.to_pydict() for batch in result] == [
+        {"b": [4, 5, 6]},
+        {"b": [9, 10]},
+    ]
+
+
+def test_with_columns() -> None:
+    def a_squared(batch: pa.RecordBatch) -> pa.Array:
+        return pc.multiply(batch["a"], batch["a"])
+
+    result = (
+        Stream(_batches())
+        .then(
+            with_columns(
+                c=pc.field("a") + pc.field("b"),
+                b=pc.field("b") * 10,
+                d=a_squared,
+                a=lambda batch: pc.negate(batch["a"]),
+            )
+        )
+        .to_list()
+    )
+    assert [batch.to_pydict() for batch in result] == [
+        {"a": [-1, -2, -3], "b": [40, 50, 60], "c": [5, 7, 9], "d": [1, 4, 9]},
+        {"a": [-7, -8], "b": [90, 100], "c": [16, 18], "d": [49, 64]},
+    ]
+
+
+def test_with_columns_functions_only() -> None:
+    result = (
+        Stream(_batches())
+        .then(with_columns(c=lambda batch: pc.add(batch["a"], 1)))
+        .then(select_columns(["c"]))
+        .to_list()
+    )
+    assert [batch.to_pydict() for batch in result] == [
+        {"c": [2, 3, 4]},
+        {"c": [8, 9]},
+    ]
+
+
+def test_rechunk_batches() -> None:
+    result = Stream(_batches() * 3).then(rechunk_batches(4)).to_list()
+    assert [batch.num_rows for batch in result] == [4, 4, 4, 3]
+    assert pa.Table.from_batches(result).to_pydict() == {
+        "a": [1, 2, 3, 7, 8] * 3,
+        "b": [4, 5, 6, 9, 10] * 3,
+    }
+
+
+def test_rechunk_batches_exact() -> None:
+    result = Stream(_batches()).then(rechunk_batches(5)).to_list()
+    assert [batch.num_rows for batch in result] == [5]
+
+
+def test_rechunk_batches_invalid_size() -> None:
+    with pytest.raises(ValueError, match="at least 1"):
+        rechunk_batches(0)
+
+
+def test_columnar_pipeline_to_parquet() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_path = Path(temp_dir) / "input.parquet"
+        output_path = Path(temp_dir) / "output.parquet"
+        pq.write_table(
+            pa.Table.from_pydict({"a": list(range(10)), "b": list(range(10, 20))}),
+            input_path,
+        )
+
+        result = (
+            Stream([str(input_path)])
+            .then(read_from_parquet(return_as="recordbatch", batch_size=3))
+            .then(filter_batches(pc.equal(pc.bit_wise_and(pc.field("a"), 1), 0)))
+            .then(with_columns(c=pc.field("a") * pc.field("b")))
+            .then(select_columns(["a", "c"]))
+            .then(rechunk_batches(2))
+            .then(parquet_writer(str(output_path)))
+            .to_list()
+        )
+        assert result == [str(output_path)]
+        assert pq.read_table(output_path).to_pydict() == {
+            "a": [0, 2, 4, 6, 8],
+            "c": [0, 24, 56, 96, 144],
+        }
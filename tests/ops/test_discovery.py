@@ -0,0 +1,127 @@
+import json
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Any, Iterator
+
+import fsspec  # type: ignore
+import pytest
+
+from pipedata.core import Stream, ops
+from pipedata.ops import discovered_files, discovery, zipped_files
+
+
+def _write(path: Path, contents: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(contents)
+
+
+def test_discovered_files_incremental() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir) / "data"
+        manifest = os.path.join(temp_dir, "manifest.json")
+        _write(root / "a.txt", "a")
+        _write(root / "sub" / "b.txt", "b")
+        _write(root / "sub" / "deeper" / "c.txt", "c")
+        _write(root / "sub" / "ignored.csv", "x")
+
+        def run() -> Any:
+            return (
+                Stream([str(root)])
+                .then(discovered_files(manifest, pattern="*.txt"))
+                .to_list()
+            )
+
+        assert run() == [
+            str(root / "a.txt"),
+            str(root / "sub" / "b.txt"),
+            str(root / "sub" / "deeper" / "c.txt"),
+        ]
+        assert run() == []
+
+        _write(root / "sub" / "b.txt", "changed")
+        _write(root / "d.txt", "d")
+        assert run() == [str(root / "d.txt"), str(root / "sub" / "b.txt")]
+
+        # Each file is recorded with its signature, with changed files again
+        with open(manifest) as file:
+            files = dict(json.loads(key) for key in json.load(file)["completed"])
+        assert files[str(root / "d.txt")]["size"] == 1
+        assert files[str(root / "sub" / "b.txt")]["size"] == len("changed")
+
+
+def _fail_on_b(file_ref: str) -> str:
+    if file_ref.endswith("b.txt"):
+        raise ValueError(file_ref)
+    return file_ref
+
+
+def test_discovered_files_records_processed(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(discovery, "_SAVE_INTERVAL", 1)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name in ["a.txt", "b.txt", "c.txt"]:
+            _write(Path(temp_dir) / "data" / name, name)
+        root = os.path.join(temp_dir, "data")
+        manifest = os.path.join(temp_dir, "manifest.json")
+
+        stream = Stream([root]).then(discovered_files(manifest))
+        with pytest.raises(ValueError, match="b.txt"):
+            stream.then(ops.mapping(_fail_on_b)).to_list()
+
+        result = Stream([root]).then(discovered_files(manifest)).to_list()
+        assert result == [os.path.join(root, "b.txt"), os.path.join(root, "c.txt")]
+
+
+def test_discovered_files_urls_and_single_files() -> None:
+    fs = fsspec.filesystem("memory")
+    fs.pipe("/discovery/one.txt", b"1")
+    fs.pipe("/discovery/more/two.txt", b"22")
+    fs.pipe("/discovery/more/three.txt", b"333")
+
+    result = (
+        Stream(["memory://discovery/more", "memory://discovery/one.txt"])
+        .then(discovered_files())
+        .to_list()
+    )
+    assert result == [
+        "memory:///discovery/more/three.txt",
+        "memory:///discovery/more/two.txt",
+        "memory:///discovery/one.txt",
+    ]
+    with fsspec.open(result[0], "rb") as file:
+        assert file.read() == b"333"
+    fs.rm("/discovery", recursive=True)
+
+
+def test_discovered_files_into_zipped_files() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with zipfile.ZipFile(Path(temp_dir) / "test.zip", "w") as zip_file:
+            zip_file.writestr("test.txt", "Hello, world!")
+
+        def contents(files: Iterator[Any]) -> Iterator[str]:
+            for file in files:
+                yield file.contents.read().decode("utf-8")
+
+        result = (
+            Stream([temp_dir])
+            .then(discovered_files(pattern="*.zip"))
+            .then(zipped_files)
+            .then(contents)
+            .to_list()
+        )
+        assert result == ["Hello, world!"]
+
+
+def test_signature() -> None:
+    info = {"size": 3, "ETag": '"abc"', "LastModified": "2024-01-01"}
+    assert discovery._signature(info) == {
+        "size": 3,
+        "mtime": "2024-01-01",
+        "etag": '"abc"',
+    }
+    assert discovery._signature({"size": 1}) == {
+        "size": 1,
+        "mtime": None,
+        "etag": None,
+    }
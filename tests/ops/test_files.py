@@ -1,12 +1,32 @@
+import bz2
+import gzip
+import io
+import lzma
+import tarfile
 import tempfile
+import threading
+import time
 import zipfile
 from pathlib import Path
+from typing import Any, Callable, Iterator, List, Tuple
 
 import pyarrow as pa  # type: ignore
+import pyarrow.compute as pc  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
 import pytest
 
-from pipedata.core import Stream, ops
-from pipedata.ops.files import FilesReaderError, read_from_parquet, zipped_files
+from pipedata.core import Chain, Stream, ops
+from pipedata.ops import files, filter_batches, json_records, select_columns
+from pipedata.ops.files import (
+    FilesReaderError,
+    OpenedFileRef,
+    arrow_ipc_reader,
+    compressed_files,
+    read_from_parquet,
+    tarred_files,
+    zipped_files,
+    zipped_files_reader,
+)
 
 
 def test_zipped_files() -> None:
@@ -119,3 +139,430 @@ def test_parquet_reading_record_batch() -> None:
 def test_parquet_reading_invalid_return_as() -> None:
     with pytest.raises(FilesReaderError):
         read_from_parquet(columns=["a"], return_as="unknown")  # type: ignore
+
+
+def test_parquet_reading_with_filter() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        parquet_path = Path(temp_dir) / "test.parquet"
+        table = pa.Table.from_pydict({"a": list(range(10)), "b": list(range(10))})
+        pq.write_table(table, parquet_path, row_group_size=3)
+
+        parquet_reader = read_from_parquet(
+            columns=["b"], filter=pc.field("a") >= 8, batch_size=2  # noqa: PLR2004
+        )
+        result = Stream([str(parquet_path)]).then(parquet_reader).to_list()
+        assert result == [{"b": 8}, {"b": 9}]
+
+
+def test_parquet_reading_partitioned() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        table = pa.Table.from_pydict({"a": [1, 2, 3], "part": ["x", "y", "x"]})
+        pq.write_to_dataset(table, temp_dir, partition_cols=["part"])
+
+        parquet_reader = read_from_parquet(
+            columns=["a"], filter=pc.field("part") == "x", partitioning="hive"
+        )
+        result = Stream([temp_dir]).then(parquet_reader).to_list()
+        assert sorted(row["a"] for row in result) == [1, 3]
+
+
+def test_parquet_reading_push_down() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        parquet_path = Path(temp_dir) / "test.parquet"
+        table = pa.Table.from_pydict(
+            {"a": list(range(10)), "b": list(range(10)), "c": list(range(10))}
+        )
+        pq.write_table(table, parquet_path, row_group_size=4)
+
+        def stream() -> Any:
+            return (
+                Stream([str(parquet_path)])
+                .then(
+                    read_from_parquet(return_as="recordbatch", filter=pc.field("a") > 1)
+                )
+                .then(select_columns(["a", "b"]))
+                .then(filter_batches(pc.field("a") < 5))  # noqa: PLR2004
+                .then(filter_batches(lambda batch: pc.greater(batch["b"], 2)))
+                .then(select_columns(["b"]))
+            )
+
+        expected = {"b": [3, 4]}
+        assert pa.Table.from_batches(stream().to_list()).to_pydict() == expected
+
+        compiled = stream().compile()
+        assert pa.Table.from_batches(compiled.to_list()).to_pydict() == expected
+        # Both selections and the expression filter are pushed into the reader
+        assert [step["name"] for step in compiled.get_counts()] == [
+            "_identity",
+            "parquet_batch_reader",
+            "filter_batches_func",
+            "select_columns_func",
+        ]
+
+
+def test_parquet_reading_push_down_not_possible() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        parquet_path = Path(temp_dir) / "test.parquet"
+        pq.write_table(pa.Table.from_pydict({"a": [1, 2, 3]}), parquet_path)
+
+        def names(reader: Any, *steps: Any) -> List[str]:
+            chain = Chain[str]().then(reader)
+            for step in steps:
+                chain = chain.then(step)
+            compiled = chain.compile()
+            list(compiled(iter([str(parquet_path)])))
+            return [step["name"] for step in compiled.get_counts()][1:]
+
+        # Steps after records, renamed or missing columns are not pushed down
+        assert names(read_from_parquet(), ops.mapping(len)) == [
+            "parquet_batch_reader",
+            "len",
+        ]
+        renamed = read_from_parquet(
+            columns={"b": pc.field("a")}, return_as="recordbatch"
+        )
+        assert names(renamed, filter_batches(pc.field("b") > 1)) == [
+            "parquet_batch_reader",
+            "filter_batches_func",
+        ]
+        assert names(renamed, select_columns(["b"])) == ["parquet_batch_reader"]
+        batches = read_from_parquet(return_as="recordbatch")
+        assert names(batches, filter_batches(pc.field("a") > 1)) == [
+            "parquet_batch_reader"
+        ]
+        selected = read_from_parquet(columns=["a"], return_as="recordbatch")
+        assert names(selected, select_columns(["a"])) == ["parquet_batch_reader"]
+        with pytest.raises(KeyError):
+            names(selected, select_columns(["b"]))
+
+
+def _write_parquet_files(directory: Path, files: int) -> List[str]:
+    paths = []
+    for i in range(files):
+        path = directory / f"part-{i}.parquet"
+        values = list(range(10 * i, 10 * i + 10))
+        pq.write_table(pa.Table.from_pydict({"a": values}), path, row_group_size=4)
+        paths.append(str(path))
+    return paths
+
+
+def test_parquet_reading_parallel() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = _write_parquet_files(Path(temp_dir), 5)
+
+        sequential = Stream(paths).then(read_from_parquet()).to_list()
+        assert [row["a"] for row in sequential] == list(range(50))
+
+        parallel = read_from_parquet(
+            parallel=True, batch_size=3, fragment_readahead=2, batch_readahead=2
+        )
+        assert Stream(paths).then(parallel).to_list() == sequential
+
+        unordered = read_from_parquet(
+            return_as="recordbatch",
+            filter=pc.field("a") < 25,  # noqa: PLR2004
+            parallel=True,
+            ordered=False,
+            max_workers=3,
+            batch_readahead=1,
+        )
+        batches = Stream(paths).then(unordered).to_list()
+        values = pa.Table.from_batches(batches).column("a").to_pylist()
+        assert sorted(values) == list(range(25))
+
+        assert Stream([]).then(unordered).to_list() == []
+
+
+def test_parquet_reading_parallel_directories() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for directory in ["first", "second"]:
+            (Path(temp_dir) / directory).mkdir()
+            _write_parquet_files(Path(temp_dir) / directory, 2)
+
+        refs = [str(Path(temp_dir) / "first"), str(Path(temp_dir) / "second")]
+        reader = read_from_parquet(parallel=True, ordered=False, max_workers=2)
+        result = Stream(refs).then(reader).to_list()
+        assert sorted(row["a"] for row in result) == sorted(list(range(20)) * 2)
+
+
+def test_parquet_reading_unordered_stops_early() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = _write_parquet_files(Path(temp_dir), 4)
+        reader = read_from_parquet(
+            return_as="recordbatch",
+            batch_size=1,
+            parallel=True,
+            ordered=False,
+            max_workers=2,
+            batch_readahead=1,
+        )
+        batches = reader(iter(paths))
+        first = next(batches)
+        assert first.num_rows == 1  # type: ignore[union-attr]
+        # Leaving the threads waiting on the full queue, before stopping them
+        time.sleep(0.3)
+        batches.close()  # type: ignore[attr-defined]
+        assert not any(
+            thread.name.startswith("parquet-reader") for thread in threading.enumerate()
+        )
+
+
+def test_parquet_reading_unordered_error() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pq.write_table(pa.Table.from_pydict({"a": [1]}), Path(temp_dir) / "0.parquet")
+        # The schema of the dataset is from the first file, so this fails to scan
+        pq.write_table(pa.Table.from_pydict({"a": ["x"]}), Path(temp_dir) / "1.parquet")
+        reader = read_from_parquet(parallel=True, ordered=False, max_workers=1)
+        with pytest.raises(pa.ArrowException):
+            Stream([temp_dir]).then(reader).to_list()
+
+
+def test_parquet_reading_unordered_requires_parallel() -> None:
+    with pytest.raises(FilesReaderError, match="parallel"):
+        read_from_parquet(ordered=False)
+
+
+def test_parquet_reading_memory_mapped() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = _write_parquet_files(Path(temp_dir), 2)
+        expected = Stream(paths).then(read_from_parquet()).to_list()
+
+        reader = read_from_parquet(memory_map=True)
+        assert Stream(paths).then(reader).to_list() == expected
+        file_urls = [f"file://{path}" for path in paths]
+        assert Stream(file_urls).then(reader).to_list() == expected
+        parallel = read_from_parquet(memory_map=True, parallel=True)
+        assert Stream(paths).then(parallel).to_list() == expected
+
+
+def _write_arrow_ipc(path: Path, batches: List[pa.RecordBatch]) -> None:
+    with pa.ipc.new_file(str(path), batches[0].schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+
+
+def test_arrow_ipc_reader() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "test.arrow"
+        batches = [
+            pa.RecordBatch.from_pydict({"a": [1, 2], "b": ["x", "y"]}),
+            pa.RecordBatch.from_pydict({"a": [3], "b": ["z"]}),
+        ]
+        _write_arrow_ipc(path, batches)
+
+        result = Stream([str(path)]).then(arrow_ipc_reader()).to_list()
+        assert result == batches
+
+        records = arrow_ipc_reader(columns=["a"], return_as="record", memory_map=False)
+        assert Stream([f"file://{path}"]).then(records).to_list() == [
+            {"a": 1},
+            {"a": 2},
+            {"a": 3},
+        ]
+
+
+def test_arrow_ipc_reader_zero_copy() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "test.arrow"
+        rows = 1_000_000
+        batch = pa.RecordBatch.from_pydict({"a": list(range(rows))})
+        _write_arrow_ipc(path, [batch])
+        del batch
+
+        allocated = pa.total_allocated_bytes()
+        result = Stream([str(path)]).then(arrow_ipc_reader()).to_list()
+        # The batch refers to the mapped file, rather than to a copy of it
+        assert pa.total_allocated_bytes() - allocated < rows
+        assert result[0]["a"][rows - 1].as_py() == rows - 1
+
+
+def test_arrow_ipc_reader_invalid_return_as() -> None:
+    with pytest.raises(FilesReaderError):
+        arrow_ipc_reader(return_as="unknown")  # type: ignore
+
+
+def _write_zip(path: Path, files: int) -> None:
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr("data/", "")
+        for i in range(files):
+            zip_file.writestr(f"data/{i}.json", f'{{"i": {i}}}' * 1000)
+        zip_file.writestr("README.txt", "Not data")
+
+
+def test_zipped_files_reader() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zip_path = Path(temp_dir) / "test.zip"
+        _write_zip(zip_path, 20)
+
+        def contents(refs: List[OpenedFileRef]) -> List[Tuple[str, bytes]]:
+            return [(ref.name, ref.contents.read()) for ref in refs]
+
+        # The files of zipped_files are closed once the next file is read
+        expected = (
+            Stream([str(zip_path)] * 2)
+            .then(zipped_files)
+            .then(ops.filtering(lambda ref: ref.name.endswith(".json")))  # type: ignore
+            .then(ops.mapping(lambda ref: (ref.name, ref.contents.read())))
+            .to_list()
+        )
+        assert len(expected) == 40  # noqa: PLR2004
+
+        reader = zipped_files_reader("*.json", max_workers=3, max_in_flight=2)
+        result = Stream([str(zip_path)] * 2).then(reader).to_list()
+        assert contents(result) == expected
+
+        unordered = zipped_files_reader(
+            lambda name: name.startswith("data/"), ordered=False
+        )
+        result = Stream([str(zip_path)]).then(unordered).to_list()
+        assert sorted(contents(result)) == sorted(expected[:20])
+
+        everything = Stream([str(zip_path)]).then(zipped_files_reader()).to_list()
+        assert [ref.name for ref in everything][-1] == "README.txt"
+        assert len(everything) == 21  # noqa: PLR2004
+
+
+def test_zipped_files_reader_stops_early() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zip_path = Path(temp_dir) / "test.zip"
+        _write_zip(zip_path, 20)
+
+        refs = zipped_files_reader(max_workers=2)(iter([str(zip_path)]))
+        assert next(refs).name == "data/0.json"
+        refs.close()  # type: ignore[attr-defined]
+
+
+def test_zipped_files_reader_invalid_workers() -> None:
+    with pytest.raises(ValueError, match="at least 1"):
+        zipped_files_reader(max_workers=0)
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.CompressedOutputStream(sink, "zstd") as stream:
+        stream.write(data)
+    return sink.getvalue().to_pybytes()  # type: ignore[no-any-return]
+
+
+@pytest.mark.parametrize(
+    ("suffix", "compress"),
+    [
+        (".gz", gzip.compress),
+        (".bz2", bz2.compress),
+        (".xz", lzma.compress),
+        (".zst", _zstd_compress),
+        ("", lambda data: data),
+    ],
+)
+def test_compressed_files(suffix: str, compress: Callable[[bytes], bytes]) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / f"data.jsonl{suffix}"
+        path.write_bytes(compress(b'{"a": 1}\n{"a": 2}\n'))
+
+        result = (
+            Stream([str(path)])
+            .then(compressed_files())
+            .then(json_records("", multiple_values=True))
+            .to_list()
+        )
+        assert result == [{"a": 1}, {"a": 2}]
+
+        names = Stream([str(path)]).then(compressed_files()).to_list()
+        assert names[0].name == str(Path(temp_dir) / "data.jsonl")
+
+
+def test_compressed_files_explicit_compression() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "data.bin"
+        path.write_bytes(gzip.compress(b"\x1f\x8b"))
+
+        reader = compressed_files("gzip")
+        contents = Stream([str(path)]).then(reader).then(_read_contents).to_list()
+        assert contents == [b"\x1f\x8b"]
+
+        reader = compressed_files(None)
+        contents = Stream([str(path)]).then(reader).then(_read_contents).to_list()
+        assert contents == [gzip.compress(b"\x1f\x8b")]
+
+
+def _read_contents(files: Iterator[OpenedFileRef]) -> Iterator[bytes]:
+    for file in files:
+        yield file.contents.read()
+
+
+def test_compressed_files_invalid_compression() -> None:
+    with pytest.raises(FilesReaderError, match="Unknown compression"):
+        compressed_files("lz4")  # type: ignore[arg-type]
+    with pytest.raises(FilesReaderError, match="Unknown compression"):
+        tarred_files("zip")  # type: ignore[arg-type]
+
+
+class _Unseekable(io.RawIOBase):
+    def __init__(self, data: bytes) -> None:
+        self._data = io.BytesIO(data)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        # Short reads, as from a network stream
+        data = self._data.read(min(len(buffer), 100))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def test_decompressed_unseekable() -> None:
+    data = b"".join(f"line {i}\n".encode() for i in range(1000))
+    stream = _Unseekable(gzip.compress(data))
+    assert not stream.seekable()
+    with files._decompressed(stream, "auto") as contents:  # type: ignore[arg-type]
+        assert contents.read() == data
+
+
+@pytest.mark.parametrize("mode", ["w", "w:gz", "w:bz2", "w:xz"])
+def test_tarred_files(mode: str) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        tar_path = Path(temp_dir) / "test.tar"
+        with tarfile.open(tar_path, mode) as tar_file:  # type: ignore[call-overload]
+            directory = tarfile.TarInfo("directory")
+            directory.type = tarfile.DIRTYPE
+            tar_file.addfile(directory)
+            for i in range(3):
+                contents = f"Hello, world {i}!".encode()
+                info = tarfile.TarInfo(f"directory/test{i}.txt")
+                info.size = len(contents)
+                tar_file.addfile(info, io.BytesIO(contents))
+            link = tarfile.TarInfo("directory/link.txt")
+            link.type = tarfile.SYMTYPE
+            link.linkname = "test0.txt"
+            tar_file.addfile(link)
+
+        result = (
+            Stream([str(tar_path)])
+            .then(tarred_files())
+            .then(ops.mapping(lambda x: (x.name, x.contents.read().decode())))  # type: ignore
+            .to_list()
+        )
+        assert result == [
+            (f"directory/test{i}.txt", f"Hello, world {i}!") for i in range(3)
+        ]
+
+
+def test_tarred_files_zstd() -> None:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar_file:
+        contents = b"Hello, world!" * 1000
+        info = tarfile.TarInfo("test.txt")
+        info.size = len(contents)
+        tar_file.addfile(info, io.BytesIO(contents))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        tar_path = Path(temp_dir) / "test.tar.zst"
+        tar_path.write_bytes(_zstd_compress(buffer.getvalue()))
+        result = (
+            Stream([str(tar_path)])
+            .then(tarred_files())
+            .then(ops.mapping(lambda x: (x.name, x.contents.read())))  # type: ignore
+            .to_list()
+        )
+        assert result == [("test.txt", contents)]
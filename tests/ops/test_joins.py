@@ -0,0 +1,133 @@
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Literal
+
+import pyarrow as pa  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+import pytest
+
+from pipedata.core import Stream
+from pipedata.ops import hash_join
+
+
+def _right() -> pa.Table:
+    return pa.Table.from_pydict(
+        {
+            "id": [1, 2, 2, None],
+            "name": ["one", "two", "deux", "none"],
+            "value": [10, 20, 21, 0],
+        }
+    )
+
+
+def test_hash_join_records_inner() -> None:
+    records = [{"id": 2, "value": "x"}, {"id": 3}, {"id": 1}, {"id": None}]
+    result = Stream(records).then(hash_join(_right(), on="id")).to_list()
+    assert result == [
+        {"id": 2, "value": "x", "name": "two", "value_right": 20},
+        {"id": 2, "value": "x", "name": "deux", "value_right": 21},
+        {"id": 1, "name": "one", "value": 10},
+    ]
+
+
+def test_hash_join_records_left() -> None:
+    records = [{"id": 3, "value": "x"}, {"id": 1}]
+    step = hash_join(_right(), on="id", how="left", columns=["name"])
+    assert Stream(records).then(step).to_list() == [
+        {"id": 3, "value": "x", "name": None},
+        {"id": 1, "name": "one"},
+    ]
+
+
+def test_hash_join_records_in_chunks() -> None:
+    records: List[Any] = [{"id": i % 3, "i": i} for i in range(2500)]
+    # A record batch between records keeps its place in the order
+    records.insert(1500, pa.RecordBatch.from_pydict({"id": [1]}))
+    step = hash_join(_right(), on="id", how="left", columns=["name"])
+    result = Stream(records).then(step).to_list()
+
+    batches = [element for element in result if isinstance(element, pa.RecordBatch)]
+    assert batches[0].to_pydict() == {"id": [1], "name": ["one"]}
+    assert result.index(batches[0]) == 2000  # noqa: PLR2004
+    joined = [element for element in result if isinstance(element, dict)]
+    assert [record["i"] for record in joined if record["id"] != 2] == [  # noqa: PLR2004
+        i for i in range(2500) if i % 3 != 2  # noqa: PLR2004
+    ]
+    assert {record["name"] for record in joined if record["id"] == 0} == {None}
+    assert len(joined) == 2500 + len(range(2, 2500, 3))  # noqa: PLR2004
+
+
+@pytest.mark.parametrize(
+    ("how", "expected"),
+    [
+        (
+            "inner",
+            {"id": [2, 2, 1], "value": [5, 5, 6], "name": ["two", "deux", "one"]},
+        ),
+        (
+            "left",
+            {
+                "id": [2, 2, 3, 1, None],
+                "value": [5, 5, 7, 6, 8],
+                "name": ["two", "deux", None, "one", None],
+            },
+        ),
+    ],
+)
+def test_hash_join_record_batches(
+    how: Literal["inner", "left"], expected: Dict[str, List[Any]]
+) -> None:
+    batches = [
+        pa.RecordBatch.from_pydict({"id": [2, 3], "value": [5, 7]}),
+        pa.RecordBatch.from_pydict({"id": [1, None], "value": [6, 8]}),
+    ]
+    step = hash_join(_right().to_batches(), on="id", how=how, columns=["name"])
+    result = Stream(batches).then(step).to_list()
+    assert pa.Table.from_batches(result).to_pydict() == expected
+
+
+def test_hash_join_from_parquet_multiple_keys() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = str(Path(temp_dir) / "right.parquet")
+        pq.write_table(
+            pa.Table.from_pydict(
+                {"a": [1, 1, 2], "b": ["x", "y", "x"], "c": [1.0, 2.0, 3.0]}
+            ),
+            path,
+        )
+        step = hash_join(path, on=["a", "b"], columns=["c"])
+        records = [{"a": 1, "b": "y"}, {"a": 2, "b": None}, {"a": 2, "b": "x"}]
+        assert Stream(records).then(step).to_list() == [
+            {"a": 1, "b": "y", "c": 2.0},
+            {"a": 2, "b": "x", "c": 3.0},
+        ]
+
+        batch = pa.RecordBatch.from_pylist(records)
+        result = Stream([batch]).then(step).to_list()
+        assert result[0].to_pylist() == [
+            {"a": 1, "b": "y", "c": 2.0},
+            {"a": 2, "b": "x", "c": 3.0},
+        ]
+
+
+def test_hash_join_empty_right() -> None:
+    records = [{"id": 1, "value": 5}]
+    assert Stream(records).then(hash_join([], on="id")).to_list() == []
+    step = hash_join([], on="id", how="left")
+    assert Stream(records).then(step).to_list() == records
+
+    batches = [pa.RecordBatch.from_pydict({"id": [1, 2], "value": [5, 6]})]
+    step = hash_join(iter([]), on="id", how="left", columns=["name"])
+    result = Stream(batches).then(step).to_list()
+    assert pa.Table.from_batches(result).to_pydict() == {
+        "id": [1, 2],
+        "value": [5, 6],
+        "name": [None, None],
+    }
+    step = hash_join([], on="id", columns=["name"])
+    assert [batch.num_rows for batch in Stream(batches).then(step)] == [0]
+
+
+def test_hash_join_invalid_how() -> None:
+    with pytest.raises(ValueError, match="Unknown join type"):
+        hash_join(_right(), on="id", how="outer")  # type: ignore[arg-type]
@@ -1,11 +1,14 @@
 import tempfile
 from pathlib import Path
+from typing import Dict, Optional
 
+import pyarrow as pa  # type: ignore
 import pyarrow.parquet as pq  # type: ignore
 import pytest
 
-from pipedata.core import Stream
-from pipedata.ops.storage import parquet_writer
+from pipedata.core import Chain, Stream, ops
+from pipedata.ops.files import FilesReaderError, arrow_ipc_reader
+from pipedata.ops.storage import arrow_ipc_writer, parquet_writer
 
 
 def test_parquet_simple_storage() -> None:
@@ -120,3 +123,182 @@ def test_parquet_multiple_files_wrong_path() -> None:
 
         with pytest.raises(ValueError):  # noqa: PT011
             parquet_writer(str(output_path), max_file_length=2)
+
+
+def test_parquet_record_batches() -> None:
+    batches = [
+        pa.RecordBatch.from_pydict({"a": [1, 3], "b": [2, 4]}),
+        pa.RecordBatch.from_pydict({"a": [5], "b": [6]}),
+        pa.RecordBatch.from_pydict({"a": [7], "b": [8]}),
+    ]
+    schema = pa.schema([("a", pa.int32()), ("b", pa.int64())])
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        temp_path = Path(tmpdir)
+        output_path = temp_path / "test_{i:04d}.parquet"
+
+        result = (
+            Stream(batches)
+            .then(parquet_writer(str(output_path), schema=schema, max_file_length=3))
+            .to_list()
+        )
+
+        assert result == [
+            str(temp_path / "test_0001.parquet"),
+            str(temp_path / "test_0002.parquet"),
+        ]
+        table1 = pq.read_table(result[0])
+        assert table1.schema == schema
+        assert table1.to_pydict() == {"a": [1, 3, 5], "b": [2, 4, 6]}
+        assert pq.read_table(result[1]).to_pydict() == {"a": [7], "b": [8]}
+
+
+@pytest.mark.parametrize("row_group_length", [None, 600])
+def test_parquet_record_batches_split_between_files(
+    row_group_length: Optional[int],
+) -> None:
+    batch = pa.RecordBatch.from_pydict({"a": list(range(2500))})
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_path = Path(tmpdir) / "test_{i:04d}.parquet"
+        writer = parquet_writer(
+            str(output_path), row_group_length=row_group_length, max_file_length=1000
+        )
+        result = Stream([batch]).then(writer).to_list()
+
+        assert [pq.ParquetFile(path).metadata.num_rows for path in result] == [
+            1000,
+            1000,
+            500,
+        ]
+        rows = [row for path in result for row in pq.read_table(path)["a"]]
+        assert [row.as_py() for row in rows] == list(range(2500))
+
+
+def test_parquet_row_groups_within_files() -> None:
+    items = [{"a": i} for i in range(12)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_path = Path(tmpdir) / "test_{i:04d}.parquet"
+        writer = parquet_writer(str(output_path), row_group_length=3, max_file_length=5)
+        result = Stream(items).then(writer).to_list()
+
+        row_groups = []
+        for path in result:
+            metadata = pq.ParquetFile(path).metadata
+            row_groups.append(
+                [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+            )
+        assert row_groups == [[3, 2], [3, 2], [2]]
+        rows = [row for path in result for row in pq.read_table(path).to_pylist()]
+        assert rows == items
+
+
+def test_parquet_record_batches_row_groups() -> None:
+    batches = [pa.RecordBatch.from_pydict({"a": [i]}) for i in range(50)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_path = Path(tmpdir) / "test.parquet"
+        writer = parquet_writer(str(output_path), row_group_length=20)
+        result = Stream(batches).then(writer).to_list()
+
+        metadata = pq.ParquetFile(result[0]).metadata
+        row_groups = [metadata.row_group(i).num_rows for i in range(3)]
+        assert (metadata.num_row_groups, row_groups) == (3, [20, 20, 10])
+        assert pq.read_table(result[0])["a"].to_pylist() == list(range(50))
+
+
+def test_parquet_writer_tee_with_aggregate() -> None:
+    items = [{"a": i} for i in range(5000)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_path = Path(tmpdir) / "test.parquet"
+        files, counts = Stream(items).tee(
+            parquet_writer(str(output_path)),
+            Chain[Dict[str, int]]().then(ops.batched[Dict[str, int], int](len, None)),
+        )
+        assert files == [str(output_path)]
+        assert counts == [5000]
+        assert pq.read_table(output_path).num_rows == 5000  # noqa: PLR2004
+
+
+def test_parquet_no_records() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_path = Path(tmpdir) / "test.parquet"
+        result = Stream([]).then(parquet_writer(str(output_path))).to_list()
+        assert result == []
+
+
+def test_arrow_ipc_round_trip() -> None:
+    items = [{"a": i, "b": str(i)} for i in range(5)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_path = Path(tmpdir) / "test.arrow"
+        result = (
+            Stream(items)
+            .then(arrow_ipc_writer(str(output_path), batch_length=2))
+            .to_list()
+        )
+        assert result == [str(output_path)]
+
+        with pa.memory_map(str(output_path)) as source:
+            reader = pa.ipc.open_file(source)
+            assert reader.num_record_batches == 3  # noqa: PLR2004
+            assert reader.read_all().to_pylist() == items
+
+        records = Stream(result).then(arrow_ipc_reader(return_as="record"))
+        assert records.to_list() == items
+
+
+@pytest.mark.parametrize("compression", [None, "lz4", "zstd"])
+def test_arrow_ipc_stream_multiple_files(compression: Optional[str]) -> None:
+    batches = [
+        pa.RecordBatch.from_pydict({"a": [1, 3], "b": [2, 4]}),
+        pa.RecordBatch.from_pydict({"a": [5], "b": [6]}),
+        pa.RecordBatch.from_pydict({"a": [7], "b": [8]}),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        temp_path = Path(tmpdir)
+        writer = arrow_ipc_writer(
+            str(temp_path / "test_{i:04d}.arrows"),
+            max_file_length=3,
+            format="stream",
+            compression=compression,  # type: ignore[arg-type]
+        )
+        result = Stream(batches).then(writer).to_list()
+        assert result == [
+            str(temp_path / "test_0001.arrows"),
+            str(temp_path / "test_0002.arrows"),
+        ]
+
+        # The batches are regrouped into batches of (up to) max_file_length
+        reader = arrow_ipc_reader(format="stream")
+        assert Stream(result[:1]).then(reader).to_list() == [
+            pa.RecordBatch.from_pydict({"a": [1, 3, 5], "b": [2, 4, 6]})
+        ]
+        unmapped = arrow_ipc_reader(format="stream", memory_map=False)
+        assert Stream(result[1:]).then(unmapped).to_list() == batches[2:]
+
+
+def test_arrow_ipc_record_batch_split_between_files() -> None:
+    batch = pa.RecordBatch.from_pydict({"a": list(range(2500))})
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_path = Path(tmpdir) / "h{i}.arrow"
+        writer = arrow_ipc_writer(str(output_path), max_file_length=1000)
+        result = Stream([batch]).then(writer).to_list()
+
+        assert result == [str(Path(tmpdir) / f"h{i}.arrow") for i in (1, 2, 3)]
+        tables = [pa.ipc.open_file(path).read_all() for path in result]
+        assert [table.num_rows for table in tables] == [1000, 1000, 500]
+        assert pa.concat_tables(tables)["a"].to_pylist() == list(range(2500))
+
+
+def test_arrow_ipc_writer_invalid() -> None:
+    with pytest.raises(ValueError, match="format"):
+        arrow_ipc_writer("test.arrow", format="parquet")  # type: ignore[arg-type]
+    with pytest.raises(ValueError, match="format string"):
+        arrow_ipc_writer("test.arrow", max_file_length=2)
+    with pytest.raises(FilesReaderError, match="format"):
+        arrow_ipc_reader(format="parquet")  # type: ignore[arg-type]